@@ -0,0 +1,40 @@
+"""
+Micro-benchmark of build_library, the single pass from operations_library rows to records and child type_ids.
+
+Run from the repository root:
+    python benchmarks/bench_child_type_ids.py
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from ProcessEditor.generator import LibraryShape, generate_library  # noqa: E402
+from ProcessEditor.library_model import build_library  # noqa: E402
+
+SIZES = (1_000, 10_000, 100_000)
+REPEAT = 5
+
+
+def make_library_rows(size: int, seed: int = 0) -> list[tuple]:
+    """Returns rows of a generated library tree in order of LIBRARY_COLUMNS, parent_type_id = 0 for the root."""
+    rows = generate_library(LibraryShape(), random.Random(seed), library_size=size)
+    return [row if row[2] is not None else row[:2] + (0,) + row[3:] for row in rows]
+
+
+def main() -> None:
+    print(f"{'entries':>10} {'best, ms':>10} {'per entry, us':>15}")
+    for size in SIZES:
+        library_rows = make_library_rows(size)
+
+        def run():
+            build_library(library_rows, 'EN')
+
+        best = min(timeit.repeat(run, number=1, repeat=REPEAT))
+        print(f"{size:>10} {best * 1e3:>10.2f} {best / size * 1e6:>15.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Startup time of LibraryModel without and with the local snapshot of operations_library.
+
+cold: no snapshot, the library is selected and the snapshot is written,
+warm: the snapshot token matches, the library is read from the snapshot file.
+
+Run from the repository root:
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_library_cache.py [entries]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from fixtures import open_qt_connection
+
+from PySide6.QtWidgets import QApplication
+
+from ProcessEditor.generator import create_database
+from ProcessEditor.library_model import LibraryModel
+
+REPEAT = 3
+
+
+def build_time(settings: dict) -> float:
+    start = time.perf_counter()
+    LibraryModel(None, settings)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    app = QApplication(sys.argv[:1])
+    path = os.path.join(tempfile.gettempdir(), 'bench_library_cache.sqlite')
+    create_database(path, library_size=size, operations=0)
+    cache_dir = tempfile.mkdtemp(prefix='bench_library_cache_')
+    connection = open_qt_connection(path)
+
+    uncached = min(build_time({'connection': connection, 'language_code': 'EN'}) for _ in range(REPEAT))
+    settings = {'connection': connection, 'language_code': 'EN', 'library_cache': True, 'cache_dir': cache_dir}
+    cold = []
+    for _ in range(REPEAT):
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        cold.append(build_time(settings))
+    warm = min(build_time(settings) for _ in range(REPEAT))
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print(f"entries:              {size}")
+    print(f"no cache, s:          {uncached:.2f}")
+    print(f"cold start, s:        {min(cold):.2f}")
+    print(f"warm start, s:        {warm:.2f}")
+    del app
+
+
+if __name__ == '__main__':
+    main()
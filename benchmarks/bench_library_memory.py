@@ -0,0 +1,70 @@
+"""
+Memory used by LibraryModel for a synthetic library, with the settings of the main window.
+
+The model is built without the local snapshot of operations_library, then with library_cache of the window:
+cold when the snapshot is written, warm when it is read.
+
+Run from the repository root:
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_library_memory.py [entries]
+"""
+import gc
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from fixtures import open_qt_connection
+
+from PySide6.QtWidgets import QApplication
+
+from ProcessEditor.generator import create_database
+from ProcessEditor.library_model import LibraryModel
+from ProcessEditor.main import DEFAULT_SETTINGS
+
+
+def rss_bytes() -> int:
+    """Returns resident set size of the process, it includes memory allocated by Qt."""
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def measure(name: str, settings: dict) -> None:
+    gc.collect()
+    rss_before = rss_bytes()
+    tracemalloc.start()
+    start = time.perf_counter()
+    model = LibraryModel(None, settings)
+    elapsed = time.perf_counter() - start
+    python_current, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    gc.collect()
+    rss_after = rss_bytes()
+
+    print(f"{name}:")
+    print(f"  build time, s:      {elapsed:.2f}")
+    print(f"  python heap, MiB:   {python_current / 2 ** 20:.1f} (peak {python_peak / 2 ** 20:.1f})")
+    print(f"  rss growth, MiB:    {(rss_after - rss_before) / 2 ** 20:.1f}")
+    del model
+
+
+def main() -> None:
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    app = QApplication(sys.argv[:1])
+    path = os.path.join(tempfile.gettempdir(), 'bench_library_memory.sqlite')
+    create_database(path, library_size=size, operations=0)
+    cache_dir = tempfile.mkdtemp(prefix='bench_library_memory_')
+    settings = dict(DEFAULT_SETTINGS, connection=open_qt_connection(path), cache_dir=cache_dir)
+
+    print(f"entries:              {size}")
+    measure('no cache', dict(settings, library_cache=False))
+    if settings['library_cache']:
+        measure('cold start (window)', settings)
+        measure('warm start (window)', settings)
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    del app
+
+
+if __name__ == '__main__':
+    main()
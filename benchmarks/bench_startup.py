@@ -0,0 +1,169 @@
+"""
+Startup report: time to the first paint of the main window and to loaded models, with import times.
+
+The window is started REPEAT times in a fresh interpreter under -X importtime on a generated SQLite database.
+Times are measured from spawning the interpreter, so they include its startup:
+    imported      ProcessEditor.main with PySide6 is imported
+    first_paint   the window is painted for the first time, in loading state
+    ready         library and process models are set to the views
+Modules of the last run taking most time to import, by cumulative and by self time, are listed.
+
+Run from the repository root:
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_startup.py [--output startup.json] [--compare old.json]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from fixtures import SOURCE_DIR
+
+from ProcessEditor.generator import create_database
+
+REPEAT = 5
+TOP_IMPORTS = 15
+LIBRARY_SIZE = 1_000
+OPERATIONS = 1_000
+
+# slowdown of the first paint against the compared report, reported as a regression
+REGRESSION_RATIO = 1.2
+
+# run in the spawned interpreter: sys.argv = ['-c', spawn time, database path]
+CHILD = r'''
+import json, sys, time
+spawned = float(sys.argv[1])
+from PySide6.QtCore import QTimer
+from PySide6.QtWidgets import QApplication
+from ProcessEditor.connections import ConnectionManager
+from ProcessEditor.main import Main
+marks = {'imported': time.time() - spawned}
+app = QApplication(sys.argv[:1])
+manager = ConnectionManager({'driver': 'QSQLITE', 'database': sys.argv[2], 'health_check': False})
+window = Main(manager)
+window.first_painted.connect(lambda seconds: marks.setdefault('first_paint', time.time() - spawned))
+
+def poll():
+    if window.process_version is not None:
+        marks['ready'] = time.time() - spawned
+        app.quit()
+
+timer = QTimer()
+timer.timeout.connect(poll)
+timer.start(1)
+window.show()
+app.exec()
+window.close()
+print(json.dumps(marks))
+'''
+
+
+def parse_importtime(stderr: str) -> list[dict]:
+    """Returns imports listed by -X importtime: module, self and cumulative microseconds, nesting level."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        imports.append({
+            'module': name.strip(),
+            'self_us': int(self_us),
+            'cumulative_us': int(cumulative_us),
+            'level': (len(name) - len(name.lstrip()) - 1) // 2,
+        })
+    return imports
+
+
+def start_window(path: str) -> tuple[dict, list[dict]]:
+    """Starts the window in a new interpreter. Returns times of the marks and the imports."""
+    environment = dict(os.environ, QT_QPA_PLATFORM=os.environ.get('QT_QPA_PLATFORM', 'offscreen'))
+    environment['PYTHONPATH'] = os.pathsep.join(filter(None, (SOURCE_DIR, environment.get('PYTHONPATH'))))
+    spawned = time.time()
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD, repr(spawned), path],
+        capture_output=True, text=True, env=environment, check=True)
+    marks = json.loads(completed.stdout.strip().splitlines()[-1])
+    return marks, parse_importtime(completed.stderr)
+
+
+def top_imports(imports: list[dict], key: str, count: int) -> list[dict]:
+    return sorted(imports, key=lambda item: item[key], reverse=True)[:count]
+
+
+def git_commit() -> [str, None]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--top', type=int, default=TOP_IMPORTS, help="number of listed imports")
+    parser.add_argument('--library-size', type=int, default=LIBRARY_SIZE)
+    parser.add_argument('--operations', type=int, default=OPERATIONS)
+    parser.add_argument('--output', help="JSON file of the report, printed to stdout if not set")
+    parser.add_argument('--compare', help="JSON file of an earlier report")
+    arguments = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='bench_startup_')
+    os.environ['XDG_CACHE_HOME'] = directory  # library snapshots of the window are written here
+    path = create_database(
+        os.path.join(directory, 'bench_startup.sqlite'),
+        library_size=arguments.library_size, operations=arguments.operations)
+
+    runs = []
+    imports = []
+    for _ in range(arguments.repeat):
+        marks, imports = start_window(path)
+        runs.append(marks)
+    summary = {
+        name: {'best': min(run[name] for run in runs), 'median': statistics.median(run[name] for run in runs)}
+        for name in ('imported', 'first_paint', 'ready')
+    }
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'library_size': arguments.library_size,
+        'operations': arguments.operations,
+        'time_to_first_paint': summary['first_paint']['median'],
+        'summary': summary,
+        'runs': runs,
+        'top_cumulative_imports': top_imports(imports, 'cumulative_us', arguments.top),
+        'top_self_imports': top_imports(imports, 'self_us', arguments.top),
+    }
+
+    for name, times in summary.items():
+        print(
+            f"{name:>12} {times['best'] * 1e3:>9.1f} ms best {times['median'] * 1e3:>9.1f} ms median", file=sys.stderr)
+    print(f"\n{'cumulative, ms':>14} {'self, ms':>9}  module", file=sys.stderr)
+    for item in report['top_cumulative_imports']:
+        print(
+            f"{item['cumulative_us'] / 1e3:>14.1f} {item['self_us'] / 1e3:>9.1f}  "
+            f"{'  ' * item['level']}{item['module']}",
+            file=sys.stderr)
+
+    if arguments.output:
+        with open(arguments.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if arguments.compare:
+        with open(arguments.compare) as file:
+            baseline = json.load(file)
+        ratio = report['time_to_first_paint'] / baseline['time_to_first_paint']
+        mark = '  REGRESSION' if ratio > REGRESSION_RATIO else ''
+        print(f"\nfirst paint {ratio:.2f}x of {baseline.get('commit')}{mark}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
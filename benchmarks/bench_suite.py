@@ -0,0 +1,257 @@
+"""
+Headless benchmarks of model loading, navigation and data access on generated SQLite databases.
+
+For every size a database with a library of size entries and a process of size operations is generated, sizes
+given as library:process pairs generate the library and the process of different sizes, then
+    library_init     LibraryModel.__init__, operations_library is selected and the tree is built
+    process_init     ProcessModel.__init__, operations are selected and the tree is built
+    process_data     ProcessModel.data() of column 0 of all operations, walking the tree
+    map_to_source    ProcessModel.mapToSource() of all operations
+    next_traversal   Main.on_click_next from the first operation of the window, TRAVERSAL_STEPS steps at most
+are timed REPEAT times. Peak Python heap of every benchmark is measured in a separate run under tracemalloc,
+so that tracing does not distort the timings. Results are written as JSON, with the commit they were made on.
+
+Run from the repository root:
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_suite.py [--sizes 1000,10000,100000] [--output results.json]
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_suite.py --sizes 50000:1000,1000:100000
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_suite.py --output new.json --compare old.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from fixtures import open_qt_connection
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PySide6 import __version__ as pyside_version  # noqa: E402
+from PySide6.QtCore import QEvent, QModelIndex  # noqa: E402
+from PySide6.QtWidgets import QApplication  # noqa: E402
+
+from ProcessEditor.connections import ConnectionManager  # noqa: E402
+from ProcessEditor.generator import create_database  # noqa: E402
+from ProcessEditor.library_model import LibraryModel  # noqa: E402
+from ProcessEditor.main import Main  # noqa: E402
+from ProcessEditor.process_model import ProcessModel  # noqa: E402
+
+SIZES = (1_000, 10_000, 100_000)
+REPEAT = 3
+
+# steps of next_traversal, a step updates widgets of the window, so the whole tree of large sizes takes minutes
+TRAVERSAL_STEPS = 2_000
+
+# slowdown of a benchmark against the compared results, reported as a regression
+REGRESSION_RATIO = 1.2
+
+
+def parse_sizes(text: str) -> list[tuple[int, int]]:
+    """Returns pairs (library size, process size) of comma-separated sizes, 'size' or 'library:process'."""
+    sizes = []
+    for item in filter(None, text.split(',')):
+        library_size, _, process_size = item.partition(':')
+        sizes.append((int(library_size), int(process_size or library_size)))
+    return sizes
+
+
+def size_label(library_size: int, process_size: int) -> str:
+    return str(library_size) if library_size == process_size else f"{library_size}:{process_size}"
+
+
+def walk(model) -> list[QModelIndex]:
+    """Returns indexes of column 0 of all items of the model in pre-order."""
+    indexes = []
+    stack = [QModelIndex()]
+    while stack:
+        parent = stack.pop()
+        if parent.isValid():
+            indexes.append(parent)
+        stack.extend(model.index(row, 0, parent) for row in reversed(range(model.rowCount(parent))))
+    return indexes
+
+
+class Benchmarks:
+    """Benchmarks of one generated database. Every benchmark has a setup returning its argument, which is not timed."""
+
+    def __init__(self, path: str, library_size: int, process_size: int):
+        self.path = path
+        self.library_size = library_size
+        self.process_size = process_size
+        self.connection = open_qt_connection(path, f"bench_suite_{library_size}_{process_size}")
+        self.settings = {'connection': self.connection, 'process_version_id': 1, 'language_code': 'EN'}
+        self.process_model = ProcessModel(None, self.settings)
+        self.indexes = walk(self.process_model)
+        self._managers = []  # connection managers of closed windows
+
+    def cases(self) -> dict:
+        """Returns map of benchmark names to tuples (setup, benchmark)."""
+        return {
+            'library_init': (lambda: self.settings, lambda settings: LibraryModel(None, settings)),
+            'process_init': (lambda: self.settings, lambda settings: ProcessModel(None, settings)),
+            'process_data': (lambda: self.indexes, lambda indexes: [index.data() for index in indexes]),
+            'map_to_source': (
+                lambda: self.indexes, lambda indexes: [self.process_model.mapToSource(index) for index in indexes]),
+            'next_traversal': (self.open_window, self.traverse),
+        }
+
+    def items(self, name: str) -> int:
+        """Returns number of items processed by the benchmark."""
+        if name == 'library_init':
+            return self.library_size
+        return min(self.process_size, TRAVERSAL_STEPS) if name == 'next_traversal' else self.process_size
+
+    def open_window(self) -> Main:
+        manager = ConnectionManager({'driver': 'QSQLITE', 'database': self.path, 'health_check': False})
+        window = Main(manager)
+        window.show()  # models are loaded after the first paint
+        while window.process_version is None:
+            QApplication.processEvents()
+        window.settings['connection_manager'] = manager
+        return window
+
+    @staticmethod
+    def traverse(window: Main) -> int:
+        steps = 0
+        index = window.mapper_index()
+        while steps < TRAVERSAL_STEPS:
+            window.on_click_next()
+            steps += 1
+            if window.mapper_index() == index:
+                break  # the last operation
+            index = window.mapper_index()
+        return steps
+
+    def close_window(self, window) -> None:
+        if isinstance(window, Main):
+            self._managers.append(window.settings['connection_manager'])
+            window.close()
+            window.deleteLater()
+
+    def release_windows(self) -> None:
+        """Deletes closed windows and then removes their connections."""
+        QApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+        gc.collect()
+        for manager in self._managers:
+            manager.close_all()
+        self._managers = []
+
+    def run(self, name: str, repeat: int) -> dict:
+        setup, benchmark = self.cases()[name]
+        timings = []
+        for _ in range(repeat):
+            argument = setup()
+            start = time.perf_counter()
+            benchmark(argument)
+            timings.append(time.perf_counter() - start)
+            self.close_window(argument)
+
+        argument = setup()
+        tracemalloc.start()
+        benchmark(argument)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.close_window(argument)
+        del argument
+        self.release_windows()
+
+        return {
+            'name': name,
+            'library_size': self.library_size,
+            'process_size': self.process_size,
+            'repeat': repeat,
+            'best': min(timings),
+            'median': statistics.median(timings),
+            'per_item_us': min(timings) / self.items(name) * 1e6,
+            'peak_python_bytes': peak,
+        }
+
+
+def git_commit() -> [str, None]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: list[dict], baseline: dict) -> None:
+    """Prints timings relative to the baseline results, marks slowdowns over REGRESSION_RATIO."""
+    baseline_results = {(result['name'], *result_sizes(result)): result for result in baseline['results']}
+    print(f"\ncompared with {baseline.get('commit')}", file=sys.stderr)
+    for result in results:
+        old = baseline_results.get((result['name'], *result_sizes(result)))
+        if old is None:
+            continue
+        ratio = result['best'] / old['best'] if old['best'] else float('inf')
+        mark = '  REGRESSION' if ratio > REGRESSION_RATIO else ''
+        print(f"{result['name']:>16} {size_label(*result_sizes(result)):>14} {ratio:>8.2f}x{mark}", file=sys.stderr)
+
+
+def result_sizes(result: dict) -> tuple[int, int]:
+    """Returns library and process sizes of the result, results of earlier versions have one 'size'."""
+    return result.get('library_size', result.get('size')), result.get('process_size', result.get('size'))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--sizes', default=','.join(map(str, SIZES)),
+        help="comma-separated sizes of both the library and the process, or library:process pairs")
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--only', default='', help="comma-separated names of benchmarks to run")
+    parser.add_argument('--output', help="JSON file of results, printed to stdout if not set")
+    parser.add_argument('--compare', help="JSON file of earlier results")
+    arguments = parser.parse_args()
+
+    app = QApplication(sys.argv[:1])
+    directory = tempfile.mkdtemp(prefix='bench_suite_')
+    os.environ['XDG_CACHE_HOME'] = directory  # library snapshots of the window are written here
+    only = set(filter(None, arguments.only.split(',')))
+
+    results = []
+    print(f"{'benchmark':>16} {'size':>14} {'best, ms':>10} {'per item, us':>13} {'peak, MiB':>10}", file=sys.stderr)
+    for library_size, process_size in parse_sizes(arguments.sizes):
+        path = os.path.join(directory, f"bench_suite_{library_size}_{process_size}.sqlite")
+        create_database(path, library_size=library_size, operations=process_size)
+        benchmarks = Benchmarks(path, library_size, process_size)
+        for name in benchmarks.cases():
+            if only and name not in only:
+                continue
+            result = benchmarks.run(name, arguments.repeat)
+            results.append(result)
+            print(
+                f"{name:>16} {size_label(library_size, process_size):>14} {result['best'] * 1e3:>10.2f} "
+                f"{result['per_item_us']:>13.3f} "
+                f"{result['peak_python_bytes'] / 2 ** 20:>10.1f}", file=sys.stderr)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'pyside': pyside_version,
+        'platform': platform.platform(),
+        'max_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        'results': results,
+    }
+    if arguments.output:
+        with open(arguments.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if arguments.compare:
+        with open(arguments.compare) as file:
+            compare(results, json.load(file))
+    del app
+
+
+if __name__ == '__main__':
+    main()
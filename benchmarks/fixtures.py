@@ -0,0 +1,16 @@
+"""Connections to SQLite databases generated for benchmarks by ProcessEditor.generator."""
+import os
+import sys
+
+SOURCE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, SOURCE_DIR)
+
+
+def open_qt_connection(path: str, connection_name: str = 'benchmark'):
+    """Opens QSQLITE connection to the database file."""
+    from PySide6.QtSql import QSqlDatabase
+
+    connection = QSqlDatabase.addDatabase('QSQLITE', connection_name)
+    connection.setDatabaseName(path)
+    connection.open()
+    return connection
@@ -1 +1,5 @@
-from main import run
+def run() -> None:
+    """Start main window"""
+    # the GUI is imported on call, so that modules of the package can be imported without it
+    from ProcessEditor.main import run as run_main
+    run_main()
@@ -0,0 +1,162 @@
+import time
+from collections import deque
+
+from PySide6.QtCore import QCoreApplication, QDeadlineTimer, QEventLoop, QObject, QRunnable, QThreadPool, QTimer, Signal
+
+from ProcessEditor.operations_model import OperationsChanges
+from ProcessEditor.operations_writer import SaveError, save_operations
+from ProcessEditor.process_model import ProcessModel
+
+
+# milliseconds without edits before changes are written, if 'autosave_delay' is not set
+AUTOSAVE_DELAY = 2000
+
+# milliseconds after the first unsaved edit, when changes are written even if editing goes on
+AUTOSAVE_MAX_DELAY = 10000
+
+# number of last flushes kept for latency metrics
+LATENCY_HISTORY = 100
+
+
+class SaveSignals(QObject):
+    saved = Signal(object, object, float)  # changes, ids of inserted rows, seconds of writing
+    failed = Signal(object, str, float)  # changes, error message, seconds of writing
+
+
+class SaveTask(QRunnable):
+    """Writes changes in a thread of the pool with connection of the thread from settings['connection_manager']."""
+
+    def __init__(self, settings: dict, column_names: list[str], changes: OperationsChanges, signals: SaveSignals):
+        super().__init__()
+        self.settings = settings
+        self.column_names = column_names
+        self.changes = changes
+        self.signals = signals
+
+    def run(self) -> None:
+        start = time.perf_counter()
+        try:
+            connection = self.settings['connection_manager'].connection()
+            ids = save_operations(connection, self.column_names, self.changes)
+        except (SaveError, ConnectionError) as error:
+            self.signals.failed.emit(self.changes, str(error), time.perf_counter() - start)
+        else:
+            self.signals.saved.emit(self.changes, ids, time.perf_counter() - start)
+
+
+class AutosaveScheduler(QObject):
+    """
+    Writes edits of the process model in the background. Edits are coalesced per operation by the source model,
+    every changed row is written once per flush with its latest values. A flush starts when there were no edits
+    for 'autosave_delay' ms, but not later than 'autosave_max_delay' ms after the first unsaved edit.
+    Only one flush runs at a time, so edits are written in the order they were made.
+    Failed changes are kept and written again with the next flush.
+    """
+    saved = Signal(int, float)  # number of saved rows, seconds of writing
+    failed = Signal(str)  # error message
+
+    def __init__(self, parent: QObject, process_model: ProcessModel, settings: dict):
+        super().__init__(parent)
+        self.settings = settings
+        self._source_model = process_model.sourceModel()
+        self._delay = settings.get('autosave_delay', AUTOSAVE_DELAY)
+        self._max_delay = settings.get('autosave_max_delay', AUTOSAVE_MAX_DELAY)
+        self._first_change_time = None  # monotonic time of the first edit not taken by a flush
+        self._in_flight = None  # changes being written
+        self._is_flush_requested = False
+
+        self.flush_count = 0
+        self.failure_count = 0
+        self.saved_rows = 0
+        self._latencies = deque(maxlen=LATENCY_HISTORY)
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.flush)
+
+        self._signals = SaveSignals(self)
+        self._signals.saved.connect(self._on_saved)
+        self._signals.failed.connect(self._on_failed)
+
+        self._source_model.dataChanged.connect(self._on_changed)
+        self._source_model.rowsInserted.connect(self._on_changed)
+        self._source_model.rowsRemoved.connect(self._on_changed)
+
+    def queue_depth(self) -> int:
+        """Returns number of rows waiting to be written, including rows being written."""
+        return self._source_model.changes_count() + (len(self._in_flight) if self._in_flight is not None else 0)
+
+    def metrics(self) -> dict:
+        latencies = list(self._latencies)
+        return {
+            'queue_depth': self.queue_depth(),
+            'flushes': self.flush_count,
+            'failures': self.failure_count,
+            'saved_rows': self.saved_rows,
+            'last_latency': latencies[-1] if latencies else None,
+            'mean_latency': sum(latencies) / len(latencies) if latencies else None,
+            'max_latency': max(latencies) if latencies else None,
+        }
+
+    def is_idle(self) -> bool:
+        """Returns True if no changes are waiting to be written or being written."""
+        return self._in_flight is None and not self._is_flush_requested and not self._source_model.has_changes()
+
+    def flush(self) -> None:
+        """Starts writing of pending changes in the background, or after the running flush."""
+        if self._in_flight is not None:
+            self._is_flush_requested = True
+            return
+        self._timer.stop()
+        self._first_change_time = None
+        changes = self._source_model.take_changes()
+        if not len(changes):
+            return
+        self._in_flight = changes
+        QThreadPool.globalInstance().start(
+            SaveTask(self.settings, self._source_model.column_names(), changes, self._signals))
+
+    def finish(self, timeout: int = 30000) -> bool:
+        """
+        Writes pending changes and waits for the end of writing, e.g. before the window is closed.
+        Returns False if changes are left unsaved.
+        """
+        deadline = QDeadlineTimer(timeout)
+        self.flush()
+        while (self._in_flight is not None or self._is_flush_requested) and not deadline.hasExpired():
+            QCoreApplication.processEvents(QEventLoop.AllEvents, 50)
+        return self._in_flight is None and not self._source_model.has_changes()
+
+    def _on_changed(self, *_) -> None:
+        if not self._source_model.has_changes():
+            return
+        now = time.monotonic()
+        if self._first_change_time is None:
+            self._first_change_time = now
+        remaining = self._max_delay - (now - self._first_change_time) * 1000
+        self._timer.start(max(0, int(min(self._delay, remaining))))
+
+    def _on_saved(self, changes: OperationsChanges, ids: list, seconds: float) -> None:
+        self._in_flight = None
+        self._source_model.set_inserted_ids(changes, ids)
+        self.flush_count += 1
+        self.saved_rows += len(changes)
+        self._latencies.append(seconds)
+        self.saved.emit(len(changes), seconds)
+        self._continue()
+
+    def _on_failed(self, changes: OperationsChanges, message: str, seconds: float) -> None:
+        self._in_flight = None
+        self._source_model.restore_changes(changes)
+        self.failure_count += 1
+        self._latencies.append(seconds)
+        self.failed.emit(message)
+        self._is_flush_requested = False
+        self._on_changed()  # try again after the delay
+
+    def _continue(self) -> None:
+        if self._is_flush_requested:
+            self._is_flush_requested = False
+            self.flush()
+        elif self._source_model.has_changes() and not self._timer.isActive():
+            self._on_changed()
@@ -0,0 +1,200 @@
+import configparser
+import itertools
+import os
+import threading
+import time
+
+from PySide6.QtCore import QObject, QThread, QThreadPool, Qt, Slot
+from PySide6.QtSql import QSqlDatabase
+
+from ProcessEditor.queries import QueryError, execute, release_connection
+
+
+DEFAULT_CONFIG = {
+    'driver': 'QPSQL',
+    'host': 'localhost',
+    'port': 5432,
+    'database': 'forgelab_2',
+    'user': 'postgres',
+    'password': '2008',
+    'pool_size': 0,  # maximum number of open connections of all threads, 0 for one per thread of the global pool
+    'checkout_timeout': 30.0,  # seconds to wait for a free connection
+    'reconnect_attempts': 3,
+    'reconnect_delay': 0.5,  # seconds between reconnect attempts
+    'health_check': True,  # run 'SELECT 1' on every checkout
+}
+
+# path of the config file, if it is not given explicitly
+CONFIG_PATH_VARIABLE = 'PROCESS_EDITOR_DB_CONFIG'
+DEFAULT_CONFIG_PATH = os.path.join(os.path.expanduser('~'), '.config', 'ProcessEditor', 'database.ini')
+
+# prefix of environment variables overriding values of the config file, e.g. PROCESS_EDITOR_DB_HOST
+ENVIRONMENT_PREFIX = 'PROCESS_EDITOR_DB_'
+
+
+def load_database_config(path: [str, None] = None, environ: dict = None) -> dict:
+    """
+    Returns connection settings. Defaults are overridden by section [database] of the ini file
+    and then by PROCESS_EDITOR_DB_* environment variables, e.g.
+
+        [database]
+        driver = QSQLITE
+        database = /path/to/forgelab.sqlite
+    """
+    environ = os.environ if environ is None else environ
+    config = dict(DEFAULT_CONFIG)
+
+    parser = configparser.ConfigParser()
+    parser.read(path or environ.get(CONFIG_PATH_VARIABLE, DEFAULT_CONFIG_PATH))
+    values = dict(parser['database']) if parser.has_section('database') else {}
+    values.update(
+        (key, environ[ENVIRONMENT_PREFIX + key.upper()]) for key in DEFAULT_CONFIG
+        if ENVIRONMENT_PREFIX + key.upper() in environ)
+
+    for key, value in values.items():
+        if key not in DEFAULT_CONFIG:
+            continue
+        default = DEFAULT_CONFIG[key]
+        if isinstance(default, bool):
+            config[key] = value.strip().lower() in ('1', 'true', 'yes', 'on')
+        else:
+            config[key] = type(default)(value)
+    return config
+
+
+class ConnectionManager(QObject):
+    """
+    Hands out QSqlDatabase connections to threads. Qt connections can only be used in the thread that opened them,
+    so every thread gets its own named connection, which is reused by the thread on following checkouts.
+    Number of open connections is bounded by pool_size, a thread waits for a free slot up to checkout_timeout.
+    Connection of a QThread is removed when the thread finishes, others are removed by release() or close_all().
+    Threads of the global QThreadPool keep their connections between tasks, so the pool gets pool_size - 1 threads,
+    one slot is left to the GUI thread. With pool_size 0 the slots are derived from the size of the thread pool.
+    """
+    _manager_numbers = itertools.count()
+
+    def __init__(self, config: dict = None, parent: QObject = None):
+        super().__init__(parent)
+        self.config = dict(DEFAULT_CONFIG, **(config or {}))
+        self._prefix = f"ProcessEditor_{next(self._manager_numbers)}"
+        self._connection_numbers = itertools.count()
+        thread_pool = QThreadPool.globalInstance()
+        if self.config['pool_size'] <= 0:
+            self.config['pool_size'] = thread_pool.maxThreadCount() + 1
+        elif thread_pool.maxThreadCount() >= self.config['pool_size']:
+            # a pool thread without a slot would wait for a connection of another pool thread, which is never freed
+            thread_pool.setMaxThreadCount(max(1, self.config['pool_size'] - 1))
+        self._slots = threading.BoundedSemaphore(self.config['pool_size'])
+        self._lock = threading.Lock()
+        # map of thread idents to connection names; Python thread-locals are not kept between calls from Qt threads
+        self._connection_names = {}
+        self._watched_threads = set()  # idents of threads, whose finished signal releases their connections
+
+    @property
+    def open_count(self) -> int:
+        with self._lock:
+            return len(self._connection_names)
+
+    def connection(self) -> QSqlDatabase:
+        """
+        Returns open connection of the current thread, opens it on the first call.
+        Checks health of the connection and reconnects if it is broken.
+        Raises ConnectionError if there is no free slot or the database can not be reached.
+        """
+        with self._lock:
+            name = self._connection_names.get(threading.get_ident())
+        if name is None:
+            return self._open_thread_connection()
+        connection = QSqlDatabase.database(name, open=False)
+        if not connection.isValid():
+            # the connection was left by a finished thread having the same ident
+            del connection
+            self._remove(threading.get_ident())
+            return self._open_thread_connection()
+        if not self._is_healthy(connection) and not self._reconnect(connection):
+            raise ConnectionError(self._error_message(connection))
+        return connection
+
+    @Slot()
+    def release(self) -> None:
+        """Closes and removes connection of the current thread and frees its slot."""
+        with self._lock:
+            name = self._connection_names.get(threading.get_ident())
+        if name is None:
+            return
+        connection = QSqlDatabase.database(name, open=False)
+        connection.close()
+        del connection
+        self._remove(threading.get_ident())
+
+    def close_all(self) -> None:
+        """Removes connections of all threads. Call it when no other thread uses the database, e.g. on exit."""
+        with self._lock:
+            idents = list(self._connection_names)
+        for ident in idents:
+            self._remove(ident)
+
+    @Slot()
+    def _on_thread_finished(self) -> None:
+        self.release()
+        self._watched_threads.discard(threading.get_ident())
+
+    def _open_thread_connection(self) -> QSqlDatabase:
+        if not self._slots.acquire(timeout=self.config['checkout_timeout']):
+            raise ConnectionError(f"No free database connection in {self.config['checkout_timeout']} s")
+        ident = threading.get_ident()
+        name = f"{self._prefix}_{next(self._connection_numbers)}"
+        with self._lock:
+            self._connection_names[ident] = name
+        connection = QSqlDatabase.addDatabase(self.config['driver'], name)
+        connection.setHostName(self.config['host'])
+        connection.setPort(self.config['port'])
+        connection.setDatabaseName(self.config['database'])
+        connection.setUserName(self.config['user'])
+        connection.setPassword(self.config['password'])
+        if not self._reconnect(connection):
+            message = self._error_message(connection)
+            del connection
+            self._remove(ident)
+            raise ConnectionError(message)
+
+        thread = QThread.currentThread()
+        if thread is not None and ident not in self._watched_threads:
+            # finished is emitted in the finishing thread, the main thread never emits it
+            thread.finished.connect(self._on_thread_finished, Qt.DirectConnection)
+            self._watched_threads.add(ident)
+        return connection
+
+    def _reconnect(self, connection: QSqlDatabase) -> bool:
+        """Opens the connection again. Returns False if all attempts fail."""
+        release_connection(connection.connectionName())  # queries prepared on the broken session are invalid
+        for attempt in range(max(1, self.config['reconnect_attempts'])):
+            if attempt:
+                time.sleep(self.config['reconnect_delay'])
+            connection.close()
+            if connection.open():
+                return True
+        return False
+
+    def _is_healthy(self, connection: QSqlDatabase) -> bool:
+        if not connection.isOpen():
+            return False
+        if not self.config['health_check']:
+            return True
+        try:
+            execute(connection, "SELECT 1").finish()
+        except QueryError:
+            return False
+        return True
+
+    def _error_message(self, connection: QSqlDatabase) -> str:
+        return connection.lastError().text() or f"Can not open database {self.config['database']}"
+
+    def _remove(self, ident: int) -> None:
+        with self._lock:
+            name = self._connection_names.pop(ident, None)
+        if name is None:
+            return
+        release_connection(name)
+        QSqlDatabase.removeDatabase(name)
+        self._slots.release()
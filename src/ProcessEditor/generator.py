@@ -0,0 +1,277 @@
+"""
+Synthetic operations_library and operations tables in SQLite for load and scale testing.
+
+The library is a tree of operation types of the given depth and average fan-out. Every type has names
+in all languages and up to max_parameters parameters with pipe-delimited labels, labels_regex and db_column_names.
+Every process version is a tree of operations typed by children of the type of their parent operation, so
+the process looks like the library it was made from. Rows are generated lazily and written with executemany
+in batches inside one transaction, so millions of operations take seconds and little memory.
+
+    python -m ProcessEditor.generator forgelab.sqlite --library-size 10000 --operations 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import string
+import sys
+import time
+from collections import deque
+from typing import Iterator
+
+from ProcessEditor.library_model import LANGUAGE_MARKER
+from ProcessEditor.queries import LIBRARY_COLUMNS, LIBRARY_VERSION_SCRIPT
+
+
+LANGUAGE_CODES = ('EN', 'RU', 'DE', 'FR', 'ES', 'IT', 'ZH', 'JA', 'PL', 'CS')
+
+# labels_regex of parameters and makers of values matching them, patterns have no '|' as it delimits values
+PARAMETER_KINDS = (
+    (r'^\d+$', lambda rng: str(rng.randint(0, 10_000))),
+    (r'^\d+(\.\d+)?$', lambda rng: f"{rng.uniform(0, 1_000):.2f}"),
+    (r'^[A-Za-z ]*$', lambda rng: ''.join(rng.choices(string.ascii_letters, k=rng.randint(3, 12)))),
+    (r'^[01]$', lambda rng: rng.choice(('0', '1'))),
+)
+
+DEFAULT_SHAPE = {
+    'library_size': 1_000,
+    'operations': 10_000,  # per process version
+    'process_versions': 1,
+    'library_depth': 4,
+    'library_fan_out': 8,  # average number of child types
+    'process_depth': 6,
+    'process_fan_out': 4,  # average number of child operations
+    'languages': 2,
+    'max_parameters': 8,
+    'label_length': 16,  # characters of a label or a name
+    'batch_size': 10_000,  # rows per executemany
+    'seed': 0,
+}
+
+
+class LibraryShape:
+    """Operation types of a generated library, from which types of generated operations are picked."""
+    __slots__ = ('child_type_ids', 'parameter_kinds')
+
+    def __init__(self):
+        self.child_type_ids = {}  # map of type_ids to child type_ids
+        self.parameter_kinds = {}  # map of type_ids to indexes of PARAMETER_KINDS of their parameters
+
+
+def create_database(path: str, **shape) -> str:
+    """
+    Writes operations_library and operations of the shape (see DEFAULT_SHAPE) to a new SQLite file.
+    An existing file is replaced. Returns the path.
+    """
+    shape = dict(DEFAULT_SHAPE, **shape)
+    if os.path.exists(path):
+        os.remove(path)
+    connection = sqlite3.connect(path)
+    # the file is rebuilt from scratch on failure, so durability is traded for speed of the bulk load
+    connection.execute("PRAGMA journal_mode = OFF")
+    connection.execute("PRAGMA synchronous = OFF")
+    try:
+        rng = random.Random(shape['seed'])
+        library = write_library(connection, rng, **shape)
+        for process_version_id in range(1, shape['process_versions'] + 1):
+            write_operations(connection, library, rng, process_version_id=process_version_id, **shape)
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS operations_tree ON operations (process_version_id, parent_id, order_id)")
+        connection.commit()
+    finally:
+        connection.close()
+    return path
+
+
+def write_library(connection: sqlite3.Connection, rng: random.Random, **shape) -> LibraryShape:
+    """Creates and fills operations_library. Returns the shape of the written library."""
+    shape = dict(DEFAULT_SHAPE, **shape)
+    connection.execute(
+        """
+        CREATE TABLE operations_library (
+            text_id VARCHAR(511) NOT NULL,
+            type_id INTEGER PRIMARY KEY,
+            parent_type_id INTEGER,
+            order_id BIGINT NOT NULL,
+            allow_copies BOOL NOT NULL DEFAULT FALSE,
+            library_name VARCHAR(511) NOT NULL,
+            process_name VARCHAR(511) NOT NULL,
+            labels VARCHAR(4095) DEFAULT NULL,
+            labels_regex VARCHAR(4095) DEFAULT NULL,
+            db_column_names VARCHAR(2047) DEFAULT NULL,
+            is_obsolete BOOL NOT NULL DEFAULT FALSE
+        )
+        """)
+    library = LibraryShape()
+    rows = generate_library(library, rng, **shape)
+    _insert(connection, 'operations_library', LIBRARY_COLUMNS, rows, shape['batch_size'])
+    # triggers are created after the bulk insert, which would fire them for every row
+    connection.executescript(LIBRARY_VERSION_SCRIPT)
+    return library
+
+
+def write_operations(
+        connection: sqlite3.Connection, library: LibraryShape, rng: random.Random, process_version_id: int = 1,
+        **shape) -> None:
+    """Creates operations if it is missing and appends operations of the process version."""
+    shape = dict(DEFAULT_SHAPE, **shape)
+    columns = operations_columns(shape['max_parameters'])
+    connection.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS operations (
+            id INTEGER PRIMARY KEY,
+            parent_id INTEGER,
+            type_id INTEGER NOT NULL,
+            parent_type_id INTEGER,
+            order_id BIGINT NOT NULL,
+            process_version_id INTEGER NOT NULL,
+            {', '.join(f"{name} VARCHAR(255)" for name in columns[6:])}
+        )
+        """)
+    first_id = connection.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM operations").fetchone()[0]
+    rows = generate_operations(library, rng, first_id, process_version_id, **shape)
+    _insert(connection, 'operations', columns, rows, shape['batch_size'])
+
+
+def operations_columns(max_parameters: int) -> tuple[str, ...]:
+    return (
+        'id', 'parent_id', 'type_id', 'parent_type_id', 'order_id', 'process_version_id',
+        *(f"parameter_{i}" for i in range(max_parameters)),
+    )
+
+
+def generate_library(library: LibraryShape, rng: random.Random, **shape) -> Iterator[tuple]:
+    """
+    Yields rows of operations_library in order of LIBRARY_COLUMNS, breadth-first from the root type 1,
+    and records the tree and parameters of the types in library.
+    """
+    shape = dict(DEFAULT_SHAPE, **shape)
+    size, depth, fan_out = shape['library_size'], shape['library_depth'], shape['library_fan_out']
+    languages = LANGUAGE_CODES[:max(1, min(shape['languages'], len(LANGUAGE_CODES)))]
+
+    levels = [0, 0]  # levels of type_ids, type 0 is the parent of the root
+    parents = deque([1])  # types that may get children
+    yield _library_row(library, rng, shape, languages, 1, None, 1)
+    type_id = 2
+    while type_id <= size:
+        if not parents:
+            # the tree is full for its depth, types above the last level get more children
+            candidates = [candidate for candidate in range(1, type_id) if levels[candidate] < depth] or [1]
+            rng.shuffle(candidates)
+            parents.extend(candidates)
+        parent_type_id = parents.popleft()
+        children = library.child_type_ids.setdefault(parent_type_id, [])
+        for _ in range(min(rng.randint(1, 2 * fan_out - 1), size - type_id + 1)):
+            levels.append(levels[parent_type_id] + 1)
+            if levels[type_id] < depth:
+                parents.append(type_id)
+            yield _library_row(library, rng, shape, languages, type_id, parent_type_id, len(children) + 1)
+            children.append(type_id)
+            type_id += 1
+
+
+def generate_operations(
+        library: LibraryShape, rng: random.Random, first_id: int = 1, process_version_id: int = 1,
+        **shape) -> Iterator[tuple]:
+    """
+    Yields shape['operations'] rows of operations of the process version in pre-order, ids start from first_id.
+    Children are typed by child types of the type of their parent, operations of leaf types by any type.
+    Only the path from the root to the current operation is kept, so the number of rows is not limited by memory.
+    """
+    shape = dict(DEFAULT_SHAPE, **shape)
+    count, depth, fan_out = shape['operations'], shape['process_depth'], shape['process_fan_out']
+    type_ids = range(1, len(library.parameter_kinds) + 1)
+    no_values = (None,) * shape['max_parameters']
+
+    operation_id = first_id
+    top_level_count = 0
+    stack = []  # path of [operation_id, type_id, level, children left, children written]
+    while operation_id < first_id + count:
+        if not stack:
+            top_level_count += 1
+            parent_id, parent_type_id, level, order_id = None, None, 0, top_level_count
+            candidates = library.child_type_ids.get(1) or type_ids
+        else:
+            parent = stack[-1]
+            if not parent[3]:
+                stack.pop()
+                continue
+            parent[3] -= 1
+            parent[4] += 1
+            parent_id, parent_type_id, level, order_id = parent[0], parent[1], parent[2] + 1, parent[4]
+            candidates = library.child_type_ids.get(parent_type_id) or type_ids
+        type_id = rng.choice(candidates)
+        kinds = library.parameter_kinds.get(type_id, ())
+        values = tuple(PARAMETER_KINDS[kind][1](rng) for kind in kinds) + no_values[len(kinds):]
+        yield operation_id, parent_id, type_id, parent_type_id, order_id * 10, process_version_id, *values
+        children_count = rng.randint(0, 2 * fan_out) if level + 1 < depth else 0
+        stack.append([operation_id, type_id, level, children_count, 0])
+        operation_id += 1
+
+
+def _library_row(
+        library: LibraryShape, rng: random.Random, shape: dict, languages: tuple, type_id: int,
+        parent_type_id: [int, None], order_id: int) -> tuple:
+    kinds = tuple(rng.randrange(len(PARAMETER_KINDS)) for _ in range(rng.randint(0, shape['max_parameters'])))
+    library.parameter_kinds[type_id] = kinds
+    length = shape['label_length']
+    return (
+        f"operation_{type_id}",
+        type_id,
+        parent_type_id,
+        order_id * 10,
+        rng.random() < 0.5,
+        _language_string({code: [_text(rng, f"{code} type {type_id} ", length)] for code in languages}),
+        _language_string({code: [_text(rng, f"{code} operation {type_id} ", length)] for code in languages}),
+        _language_string({
+            code: [_text(rng, f"{code} parameter {i} ", length) for i in range(len(kinds))] for code in languages}),
+        _language_string({code: [PARAMETER_KINDS[kind][0] for kind in kinds] for code in languages}),
+        '|'.join(f"parameter_{i}" for i in range(len(kinds))) or None,
+        rng.random() < 0.01,
+    )
+
+
+def _language_string(values_by_language: dict[str, list[str]]) -> [str, None]:
+    """Returns pipe-delimited string of values of all languages, None if there are no values."""
+    if not any(values_by_language.values()):
+        return None
+    return '|'.join(
+        f"{LANGUAGE_MARKER}|{language_code}|" + '|'.join(values)
+        for language_code, values in values_by_language.items())
+
+
+def _text(rng: random.Random, prefix: str, length: int) -> str:
+    """Returns text of the length starting with the prefix and padded with random letters."""
+    return (prefix + ''.join(rng.choices(string.ascii_lowercase, k=max(0, length - len(prefix)))))[:max(length, 1)]
+
+
+def _insert(connection: sqlite3.Connection, table: str, columns: tuple, rows: Iterator[tuple], batch_size: int) -> None:
+    statement = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            connection.executemany(statement, batch)
+            batch = []
+    if batch:
+        connection.executemany(statement, batch)
+
+
+def main(arguments: list[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n\n')[0])
+    parser.add_argument('path', help="SQLite file, replaced if it exists")
+    for key, default in DEFAULT_SHAPE.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=int, default=default)
+    shape = vars(parser.parse_args(arguments))
+    path = shape.pop('path')
+
+    start = time.perf_counter()
+    create_database(path, **shape)
+    print(
+        f"{path}: {shape['library_size']} operation types, "
+        f"{shape['operations'] * shape['process_versions']} operations in {time.perf_counter() - start:.1f} s",
+        file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+"""
+Opt-in timing of hot paths: model methods called by views, load phases of the library, SQL statements and
+slots of the main window. Nothing is wrapped until enable() is called, so disabled instrumentation costs nothing.
+enable() replaces the targets by timing wrappers in their classes and in every ProcessEditor module referring to
+them, so it has to be called before the window is created: signals keep the slots they were connected to.
+
+    PROCESS_EDITOR_INSTRUMENT=/tmp/timings.json PROCESS_EDITOR_PROFILE=Main.on_click_next python start_main.py
+
+writes histograms of all targets to /tmp/timings.json (or .csv) on exit and cProfile statistics of
+Main.on_click_next to /tmp/timings.prof.
+"""
+import bisect
+import cProfile
+import csv
+import functools
+import importlib
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+# targets timed by default, 'module:attribute path'
+DEFAULT_TARGETS = (
+    'ProcessEditor.process_model:ProcessModel.data',
+    'ProcessEditor.process_model:ProcessModel.index',
+    'ProcessEditor.process_model:ProcessModel.parent',
+    'ProcessEditor.process_model:ProcessModel.mapToSource',
+    'ProcessEditor.process_model:ProcessModel.fetchMore',
+    'ProcessEditor.process_model:ProcessModel._preorder',
+    'ProcessEditor.process_model:select_operations',
+    'ProcessEditor.library_model:read_library',
+    'ProcessEditor.library_model:iter_library_rows',
+    'ProcessEditor.library_model:build_library',
+    'ProcessEditor.library_model:LibraryModel._set_rows',
+    'ProcessEditor.library_cache:LibrarySnapshot.load',
+    'ProcessEditor.queries:execute',
+    'ProcessEditor.operations_writer:save_operations',
+    'ProcessEditor.main:Main.on_click_next',
+    'ProcessEditor.main:Main.on_click_previous',
+    'ProcessEditor.main:Main.on_click_process_editor_view',
+    'ProcessEditor.main:Main.on_doubleclick_library_view',
+    'ProcessEditor.main:Main.update_parameter_line_edits',
+    'ProcessEditor.main:Main.show_process_version',
+    'ProcessEditor.main:Main.save_process',
+)
+
+# targets taking the SQL statement as the second argument, statements are timed one by one in addition
+STATEMENT_TARGETS = ('queries.execute',)
+STATEMENT_NAME_LENGTH = 80
+
+# environment variables read by enable_from_environment()
+OUTPUT_VARIABLE = 'PROCESS_EDITOR_INSTRUMENT'
+PROFILE_VARIABLE = 'PROCESS_EDITOR_PROFILE'
+
+# upper bounds of histogram buckets, microseconds
+BUCKET_BOUNDS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1_000, 2_000, 5_000, 10_000, 20_000, 50_000, 100_000, 1_000_000)
+
+
+class Histogram:
+    """Number and durations of calls of one target, durations are counted in logarithmic buckets."""
+    __slots__ = ('count', 'total', 'minimum', 'maximum', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = 0.0
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)  # the last bucket counts calls over all bounds
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.minimum = seconds if self.minimum is None else min(self.minimum, seconds)
+        self.maximum = max(self.maximum, seconds)
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS, seconds * 1e6)] += 1
+
+    def percentile(self, fraction: float) -> [float, None]:
+        """Returns upper bound of the bucket of the percentile in microseconds, None if it is over all bounds."""
+        rank = fraction * self.count
+        for bound, accumulated in zip(BUCKET_BOUNDS, _accumulate(self.buckets)):
+            if accumulated >= rank:
+                return bound
+        return None
+
+    def summary(self) -> dict:
+        return {
+            'count': self.count,
+            'total_s': self.total,
+            'mean_us': self.total / self.count * 1e6 if self.count else None,
+            'min_us': self.minimum * 1e6 if self.minimum is not None else None,
+            'max_us': self.maximum * 1e6,
+            'p50_us': self.percentile(0.5),
+            'p95_us': self.percentile(0.95),
+            'p99_us': self.percentile(0.99),
+        }
+
+
+_histograms = {}  # map of names of targets and timers to histograms
+_histograms_lock = threading.Lock()  # loads and saves are timed in threads of the pool
+_patches = []  # tuples (owner, attribute name, original value) to restore on disable
+_profiler = None
+_profile_path = None
+_profile_depth = 0  # nesting of calls of the profiled target
+
+
+def is_enabled() -> bool:
+    return bool(_patches)
+
+
+def enable(targets=DEFAULT_TARGETS, profile: [str, None] = None, profile_path: [str, None] = None) -> None:
+    """
+    Wraps the targets ('module:attribute path') by timers. Histograms are named 'Class.method' for methods
+    and 'module.function' for functions. The profile target, given by such a name, additionally runs under cProfile,
+    statistics are written to profile_path by export().
+    """
+    global _profiler, _profile_path
+    if is_enabled():
+        disable()
+    if profile:
+        _profiler = cProfile.Profile()
+        _profile_path = profile_path
+    for target in targets:
+        module_name, path = target.split(':')
+        owner = importlib.import_module(module_name)
+        *owner_path, attribute = path.split('.')
+        for owner_name in owner_path:
+            owner = getattr(owner, owner_name)
+        original = owner.__dict__[attribute]
+        name = path if owner_path else f"{module_name.rsplit('.', 1)[-1]}.{path}"
+        wrapper = _timed(name, original, name == profile)
+        _replace(owner, attribute, original, wrapper)
+        if isinstance(owner, type(sys)):
+            # modules refer to functions imported from other modules by their own names
+            for module in list(sys.modules.values()):
+                if module is not owner and module.__name__.startswith('ProcessEditor'):
+                    for module_attribute, value in list(vars(module).items()):
+                        if value is original:
+                            _replace(module, module_attribute, original, wrapper)
+
+
+def disable() -> None:
+    """Restores the targets. Collected histograms are kept until reset()."""
+    global _profiler
+    while _patches:
+        owner, attribute, original = _patches.pop()
+        setattr(owner, attribute, original)
+    _profiler = None
+
+
+def reset() -> None:
+    _histograms.clear()
+
+
+def record(name: str, seconds: float) -> None:
+    """Adds a duration to the histogram of the name."""
+    with _histograms_lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.add(seconds)
+
+
+@contextmanager
+def timer(name: str):
+    """Times the block under the name, e.g. a phase that is not a function of its own."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def histograms() -> dict[str, dict]:
+    """Returns summaries of histograms by names, sorted by total time."""
+    return {
+        name: histogram.summary()
+        for name, histogram in sorted(_histograms.items(), key=lambda item: item[1].total, reverse=True)
+    }
+
+
+def export(path: str) -> None:
+    """Writes histograms to the JSON file, or to the CSV file if the path ends with .csv, and profile statistics."""
+    if path.lower().endswith('.csv'):
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(
+                ['name', 'count', 'total_s', 'mean_us', 'min_us', 'max_us', 'p50_us', 'p95_us', 'p99_us']
+                + [f"le_{bound}_us" for bound in BUCKET_BOUNDS] + ['over_us'])
+            for name, histogram in sorted(_histograms.items(), key=lambda item: item[1].total, reverse=True):
+                writer.writerow([name, *histogram.summary().values(), *histogram.buckets])
+    else:
+        with open(path, 'w') as file:
+            json.dump({
+                'bucket_bounds_us': BUCKET_BOUNDS,
+                'histograms': {
+                    name: dict(summary, buckets=_histograms[name].buckets)
+                    for name, summary in histograms().items()
+                },
+            }, file, indent=2)
+    if _profiler is not None:
+        _profiler.dump_stats(_profile_path or os.path.splitext(path)[0] + '.prof')
+
+
+def enable_from_environment(environ: dict = None) -> [str, None]:
+    """
+    Enables instrumentation if PROCESS_EDITOR_INSTRUMENT names the output file.
+    PROCESS_EDITOR_PROFILE names the target run under cProfile. Returns the output file.
+    """
+    environ = os.environ if environ is None else environ
+    path = environ.get(OUTPUT_VARIABLE)
+    if path:
+        enable(profile=environ.get(PROFILE_VARIABLE))
+    return path
+
+
+def _timed(name: str, original, is_profiled: bool):
+    function = original.__func__ if isinstance(original, (staticmethod, classmethod)) else original
+    is_statement = name in STATEMENT_TARGETS
+
+    if inspect.isgeneratorfunction(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            # time spent in the generator, not in the consumer of its items
+            elapsed = 0.0
+            iterator = function(*args, **kwargs)
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    elapsed += time.perf_counter() - start
+                yield item
+            record(name, elapsed)
+    else:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            global _profile_depth
+            profiler = _profiler if is_profiled else None
+            if profiler is not None:
+                _profile_depth += 1
+                if _profile_depth == 1:
+                    profiler.enable()
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - start
+                record(name, seconds)
+                if is_statement and len(args) > 1 and isinstance(args[1], str):
+                    record(f"sql: {' '.join(args[1].split())[:STATEMENT_NAME_LENGTH]}", seconds)
+                if profiler is not None:
+                    _profile_depth -= 1
+                    if not _profile_depth:
+                        profiler.disable()
+
+    return type(original)(wrapper) if isinstance(original, (staticmethod, classmethod)) else wrapper
+
+
+def _replace(owner, attribute: str, original, wrapper) -> None:
+    _patches.append((owner, attribute, original))
+    setattr(owner, attribute, wrapper)
+
+
+def _accumulate(values: list[int]):
+    total = 0
+    for value in values:
+        total += value
+        yield total
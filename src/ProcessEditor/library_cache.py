@@ -0,0 +1,102 @@
+import hashlib
+import itertools
+import os
+import pickle
+from typing import Iterable
+
+from PySide6.QtCore import QStandardPaths
+from PySide6.QtSql import QSqlDatabase
+
+from ProcessEditor.queries import SELECT_LIBRARY_TOKEN, QueryError, execute
+
+
+SNAPSHOT_VERSION = 4
+
+# rows per pickle of the snapshot file, the header and the chunks of rows are pickled one after another
+SNAPSHOT_CHUNK_ROWS = 1000
+
+
+def default_cache_directory() -> str:
+    """Returns directory for snapshots under the user cache dir."""
+    _directory = QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation)
+    if not _directory:
+        _directory = os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(_directory, 'ProcessEditor')
+
+
+class LibrarySnapshot:
+    """
+    Local copy of operations_library rows stored in a pickle file of the user cache dir.
+    Snapshot file is chosen by the database the connection points to and is valid while
+    change token of the table is the same as at the moment of saving.
+    """
+
+    def __init__(self, connection: QSqlDatabase, directory: [str, None] = None):
+        self.connection = connection
+        _database = '|'.join((
+            connection.driverName(), connection.hostName(), str(connection.port()), connection.databaseName()))
+        _file_name = f"operations_library_{hashlib.sha1(_database.encode()).hexdigest()[:16]}.pickle"
+        self.path = os.path.join(directory or default_cache_directory(), _file_name)
+
+    def token(self) -> [str, None]:
+        """Returns change token of operations_library, None if the driver has none or it can not be queried."""
+        _statement = SELECT_LIBRARY_TOKEN.get(self.connection.driverName())
+        if _statement is None:
+            return None
+        try:
+            query = execute(self.connection, _statement)
+        except QueryError:
+            return None
+        _token = None
+        if query.next():
+            _token = '|'.join(str(query.value(_column)) for _column in range(query.record().count()))
+        query.finish()
+        return _token
+
+    def load(self, token: [str, None]) -> [list[tuple], None]:
+        """Returns rows of the snapshot if it was saved with the token, otherwise None."""
+        if token is None:
+            return None
+        _rows = []
+        try:
+            with open(self.path, 'rb') as _file:
+                _header = pickle.load(_file)
+                if not isinstance(_header, dict):
+                    return None
+                if _header.get('version') != SNAPSHOT_VERSION or _header.get('token') != token:
+                    return None
+                while True:
+                    _chunk = pickle.load(_file)
+                    if _chunk is None:
+                        break
+                    _rows.extend(_chunk)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError, TypeError):
+            return None
+        return _rows
+
+    def save(self, token: [str, None], rows: Iterable[tuple]) -> bool:
+        """
+        Replaces the snapshot file atomically. Rows are pickled in chunks while they are iterated,
+        so no list of all rows is built. Returns False if the file can not be written.
+        """
+        if token is None:
+            return False
+        _temporary_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(_temporary_path, 'wb') as _file:
+                _pickler = pickle.Pickler(_file, pickle.HIGHEST_PROTOCOL)
+                _rows = iter(rows)
+                _chunk = {'version': SNAPSHOT_VERSION, 'token': token}
+                while _chunk:
+                    _pickler.dump(_chunk)
+                    # every pickle is loaded on its own, so it must not refer to objects of the previous ones
+                    _pickler.clear_memo()
+                    _chunk = list(itertools.islice(_rows, SNAPSHOT_CHUNK_ROWS))
+                _pickler.dump(None)
+            os.replace(_temporary_path, self.path)
+        except OSError:
+            if os.path.exists(_temporary_path):
+                os.remove(_temporary_path)
+            return False
+        return True
@@ -1,170 +1,305 @@
-from PySide6.QtCore import Qt
-from PySide6.QtGui import QStandardItem, QStandardItemModel
-from PySide6.QtSql import QSqlQuery
+from functools import lru_cache
+from typing import Iterable, Iterator
+
+from PySide6.QtCore import QAbstractItemModel, QModelIndex, Qt
+from PySide6.QtSql import QSqlDatabase
 from PySide6.QtWidgets import QMainWindow
 
+from ProcessEditor.library_cache import LibrarySnapshot
+from ProcessEditor.queries import LIBRARY_COLUMNS, SELECT_LIBRARY, QueryError, execute
+from ProcessEditor.validators import compile_pattern, is_valid, validator_for
+
+
+LANGUAGE_MARKER = 'LANGUAGE'
+
+
+@lru_cache(maxsize=4096)
+def parse_languages(_string_value: [str, None]) -> dict[str, tuple[str, ...]]:
+    """
+    Splits pipe-delimited string 'LANGUAGE|EN|value|...|LANGUAGE|RU|value|...' once into
+    map of language codes to values. Values standing before the first language code are stored with code ''.
+    Results are cached by the string, so equal strings of neighbouring library rows are parsed only once.
+    """
+    _languages = {}
+    if not _string_value:
+        return _languages
+    _values = None
+    _strings = iter(_string_value.split('|'))
+    for _string in _strings:
+        if _string == LANGUAGE_MARKER:
+            _values = _languages.setdefault(next(_strings, ''), [])
+            continue
+        if _values is None:
+            _values = _languages.setdefault('', [])
+        _values.append(_string)
+    return {_language_code: tuple(_values) for _language_code, _values in _languages.items()}
+
+
+def select_language(_string_value: [str, None], _language_code: str) -> tuple[str, ...]:
+    """Returns values of the language from pipe-delimited string, language-independent values if there are none."""
+    _languages = parse_languages(_string_value)
+    return _languages.get(_language_code, _languages.get('', ()))
+
+
+@lru_cache(maxsize=None)
+def split_column_names(_string_value: [str, None]) -> tuple[str, ...]:
+    """Splits pipe-delimited db_column_names. Results are cached, so equal column lists are stored once."""
+    return tuple(_string_value.split('|')) if _string_value else ()
+
+
+# roles of library items and names of LibraryRecord attributes served for them
+RECORD_ROLES = {
+    int(Qt.DisplayRole): 'library_name',
+    Qt.UserRole + 1: 'type_id',
+    Qt.UserRole + 2: 'text_id',
+    Qt.UserRole + 3: 'allow_copies',
+    Qt.UserRole + 4: 'parent_type_id',
+    Qt.UserRole + 5: 'order_id',
+    Qt.UserRole + 6: 'process_name',
+    Qt.UserRole + 7: 'labels',
+    Qt.UserRole + 8: 'labels_regex',
+    Qt.UserRole + 9: 'db_column_names',
+}
+
+
+class LibraryRecord:
+    """Operation type of operations_library. Names, labels and patterns are kept in current language,
+    raw pipe-delimited strings of all languages are kept in language_strings.
+    Validators of the patterns are created by LibraryModel.validators in the GUI thread on first use."""
+    __slots__ = (
+        'type_id', 'text_id', 'parent_type_id', 'order_id', 'allow_copies', 'is_obsolete', 'db_column_names',
+        'language_strings', 'library_name', 'process_name', 'labels', 'labels_regex', 'patterns', 'validators',
+    )
+
+    def __init__(self, _row: tuple, _language_code: str):
+        """Takes row of operations_library with values in order of LIBRARY_COLUMNS."""
+        (
+            self.text_id, self.type_id, self.parent_type_id, self.order_id, self.allow_copies,
+            _library_name, _process_name, _labels, _labels_regex, _db_column_names, self.is_obsolete,
+        ) = _row
+        self.db_column_names = split_column_names(_db_column_names)
+        self.language_strings = (_library_name, _process_name, _labels, _labels_regex)
+        self.set_language(_language_code)
+
+    def set_language(self, _language_code: str):
+        """Selects names and labels of the language from cached parsing of the raw strings."""
+        _library_name, _process_name, _labels, _labels_regex = self.language_strings
+        self.library_name = next(iter(select_language(_library_name, _language_code)), '')
+        self.process_name = next(iter(select_language(_process_name, _language_code)), '')
+        self.labels = select_language(_labels, _language_code)
+        self.labels_regex = select_language(_labels_regex, _language_code)
+        self.patterns = tuple(compile_pattern(_pattern) for _pattern in self.labels_regex)
+        self.validators = None
+
+    def row(self) -> tuple:
+        """Returns row of operations_library of the record in order of LIBRARY_COLUMNS, as iter_library_rows does."""
+        _library_name, _process_name, _labels, _labels_regex = self.language_strings
+        return (
+            self.text_id, self.type_id, self.parent_type_id, self.order_id, self.allow_copies,
+            _library_name, _process_name, _labels, _labels_regex, '|'.join(self.db_column_names) or None,
+            self.is_obsolete,
+        )
+
+    def data(self, role: int):
+        _name = RECORD_ROLES.get(role)
+        return None if _name is None else getattr(self, _name)
+
+
+def read_library(settings: dict) -> tuple[dict[int, LibraryRecord], dict[int, list[int]]]:
+    """
+    Returns library records by type_ids and child type_ids by parent type_ids of operations_library
+    read through settings['connection']. If settings['library_cache'] is set, rows are taken from the local snapshot
+    while change token of the table is unchanged, otherwise selected and saved to the snapshot.
+    Selected rows are streamed from the query into the records, the snapshot is written from the records.
+    Does not touch any model, so it can be called in a worker thread with a connection opened in that thread.
+    """
+    if not settings.get('library_cache'):
+        return build_library(iter_library_rows(settings['connection']), settings.get('language_code'))
+    _snapshot = LibrarySnapshot(settings['connection'], settings.get('cache_dir'))
+    _token = _snapshot.token()
+    _rows = _snapshot.load(_token)
+    if _rows is not None:
+        return build_library(_rows, settings.get('language_code'))
+    _records, _child_type_ids = build_library(iter_library_rows(settings['connection']), settings.get('language_code'))
+    _snapshot.save(_token, (_record.row() for _record in _records.values()))
+    return _records, _child_type_ids
+
+
+def build_library(_rows: Iterable[tuple], _language_code: str) -> tuple[dict[int, LibraryRecord], dict[int, list[int]]]:
+    """
+    Converts rows of operations_library to library records and groups their type_ids by parent_type_id
+    in one pass. Children are ordered by order_id, equal order_ids by type_id.
+    """
+    _records = {}
+    _child_type_ids = {}
+    for _row in _rows:
+        _record = LibraryRecord(_row, _language_code)
+        _records[_record.type_id] = _record
+        _child_type_ids.setdefault(_record.parent_type_id, []).append(_record.type_id)
+    for _type_ids in _child_type_ids.values():
+        _type_ids.sort(key=lambda _type_id: (_records[_type_id].order_id, _type_id))
+    return _records, _child_type_ids
+
 
-class LibraryModel(QStandardItemModel):
-    def __init__(self, parent: QMainWindow, settings: dict):
+def iter_library_rows(connection: QSqlDatabase) -> Iterator[tuple]:
+    """Yields rows of operations_library in order of LIBRARY_COLUMNS while they are read from the query."""
+    # --------------------------------------------
+    # text_id VARCHAR(511) NOT NULL,
+    # type_id SMALLINT PRIMARY KEY,
+    # parent_type_id SMALLINT,
+    # order_id BIGINT NOT NULL,
+    # allow_copies BOOL NOT NULL DEFAULT FALSE,
+    # library_name VARCHAR(511) NOT NULL,
+    # process_name VARCHAR(511) NOT NULL,
+    # labels VARCHAR(4095) DEFAULT NULL,
+    # labels_regex VARCHAR(4095) DEFAULT NULL,
+    # db_column_names VARCHAR(2047) DEFAULT NULL,
+    # is_obsolete BOOL NOT NULL DEFAULT FALSE,
+
+    parent_type_id = LIBRARY_COLUMNS.index('parent_type_id')
+    _columns = range(len(LIBRARY_COLUMNS))
+
+    try:
+        query = execute(connection, SELECT_LIBRARY)
+    except QueryError:
+        return
+    try:
+        while query.next():
+            _row = [query.value(_column) for _column in _columns]
+            if not isinstance(_row[parent_type_id], int):
+                _row[parent_type_id] = 0  # type_id=0 for root
+            yield tuple(_row)
+    finally:
+        query.finish()
+
+
+class LibraryModel(QAbstractItemModel):
+    """
+    Tree of operation types of operations_library. Indexes carry type_id as internal id and
+    data of every role is served from LibraryRecord on request, no Qt objects are created per type.
+    """
+
+    def __init__(self, parent: QMainWindow, settings: dict, library: tuple[dict, dict] = None):
+        """Builds the tree of the library, if it was read in advance by read_library,
+        otherwise reads operations_library first."""
         super().__init__(parent)
         self.settings = settings
 
-        self.allow_copies = {}
-        self.is_obsolete = {}
-        self.text_id = {}
-        self.parent_type_id = {}
-        self.child_type_ids = {}
-        self.order_id = {}
-        self.library_name = {}
-        self.process_name = {}
-        self.labels = {}
-        self.labels_regex = {}
-        self.db_column_names = {}
+        # map of type_ids to library records, map of parent type_ids to child type_ids
+        self.records, self.child_type_ids = read_library(self.settings) if library is None else library
+        self._rows = {}  # map of type_ids to rows among children of their parents
 
-        _library_list = self._get_library_from_sql()
-        self._set_class_variables(_library_list)
-        self._set_child_type_ids(_library_list)
-
-        self.max_parameters_count = max([len(value) for value in self.db_column_names.values()])
+        self.max_parameters_count = max([len(record.db_column_names) for record in self.records.values()])
 
         # Build a data tree
-        root_id = min(self.library_name.keys())
-        root_item = self.invisibleRootItem()
-        self._set_data_to_item(root_item, root_id)
-        self._add_children_to_item_recursively(root_item, root_id)
-
-    def _add_children_to_item_recursively(self, parent_item: QStandardItem, parent_type_id: int) -> QStandardItem:
-        """Recursive function for building tree of child_type_ids"""
-        if parent_type_id not in self.child_type_ids:
-            return parent_item  # if no children, return parent_item as is
-
-        # There are children. Add children to parent_item before returning it.
-        for type_id in self.child_type_ids.get(parent_type_id):
-            item = QStandardItem()
-            self._set_data_to_item(item, type_id)
-            self._add_children_to_item_recursively(item, type_id)
-            parent_item.appendRow(item)
-        return parent_item
-
-    def _set_data_to_item(self, item: QStandardItem, type_id: int):
-        item.setData(self.library_name[type_id], Qt.DisplayRole)
-        item.setData(type_id, Qt.UserRole + 1)
-        item.setData(self.text_id[type_id], Qt.UserRole + 2)
-        item.setData(self.allow_copies[type_id], Qt.UserRole + 3)
-        item.setData(self.parent_type_id[type_id], Qt.UserRole + 4)
-        item.setData(self.order_id[type_id], Qt.UserRole + 5)
-        item.setData(self.process_name[type_id], Qt.UserRole + 6)
-        item.setData(self.labels[type_id], Qt.UserRole + 7)
-        item.setData(self.labels_regex[type_id], Qt.UserRole + 8)
-        item.setData(self.db_column_names[type_id], Qt.UserRole + 9)
-
-    def _get_library_from_sql(self):
-        # --------------------------------------------
-        # text_id VARCHAR(511) NOT NULL,
-        # type_id SMALLINT PRIMARY KEY,
-        # parent_type_id SMALLINT,
-        # order_id BIGINT NOT NULL,
-        # allow_copies BOOL NOT NULL DEFAULT FALSE,
-        # library_name VARCHAR(511) NOT NULL,
-        # process_name VARCHAR(511) NOT NULL,
-        # labels VARCHAR(4095) DEFAULT NULL,
-        # labels_regex VARCHAR(4095) DEFAULT NULL,
-        # db_column_names VARCHAR(2047) DEFAULT NULL,
-        # is_obsolete BOOL NOT NULL DEFAULT FALSE,
-
-        text_id, type_id, parent_type_id, order_id, allow_copies, library_name, process_name, \
-            labels, labels_regex, db_column_names, is_obsolete = range(11)
-
-        operations_library_records = []
-        query = QSqlQuery(self.settings['connection'])
-        query.exec(
-            f"""
-            SELECT 
-                text_id, type_id, parent_type_id, order_id, allow_copies, library_name, process_name,
-                labels, labels_regex, db_column_names, is_obsolete
-            FROM operations_library
-            """)
-        if query.isActive():
-            query.next()
-            while query.isValid():
-                _parent_type_id = query.value(parent_type_id)
-                _dict = {
-                    'text_id': query.value(text_id),
-                    'type_id': query.value(type_id),
-                    'parent_type_id': _parent_type_id if isinstance(_parent_type_id, int) else 0,  # type_id=0 for root
-                    'order_id': query.value(order_id),
-                    'allow_copies': query.value(allow_copies),
-                    'library_name': query.value(library_name),
-                    'process_name': query.value(process_name),
-                    'labels': query.value(labels),
-                    'labels_regex': query.value(labels_regex),
-                    'db_column_names': query.value(db_column_names),
-                    'is_obsolete': query.value(is_obsolete),
-                }
-                operations_library_records.append(_dict)
-                query.next()
-        query.finish()
-        return operations_library_records
-
-    def _set_class_variables(self, _library_list: list[dict]):
-        """Converts list to dictionary."""
-        for _item in _library_list:
-            _type_id: int = _item.get('type_id')
-            self.allow_copies[_type_id] = _item.get('allow_copies')  # bool
-            self.is_obsolete[_type_id] = _item.get('is_obsolete')  # bool
-            self.parent_type_id[_type_id] = _item.get('parent_type_id')  # int
-            self.text_id[_type_id] = _item.get('text_id')  # str
-            self.order_id[_type_id] = _item.get('order_id')  # int
-            self.library_name[_type_id] = self._select_language(_item.get('library_name'))[0]
-            self.process_name[_type_id] = self._select_language(_item.get('process_name'))[0]
-            self.labels[_type_id] = self._select_language(_item.get('labels'))
-            self.labels_regex[_type_id] = self._select_language(_item.get('labels_regex'))
-            self.db_column_names[_type_id] = (
-                _item.get('db_column_names').split('|')
-                if _item.get('db_column_names')
-                else []
-            )
-
-    def _set_child_type_ids(self, _library_list: list[dict]):
-
-        def sorting_generator(_list: list, _scores: list) -> list:
-            """Generator for sorting list by scores"""
-            for _i in range(len(_list)):
-                _min_score = min(_scores)
-                _min_score_index = _scores.index(_min_score)
-                _next_item = _list.pop(_min_score_index)
-                del _scores[_min_score_index]
-                yield _next_item
-
-        child_parent = [(_item.get('type_id'), _item.get('parent_type_id'),) for _item in _library_list]
-
-        for child_id, parent_id in child_parent:
-            child_id: int
-            parent_id: int
-            if parent_id not in self.child_type_ids.keys():
-                self.child_type_ids[parent_id] = []
-            self.child_type_ids[parent_id].append(child_id)
-
-        # reorder child_type_ids using order_id
-        for parent_id, child_type_ids in self.child_type_ids.items():
-            child_type_ids: list
-            _order_id: list = [self.order_id[_child] for _child in child_type_ids]
-            self.child_type_ids[parent_id] = [x for x in sorting_generator(child_type_ids, _order_id)]
-
-    def _select_language(self, _string_value: str) -> list[str]:
-        _language_code = self.settings.get('language_code')
-        _list_of_strings = _string_value.split('|')
-        _is_correct_language = False
-        _is_next_string_language_code = False
-        _return_list = []
-        for _i, _string in enumerate(_list_of_strings):
-            if _string == 'LANGUAGE':
-                _is_next_string_language_code = True
+        self._root_id = min(self.records.keys())
+        self._set_rows()
+
+    def _set_rows(self):
+        """Numbers rows of types reachable from the root type, walking the tree without recursion."""
+        _stack = [self._root_id]
+        while _stack:
+            _children = self.child_type_ids.get(_stack.pop(), ())
+            for _row, _type_id in enumerate(_children):
+                self._rows[_type_id] = _row
+            _stack.extend(_children)
+
+    def _type_id(self, index: QModelIndex) -> int:
+        return index.internalId() if index.isValid() else self._root_id
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.column() > 0:
+            return 0
+        return len(self.child_type_ids.get(self._type_id(parent), ()))
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 1
+
+    def index(self, row: int, column: int, parent: QModelIndex = QModelIndex()) -> QModelIndex:
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        return self.createIndex(row, column, self.child_type_ids[self._type_id(parent)][row])
+
+    def parent(self, index: QModelIndex) -> QModelIndex:
+        if not index.isValid():
+            return QModelIndex()
+        _parent_type_id = self.records[index.internalId()].parent_type_id
+        if _parent_type_id == self._root_id:
+            return QModelIndex()
+        return self.createIndex(self._rows[_parent_type_id], 0, _parent_type_id)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        return self.records[index.internalId()].data(role)
+
+    def flags(self, index: QModelIndex):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsDragEnabled
+
+    def language_codes(self) -> list[str]:
+        """Returns sorted language codes of names and labels of the library, parsed strings are taken from the cache."""
+        _language_codes = set()
+        for _record in self.records.values():
+            for _string_value in _record.language_strings:
+                _language_codes.update(parse_languages(_string_value))
+        _language_codes.discard('')
+        return sorted(_language_codes)
+
+    def set_language_code(self, language_code: str) -> None:
+        """Switches names and labels of the library to another language without querying the database."""
+        self.settings['language_code'] = language_code
+        for _record in self.records.values():
+            _record.set_language(language_code)
+        _parents = [QModelIndex()]
+        while _parents:
+            _parent = _parents.pop()
+            _row_count = self.rowCount(_parent)
+            if not _row_count:
                 continue
-            if _is_next_string_language_code and _string == _language_code:
-                _is_next_string_language_code = False
-                _is_correct_language = True
+            self.dataChanged.emit(self.index(0, 0, _parent), self.index(_row_count - 1, 0, _parent))
+            _parents.extend(self.index(_row, 0, _parent) for _row in range(_row_count))
+
+    def validators(self, record: LibraryRecord) -> tuple:
+        """Returns validators of parameters of the record. They are created on first use, in the GUI thread."""
+        if record.validators is None:
+            record.validators = tuple(validator_for(_pattern) for _pattern in record.patterns)
+        return record.validators
+
+    def validate_parameters(self, type_id: int, values: list) -> list[int]:
+        """Returns positions of parameter values not matching labels_regex of the operation type."""
+        _record = self.records.get(type_id)
+        if _record is None:
+            return []
+        return [
+            _i for _i, (_pattern, _value) in enumerate(zip(_record.patterns, values))
+            if not is_valid(_pattern, _value)
+        ]
+
+    def validate_process(self, process_model: QAbstractItemModel) -> dict[int, list[str]]:
+        """
+        Checks parameters of all operations of the process version in one pass over source rows of the process model.
+        Parameter values are read from the columns named by db_column_names of the operation type.
+        Returns map of operation ids to db column names of invalid parameters.
+        """
+        _source_model = process_model.sourceModel()
+        _columns = {
+            _source_model.headerData(_column, Qt.Horizontal, Qt.DisplayRole): _column
+            for _column in range(_source_model.columnCount())
+        }
+        _id_column, _type_id_column = _columns['id'], _columns['type_id']
+        _invalid_parameters = {}
+        for _row in range(_source_model.rowCount()):
+            _record = self.records.get(_source_model.data(_source_model.index(_row, _type_id_column), Qt.DisplayRole))
+            if _record is None:
                 continue
-            if _is_correct_language:
-                _return_list.append(_string)
-        return _return_list
+            _invalid_names = [
+                _name for _name, _pattern in zip(_record.db_column_names, _record.patterns)
+                if _pattern is not None and _name in _columns and not is_valid(
+                    _pattern, _source_model.data(_source_model.index(_row, _columns[_name]), Qt.DisplayRole))
+            ]
+            if _invalid_names:
+                _operation_id = _source_model.data(_source_model.index(_row, _id_column), Qt.DisplayRole)
+                _invalid_parameters[_operation_id] = _invalid_names
+        return _invalid_parameters
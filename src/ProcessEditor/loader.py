@@ -0,0 +1,76 @@
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+from ProcessEditor.library_model import read_library
+from ProcessEditor.process_model import select_operations
+
+
+class LoadSignals(QObject):
+    finished = Signal(str, object)  # name of the load, result of the load function
+    failed = Signal(str, str)  # name of the load, error message
+
+
+class LoadTask(QRunnable):
+    """
+    Calls the load function in a thread of the pool. Qt connections can only be used in the thread
+    that opened them, so the function gets connection of the pool thread from settings['connection_manager']
+    in a copy of settings. The connection stays open for the next task of the same thread.
+    """
+
+    def __init__(self, name: str, function, settings: dict, signals: LoadSignals):
+        super().__init__()
+        self.name = name
+        self.function = function
+        self.settings = settings
+        self.signals = signals
+
+    def run(self) -> None:
+        try:
+            connection = self.settings['connection_manager'].connection()
+            result = self.function(dict(self.settings, connection=connection))
+        except Exception as error:
+            self.signals.failed.emit(self.name, str(error))
+        else:
+            self.signals.finished.emit(self.name, result)
+
+
+class ModelsLoader(QObject):
+    """
+    Reads operations_library and operations of the process version in parallel threads of the global pool.
+    Emits loaded with map of load names ('library', 'process') to results when all loads are finished,
+    failed with the error message of the first failed load.
+    In lazy mode the process is not read in advance, ProcessModel fetches its branches itself.
+    Without load_library only the process is read, e.g. when another process version is opened.
+    """
+    loaded = Signal(dict)
+    failed = Signal(str)
+
+    def __init__(self, parent: QObject, settings: dict, load_library: bool = True):
+        super().__init__(parent)
+        self.settings = settings
+        self._functions = {'library': read_library} if load_library else {}
+        if not settings.get('lazy_loading'):
+            self._functions['process'] = select_operations
+        self._results = {}
+        self._has_failed = False
+
+        self._signals = LoadSignals(self)
+        self._signals.finished.connect(self._on_finished)
+        self._signals.failed.connect(self._on_failed)
+
+    def start(self) -> None:
+        if not self._functions:
+            self.loaded.emit({})
+            return
+        pool = QThreadPool.globalInstance()
+        for name, function in self._functions.items():
+            pool.start(LoadTask(name, function, self.settings, self._signals))
+
+    def _on_finished(self, name: str, result) -> None:
+        self._results[name] = result
+        if not self._has_failed and len(self._results) == len(self._functions):
+            self.loaded.emit(self._results)
+
+    def _on_failed(self, name: str, message: str) -> None:
+        if not self._has_failed:
+            self._has_failed = True
+            self.failed.emit(f"Loading of {name} failed: {message}")
@@ -1,51 +1,63 @@
 import os
 import sys
+import time
+from functools import partial
+from typing import TYPE_CHECKING
 
-from PySide6.QtSql import QSqlDatabase
 from PySide6.QtWidgets import \
     QApplication, QErrorMessage, QStatusBar, QMainWindow
 from PySide6.QtCore import \
-    Qt, QCoreApplication, QModelIndex, Slot, QItemSelectionModel, QAbstractProxyModel
+    Qt, QCoreApplication, QModelIndex, Signal, Slot, QItemSelectionModel, QAbstractProxyModel, QTimer
 from PySide6.QtGui import \
-    QIcon, QPixmap, QGuiApplication
+    QIcon, QPixmap, QGuiApplication, QKeySequence, QShortcut, QValidator
 from PySide6.QtWidgets import \
     QSizePolicy, QWidget, QPushButton, QHBoxLayout, QVBoxLayout, QSpacerItem, QTreeView, QGroupBox, QAbstractItemView, \
-    QFormLayout, QLineEdit, QLabel, QDataWidgetMapper
-
-from ProcessEditor.library_model import LibraryModel
-from ProcessEditor.process_model import ProcessModel
+    QFormLayout, QLineEdit, QLabel, QDataWidgetMapper, QSpinBox, QInputDialog
+
+from ProcessEditor import instrumentation
+from ProcessEditor.connections import ConnectionManager, load_database_config
+
+if TYPE_CHECKING:
+    # models, loader and workspace are imported by Main.start(), after the window is painted
+    from ProcessEditor.library_model import LibraryModel
+    from ProcessEditor.workspace import ProcessVersion
+
+
+# settings of the window, single values are overridden by the settings argument of Main
+DEFAULT_SETTINGS = {
+    'user_id': 1,
+    'process_version_id': 1,
+    'language_code': 'EN',
+    'fast_start': True,  # paint the empty window first, then connect and load models
+    'lazy_loading': False,  # fetch branches of the process tree only when they are expanded
+    'fetch_batch_size': 256,
+    'library_cache': True,  # reuse local snapshot of operations_library while the table is unchanged
+    'background_loading': True,  # read library and process in worker threads
+    'autosave': True,  # write edits of the process in the background
+    'autosave_delay': 2000,  # ms without edits before edits are written
+    'autosave_max_delay': 10000,  # ms after the first unsaved edit, when edits are written anyway
+    'sync': True,  # show edits of other users, if 'operations' has sync_column maintained by the database
+    'sync_column': 'updated_at',
+    'sync_interval': 5000,  # ms between polls of changes
+    'sync_channel': 'operations_changed',  # LISTEN/NOTIFY channel starting a poll at once (PostgreSQL)
+    'workspace_size': 8,  # number of process versions kept open for fast switching
+    'workspace_memory': 256 * 2 ** 20,  # bytes of models of open process versions, estimated
+}
 
 
 def run() -> None:
     """Start main window"""
     app = QApplication(sys.argv)
-    connection = set_database_connection()
-    w = Main(connection)
+    instrumentation_path = instrumentation.enable_from_environment()
+    connection_manager = ConnectionManager(load_database_config())
+    w = Main(connection_manager)
     w.show()
-    sys.exit(app.exec())
-
-
-def set_database_connection() -> [QSqlDatabase, None]:
-    """
-    Make connection to the database. Returns status of connection.
-    If connection is well established database is accessible
-    using 'connection = QSqlDatabase.database('ForgelabDB', open=False)'.
-    """
-    host = "localhost"
-    postgres_user = "postgres"
-    password = "2008"
-    database = "forgelab_2"
-    connection = QSqlDatabase.addDatabase('QPSQL')  # , 'ForgelabDB')
-    if connection.isValid():
-        connection.setHostName(host)
-        connection.setDatabaseName(database)
-        connection.setUserName(postgres_user)
-        connection.setPassword(password)
-        connection.setPort(5432)
-        status = connection.open()
-        if status:
-            return connection
-    return None
+    exit_code = app.exec()
+    del w
+    connection_manager.close_all()
+    if instrumentation_path:
+        instrumentation.export(instrumentation_path)
+    sys.exit(exit_code)
 
 
 class MainUi:
@@ -76,6 +88,9 @@ class MainUi:
         # MIDDLE LAYOUT: PROCESS EDITOR (TREE VIEW)
         # ---------------------------------------------
 
+        self.process_version_box = QSpinBox(main_window)
+        self.process_version_box.setRange(1, 2 ** 31 - 1)
+        self.process_version_box.setKeyboardTracking(False)
         self.button_new_process = QPushButton(main_window)
         self.button_insert_row = QPushButton(main_window)
         self.button_insert_column = QPushButton(main_window)
@@ -85,6 +100,7 @@ class MainUi:
         self.button_change_type = QPushButton(main_window)
 
         process_editor_buttons_layout = QHBoxLayout()
+        process_editor_buttons_layout.addWidget(self.process_version_box)
         process_editor_buttons_layout.addWidget(self.button_new_process)
         process_editor_buttons_layout.addWidget(self.button_insert_row)
         process_editor_buttons_layout.addWidget(self.button_insert_column)
@@ -125,19 +141,19 @@ class MainUi:
         #
         self.button_previous.setEnabled(False)
 
-        parameters_form_layout = QFormLayout()
+        self.parameters_form_layout = QFormLayout()
         self.line_edit_parameters = []
         self.label_parameters = []
-        for i in range(max_parameters_count):
-            self.line_edit_parameters.append(QLineEdit(main_window))
-            self.label_parameters.append(QLabel(f'Parameter {i}', main_window))
-            parameters_form_layout.addRow(self.label_parameters[i], self.line_edit_parameters[i])
+        self.parameter_label_texts = []  # texts set to label_parameters
+        self.parameter_validators = []  # validators set to line_edit_parameters
+        self.shown_parameters_count = 0  # editors from the first one are shown, the rest are hidden for reuse
+        self.add_parameter_editors(main_window, max_parameters_count)
 
         self.editor_info_view = QWidget(main_window)
 
         parameters_main_layout = QVBoxLayout()
         parameters_main_layout.addLayout(parameters_buttons_layout)
-        parameters_main_layout.addLayout(parameters_form_layout)
+        parameters_main_layout.addLayout(self.parameters_form_layout)
         parameters_main_layout.addSpacerItem(
             QSpacerItem(1, 1, QSizePolicy.Policy.Minimum, QSizePolicy.Policy.Expanding))
         parameters_main_layout.addWidget(self.editor_info_view)
@@ -162,9 +178,50 @@ class MainUi:
         self.retranslate_ui()
         self.set_icons()
 
+    def add_parameter_editors(self, main_window, parameters_count: int):
+        """Adds hidden line edits with labels until there are parameters_count of them."""
+        for i in range(len(self.line_edit_parameters), parameters_count):
+            self.line_edit_parameters.append(QLineEdit(main_window))
+            self.label_parameters.append(QLabel(f'Parameter {i}', main_window))
+            self.parameter_label_texts.append(f'Parameter {i}')
+            self.parameter_validators.append(None)
+            self.parameters_form_layout.addRow(self.label_parameters[i], self.line_edit_parameters[i])
+            self.parameters_form_layout.setRowVisible(i, False)
+
+    def show_parameter_editors(self, main_window, labels: tuple[str, ...]):
+        """
+        Shows a line edit for every label, with the label of the same position.
+        Editors are created when more are needed and hidden for reuse when fewer are, so only rows
+        whose label or visibility changes are touched, not all editors ever created.
+        """
+        parameters_count = len(labels)
+        self.add_parameter_editors(main_window, parameters_count)
+        for i in range(parameters_count):
+            if self.parameter_label_texts[i] != labels[i]:
+                self.parameter_label_texts[i] = labels[i]
+                self.label_parameters[i].setText(labels[i])
+        for row in range(parameters_count, self.shown_parameters_count):
+            self.parameters_form_layout.setRowVisible(row, False)
+        for row in range(self.shown_parameters_count, parameters_count):
+            self.parameters_form_layout.setRowVisible(row, True)
+        self.shown_parameters_count = parameters_count
+
+    def set_parameter_validator(self, i: int, validator: [QValidator, None]):
+        """Sets the validator to the line edit i, if it has another one."""
+        if self.parameter_validators[i] is not validator:
+            self.parameter_validators[i] = validator
+            self.line_edit_parameters[i].setValidator(validator)
+
+    def set_loading(self, is_loading: bool):
+        """Disables library, process editor and parameters while models are loading."""
+        self.library_group_box.setEnabled(not is_loading)
+        self.process_editor_group_box.setEnabled(not is_loading)
+        self.parameters_group_box.setEnabled(not is_loading)
+
     def retranslate_ui(self):
         """Sets up GUI elements and their behavior"""
         _translate = QCoreApplication.translate
+        self.process_version_box.setPrefix(_translate("EditorListWidget", "Process version "))
         self.button_new_process.setText(_translate("EditorListWidget", "New process"))
         self.button_insert_row.setText(_translate("EditorListWidget", "Insert row"))
         self.button_insert_column.setText(_translate("EditorListWidget", "Insert column"))
@@ -189,58 +246,107 @@ class MainUi:
 
 class Main(QMainWindow):
     """This class opens new window for editing a table of forging operations"""
+    first_painted = Signal(float)  # seconds from creation of the window to its first paint
 
-    def __init__(self, connection: QSqlDatabase):
+    def __init__(self, connection_manager: ConnectionManager, settings: dict = None):
         super().__init__()
-        if connection is None:
-            QErrorMessage(self).showMessage("Database connection failed")
-            return
+        self._created_at = time.perf_counter()
+        self.connection_manager = connection_manager
+        self.settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+        self.settings['connection'] = None  # connection of the GUI thread, opened by start()
+        self.settings['connection_manager'] = connection_manager  # hands out connections to other threads
 
-        self.settings = {
-            'user_id': 1,
-            'process_version_id': 1,
-            'language_code': 'EN',
-            'connection': connection,
-        }
-
-        library_model = LibraryModel(self, self.settings)
-        process_model = ProcessModel(self, self.settings)
+        self.ui = MainUi(self, 0)
+        self.mapper = QDataWidgetMapper()
+        # the mapper only reads, edited parameters are written by submit_parameter_editor
+        self.mapper.setSubmitPolicy(QDataWidgetMapper.ManualSubmit)
+        self._parameter_sections = []  # columns mapped to parameter editors, -1 for editors not mapped
+        self._mapped_parameters_count = 0  # editors mapped for the selected operation
+        self.loader = None
+        self.workspace = None  # process versions kept open, created by start()
+        self.process_version = None  # active process version
+        self._loading_version_id = None  # process version being read by the loader
+        self.first_paint_seconds = None
+        self._is_started = False
+
+        # The window is shown at once in loading state, models are set when library and process are read
+        self.ui.set_loading(True)
+        self.ui.process_version_box.setValue(self.settings['process_version_id'])
+        self.statusBar().showMessage(QCoreApplication.translate("EditorListWidget", "Loading library and process..."))
+        if not self.settings['fast_start']:
+            self.start()
+
+    def paintEvent(self, event) -> None:
+        super().paintEvent(event)
+        if self.first_paint_seconds is not None:
+            return
+        self.first_paint_seconds = time.perf_counter() - self._created_at
+        self.first_painted.emit(self.first_paint_seconds)
+        if not self._is_started:
+            # after the paint is flushed to the screen
+            QTimer.singleShot(0, self.start)
 
-        self.ui = MainUi(self, library_model.max_parameters_count)
+    @Slot()
+    def start(self) -> None:
+        """Connects to the database, imports models and starts loading them."""
+        if self._is_started:
+            return
+        self._is_started = True
+        from ProcessEditor.library_model import LibraryModel
+        from ProcessEditor.loader import ModelsLoader
+        from ProcessEditor.workspace import ProcessWorkspace
+
+        try:
+            self.settings['connection'] = self.connection_manager.connection()
+        except ConnectionError as error:
+            QErrorMessage(self).showMessage(f"Database connection failed: {error}")
+            return
 
+        self.workspace = ProcessWorkspace(self, self.settings)
+        self.workspace.evicted.connect(self.on_process_version_evicted)
+        if self.settings['background_loading']:
+            self.loader = ModelsLoader(self, self.settings)
+            self.loader.loaded.connect(self.on_models_loaded)
+            self.loader.failed.connect(self.on_loading_failed)
+            self.loader.start()
+        else:
+            self.set_models(
+                LibraryModel(self, self.settings), self.open_version(self.settings['process_version_id']))
+
+    @Slot(dict)
+    def on_models_loaded(self, results: dict) -> None:
+        """Builds models of library and process read by the loader."""
+        from ProcessEditor.library_model import LibraryModel
+        self.set_models(
+            LibraryModel(self, self.settings, results['library']),
+            self.open_version(self.settings['process_version_id'], results.get('process')))
+
+    @Slot(str)
+    def on_loading_failed(self, message: str) -> None:
+        self._loading_version_id = None
+        self.ui.set_loading(self.process_version is None)
+        self.statusBar().showMessage(message)
+        QErrorMessage(self).showMessage(message)
+
+    def open_version(self, process_version_id: int, operations: tuple = None) -> 'ProcessVersion':
+        """Opens the process version in the workspace and connects its autosave and sync to the status bar."""
+        version = self.workspace.open(process_version_id, operations)
+        if version.autosave is not None:
+            version.autosave.saved.connect(self.on_autosaved)
+            version.autosave.failed.connect(self.on_autosave_failed)
+        if version.sync is not None:
+            version.sync.failed.connect(self.statusBar().showMessage)
+        return version
+
+    def set_models(self, library_model: 'LibraryModel', process_version: 'ProcessVersion') -> None:
+        """Sets loaded models to views and the mapper and leaves loading state."""
         self.ui.library_view.setModel(library_model)
         self.ui.library_view.expandAll()
         for column in range(library_model.columnCount()):
             self.ui.library_view.resizeColumnToContents(column)
 
-        self.ui.process_editor_view.setModel(process_model)
-        self.ui.process_editor_view.expandAll()
-        # self.ui.process_editor_view.setModel(self.settings['process_editor_models'][process_version_id])
-        # for column in range(self.ui.process_editor_view.model().columnCount()):
-        #     self.ui.process_editor_view.resizeColumnToContents(column)
-        #     if column >= 1:
-        #         self.ui.process_editor_view.hideColumn(column)
-        # self.ui.process_editor_view.expandAll()
-
-        # Mapper
-        self.mapper = QDataWidgetMapper()
-        self.mapper.setModel(self.ui.process_editor_view.model())
-        for i in range(len(self.ui.line_edit_parameters)):
-            # item with index = 0 stores name of operation, next items store values of parameters
-            item_index_of_process_editor_model = i + 1
-            self.mapper.addMapping(self.ui.line_edit_parameters[i], item_index_of_process_editor_model)
-        self.mapper.toFirst()
-
-        # Signals
-        selection_model = self.ui.process_editor_view.selectionModel()
-        selection_model.selectionChanged.connect(self.update_buttons)
         self.ui.process_editor_view.clicked.connect(self.on_click_process_editor_view)
 
-        # Update UI
-        self.ui.process_editor_view.setCurrentIndex(self.mapper_index())
-        self.update_parameter_line_edits(self.mapper_index())
-        self.update_buttons()
-
         # Process Editor Buttons
         self.ui.button_new_process.clicked.connect(self.on_click_new_process)
         self.ui.button_insert_row.clicked.connect(self.insert_row)
@@ -248,6 +354,7 @@ class Main(QMainWindow):
         self.ui.button_remove_row.clicked.connect(self.remove_row)
         self.ui.button_remove_column.clicked.connect(self.remove_column)
         self.ui.button_insert_child.clicked.connect(self.insert_child)
+        self.ui.process_version_box.editingFinished.connect(self.on_process_version_selected)
 
         # Parameters Buttons
         self.ui.button_previous.clicked.connect(self.on_click_previous)
@@ -256,72 +363,227 @@ class Main(QMainWindow):
         # Library View
         self.ui.library_view.doubleClicked.connect(self.on_doubleclick_library_view)
 
-        self.update_parameter_line_edits()
+        # Save
+        QShortcut(QKeySequence.Save, self, self.save_process)
+
+        # Go to operation by its number in the process
+        QShortcut(QKeySequence(Qt.CTRL | Qt.Key_G), self, self.on_go_to_operation)
+
+        # Switch language of the library
+        QShortcut(QKeySequence(Qt.CTRL | Qt.Key_L), self, self.on_select_language)
+
+        self.show_process_version(process_version)
+
+    def show_process_version(self, process_version: 'ProcessVersion') -> None:
+        """Sets model of the process version to the process editor view and the mapper and leaves loading state."""
+        self.submit_parameter_editor()
+        self.process_version = process_version
+        process_model = process_version.model
+
+        self.ui.process_editor_view.setModel(process_model)
+        if not self.settings['lazy_loading']:
+            self.ui.process_editor_view.expandAll()
+
+        # Mapper, parameter editors are mapped to columns of the selected operation by update_parameter_line_edits
+        self.mapper.clearMapping()
+        self._parameter_sections = []
+        self._mapped_parameters_count = 0
+        self.mapper.setModel(process_model)
+        self.mapper.setRootIndex(QModelIndex())
+        self.mapper.toFirst()
+
+        # Signals, every model gets a new selection model
+        selection_model = self.ui.process_editor_view.selectionModel()
+        selection_model.selectionChanged.connect(self.update_buttons)
+
+        # Update UI
+        self.ui.process_editor_view.setCurrentIndex(self.mapper_index())
+        self.update_parameter_line_edits(self.mapper_index())
         self.update_buttons()
 
+        self.workspace.activate(process_version.process_version_id)
+        self.ui.process_version_box.setValue(process_version.process_version_id)
+        self.ui.set_loading(False)
+        self.statusBar().clearMessage()
+
     @Slot()
-    def on_click_previous(self):
+    def on_process_version_selected(self) -> None:
+        self.open_process_version(self.ui.process_version_box.value())
+
+    def open_process_version(self, process_version_id: int) -> None:
         """
-        On click 'Previous parameter' button, move to previous item of tree.
-        If current row is the first row, then move up to the parent item of the branch.
-        If current branch has previous row, then check if the previous row has children,
-        and do movement depending on presence of children:
-            if there is no child/children, then move forward to previous row of current branch;
-            if there is child/children, then iterate over children and move down to the last row of last child.
-        After every move update 'isEnabled' method of 'Next' and 'Previous' buttons.
+        Shows the process version. A recently used version is taken from the workspace at once,
+        others are read in the background like at startup.
         """
+        if self.process_version is not None and process_version_id == self.process_version.process_version_id:
+            return
+        if process_version_id == self._loading_version_id:
+            return
+        version = self.workspace.get(process_version_id)
+        if version is not None:
+            self.show_process_version(version)
+            return
+        if not self.settings['background_loading']:
+            self.show_process_version(self.open_version(process_version_id))
+            return
 
-        if self.mapper_row() == 0:
-            # move up to parent item of the branch
-            parent_index: QModelIndex = self.mapper_index().parent()
-            self.mapper.setRootIndex(parent_index.parent())
-            self.mapper.setCurrentIndex(parent_index.row())
-            self.select_row_in_process_editor_view()
-            self.update_parameter_line_edits(self.mapper_index())
+        self._loading_version_id = process_version_id
+        from ProcessEditor.loader import ModelsLoader
+        self.ui.set_loading(True)
+        self.statusBar().showMessage(QCoreApplication.translate("EditorListWidget", "Loading process..."))
+        loader = ModelsLoader(self, self.workspace.version_settings(process_version_id), load_library=False)
+        loader.loaded.connect(lambda results: self.on_process_loaded(process_version_id, results))
+        loader.loaded.connect(loader.deleteLater)
+        loader.failed.connect(self.on_loading_failed)
+        loader.failed.connect(loader.deleteLater)
+        loader.start()
+
+    def on_process_loaded(self, process_version_id: int, results: dict) -> None:
+        if process_version_id != self._loading_version_id:
+            return  # another version was selected meanwhile
+        self._loading_version_id = None
+        if process_version_id in self.workspace:
+            version = self.workspace.get(process_version_id)
+        else:
+            version = self.open_version(process_version_id, results.get('process'))
+        self.show_process_version(version)
+
+    @Slot(int)
+    def on_process_version_evicted(self, process_version_id: int) -> None:
+        self.statusBar().showMessage(
+            QCoreApplication.translate("EditorListWidget", "Process version {0} closed").format(process_version_id),
+            3000)
+
+    @Slot()
+    def save_process(self) -> None:
+        """Writes edits of the process in one transaction and shows operations having invalid parameters."""
+        from ProcessEditor.operations_writer import SaveError
+        if self.process_version is None:
             return
+        self.submit_parameter_editor()
+        if self.process_version.autosave is not None:
+            self.process_version.autosave.flush()
+        else:
+            try:
+                count = self.process_version.model.save()
+            except SaveError as error:
+                QErrorMessage(self).showMessage(f"Saving failed: {error}")
+                return
+            self.statusBar().showMessage(
+                QCoreApplication.translate("EditorListWidget", "Saved changes: {0}").format(count), 3000)
+        self.show_invalid_parameters()
 
-        self.mapper.toPrevious()
-        while self.has_children(self.mapper_index()):
-            # move inside the branch
-            self.mapper.setRootIndex(self.mapper_index())
-            self.mapper.toLast()
-        self.select_row_in_process_editor_view()
-        self.update_parameter_line_edits(self.mapper_index())
+    def show_invalid_parameters(self) -> dict[int, list[str]]:
+        """
+        Checks parameters of all operations of the process against labels_regex of their types and shows
+        operations having invalid ones in the status bar. Returns map of operation ids to names of invalid parameters.
+        """
+        invalid_parameters = self.ui.library_view.model().validate_process(self.process_version.model)
+        if invalid_parameters:
+            operation_ids = ', '.join(str(operation_id) for operation_id in sorted(invalid_parameters)[:10])
+            if len(invalid_parameters) > 10:
+                operation_ids += ', ...'
+            self.statusBar().showMessage(
+                QCoreApplication.translate(
+                    "EditorListWidget", "Operations with invalid parameters: {0} ({1})").format(
+                    len(invalid_parameters), operation_ids))
+        return invalid_parameters
+
+    @Slot(int, float)
+    def on_autosaved(self, count: int, seconds: float) -> None:
+        self.statusBar().showMessage(
+            QCoreApplication.translate("EditorListWidget", "Saved changes: {0}").format(count), 3000)
+
+    @Slot(str)
+    def on_autosave_failed(self, message: str) -> None:
+        self.statusBar().showMessage(
+            QCoreApplication.translate("EditorListWidget", "Saving failed, changes are kept: {0}").format(message))
+
+    def closeEvent(self, event) -> None:
+        """Writes pending edits of all open process versions before the window is closed."""
+        self.submit_parameter_editor()
+        if self.workspace is not None and not self.workspace.close_all():
+            QErrorMessage(self).showMessage("Not all changes of the process could be saved")
+        super().closeEvent(event)
+
+    @Slot()
+    def on_click_previous(self):
+        """
+        On click 'Previous parameter' button, move to the operation preceding the current one in pre-order:
+        the last operation of the branch of the previous row, or the parent item if current row is the first one.
+        """
+        index = self.mapper_index()
+        if self.settings['lazy_loading']:
+            self.fetch_predecessors(index)
+        self.set_mapper_index(index.model().previous_index(index))
 
     @Slot()
     def on_click_next(self):
         """
-        On click 'Next parameter' button, move to next item of tree.
-        if current item has children, move to first child of current item.
-        If current branch has next row, move to next row of current branch.
-        if current branch has no next row, move to root item of next branch.
+        On click 'Next parameter' button, move to the operation following the current one in pre-order:
+        the first child, the next row of the branch or the next row of the closest ancestor having one.
         If current item is the last item of the tree, do nothing.
-        @return:
         """
+        index = self.mapper_index()
+        if self.settings['lazy_loading']:
+            self.fetch_successors(index)
+        self.set_mapper_index(index.model().next_index(index))
 
-        is_allow_go_inside_branch = True
-        for i in range(5):
+    def go_to_operation(self, position: int) -> None:
+        """Moves to the operation at the position in pre-order of the tree, counted from 0."""
+        model = self.ui.process_editor_view.model()
+        if model is not None:
+            self.set_mapper_index(model.preorder_index(position))
 
-            if is_allow_go_inside_branch and self.has_children(self.mapper_index()):
-                # move inside the branch
-                self.mapper.setRootIndex(self.mapper_index())
-                self.mapper.toFirst()
-                self.select_row_in_process_editor_view()
-                self.update_parameter_line_edits(self.mapper_index())
-                return
-
-            if self.mapper_row() < self.row_count(self.mapper_index()) - 1:
-                # move to next row (of current branch)
-                self.mapper.toNext()
-                self.select_row_in_process_editor_view()
-                self.update_parameter_line_edits(self.mapper_index())
-                return
+    @Slot()
+    def on_go_to_operation(self) -> None:
+        """Asks for the number of the operation in the whole process and moves to it."""
+        model = self.ui.process_editor_view.model()
+        if model is None or not model.preorder_count():
+            return
+        number, is_accepted = QInputDialog.getInt(
+            self, QCoreApplication.translate("EditorListWidget", "Go to operation"),
+            QCoreApplication.translate("EditorListWidget", "Operation number:"),
+            model.preorder_position(self.mapper_index()) + 1, 1, model.preorder_count())
+        if is_accepted:
+            self.go_to_operation(number - 1)
+
+    def set_language_code(self, language_code: str) -> None:
+        """Switches names and labels of the library and of parameter editors to the language, without a query."""
+        library_model = self.ui.library_view.model()
+        if library_model is None:
+            return
+        self.settings['language_code'] = language_code
+        library_model.set_language_code(language_code)
+        for column in range(library_model.columnCount()):
+            self.ui.library_view.resizeColumnToContents(column)
+        if self.ui.process_editor_view.model() is not None:
+            self.update_parameter_line_edits(self.mapper_index())
 
-            # move outside the branch
-            parent_index: QModelIndex = self.mapper_index().parent()
-            self.mapper.setRootIndex(parent_index.parent())
-            self.mapper.setCurrentIndex(parent_index.row())
-            is_allow_go_inside_branch = False
+    @Slot()
+    def on_select_language(self) -> None:
+        """Asks for one of the languages of the library and switches to it."""
+        library_model = self.ui.library_view.model()
+        language_codes = [] if library_model is None else library_model.language_codes()
+        if not language_codes:
+            return
+        current = language_codes.index(self.settings['language_code']) if (
+            self.settings['language_code'] in language_codes) else 0
+        language_code, is_accepted = QInputDialog.getItem(
+            self, QCoreApplication.translate("EditorListWidget", "Language"),
+            QCoreApplication.translate("EditorListWidget", "Language of the library:"), language_codes, current, False)
+        if is_accepted:
+            self.set_language_code(language_code)
+
+    def set_mapper_index(self, index: QModelIndex) -> None:
+        """Moves the mapper and the selection of the process editor view to the index, if it is valid."""
+        if not index.isValid():
+            return
+        self.submit_parameter_editor()
+        self.mapper.setRootIndex(index.parent())
+        self.mapper.setCurrentIndex(index.row())
+        self.select_row_in_process_editor_view()
+        self.update_parameter_line_edits(self.mapper_index())
 
     @Slot()
     def on_doubleclick_library_view(self, library_index: QModelIndex) -> None:
@@ -333,7 +595,7 @@ class Main(QMainWindow):
         the process_editor view using recursive function.
         Then inserts the item itself into the process editor view.
 
-        Use following designations of properties in library_item:
+        Use following designations of properties in library_index:
             library_name = Qt.DisplayRole
             type_id = Qt.UserRole + 1
             text_id = Qt.UserRole + 2
@@ -346,8 +608,7 @@ class Main(QMainWindow):
             db_column_names = Qt.UserRole + 9
         """
 
-        library_item = self.ui.library_view.model().itemFromIndex(library_index)
-        library_parent_type_id = library_item.data(Qt.UserRole + 4)
+        library_parent_type_id = library_index.data(Qt.UserRole + 4)
 
         process_editor_index: QModelIndex = self.ui.process_editor_view.selectionModel().currentIndex()
         process_editor_parent_type_id = process_editor_index.parent().data(Qt.UserRole + 1)
@@ -355,9 +616,9 @@ class Main(QMainWindow):
         process_editor_index: QModelIndex = self.ui.process_editor_view.selectionModel().currentIndex()
         parent_of_process_editor_index: QModelIndex = process_editor_index.parent()
 
-        labels = library_item.data(Qt.UserRole + 7)
-        process_name = library_item.data(Qt.UserRole + 6)
-        db_column_names = library_item.data(Qt.UserRole + 9)
+        labels = library_index.data(Qt.UserRole + 7)
+        process_name = library_index.data(Qt.UserRole + 6)
+        db_column_names = library_index.data(Qt.UserRole + 9)
 
         process_editor_model: QAbstractProxyModel = self.ui.process_editor_view.model()
 
@@ -382,6 +643,7 @@ class Main(QMainWindow):
 
     @Slot()
     def on_click_process_editor_view(self, index: QModelIndex):
+        self.submit_parameter_editor()
         self.mapper.setRootIndex(index.parent())
         self.mapper.setCurrentIndex(index.row())
         self.update_parameter_line_edits(self.mapper_index())
@@ -395,11 +657,6 @@ class Main(QMainWindow):
         row = self.mapper.currentIndex()
         return self.ui.process_editor_view.model().index(row, 0, self.mapper.rootIndex())
 
-    @staticmethod
-    def row_count(index: QModelIndex) -> int:
-        model = index.model()
-        return model.get_item(index.parent()).child_count()
-
     def mapper_row(self):
         return self.mapper.currentIndex()
 
@@ -408,54 +665,119 @@ class Main(QMainWindow):
         return index.row() == -1
 
     def is_last_index_of_branch(self, index: QModelIndex) -> bool:
-        return index.row() == self.ui.process_editor_view.model().get_item(index.parent()).child_count() - 1
+        return index.row() == self.ui.process_editor_view.model().rowCount(index.parent()) - 1
 
     @staticmethod
     def has_children(index: QModelIndex) -> bool:
         model = index.model()
+        Main.fetch_branch(model, index)
         return model.hasChildren(index)
 
-    def update_parameter_line_edits(self, index: QModelIndex = None):
-        def is_last_item_of_tree(_index: QModelIndex, is_first_iteration: bool = True) -> bool:
-            _model: QAbstractProxyModel = self.ui.process_editor_view.model()
-            if self.is_root(_index):
-                return True
-            if is_first_iteration and self.has_children(_index):
-                return False
-            print(f"row = {index.row()}, row count = {_model.rowCount(_index.parent())}")
-            if index.row() < _model.rowCount(_index.parent()) - 1:
-                return False
-            return is_last_item_of_tree(_index.parent(), is_first_iteration=False)
-
-        def is_first_item_of_tree(_index: QModelIndex) -> bool:
-            if _index.row() == 0 and self.is_root(_index.parent()):
-                return True
-            return False
+    @staticmethod
+    def fetch_branch(model: QAbstractProxyModel, index: QModelIndex) -> None:
+        """Fetches all children of the index, if the model loads branches lazily."""
+        while model.canFetchMore(index):
+            model.fetchMore(index)
 
-        is_index = index is not None and index.isValid()
-        is_model = self.ui.process_editor_view.model() is not None
+    def fetch_successors(self, index: QModelIndex) -> None:
+        """
+        Fetches operations that may follow the index in pre-order in lazy mode: children of the index, and rows
+        after the index and after its ancestors, where they are the last fetched rows of their branches.
+        """
+        model = index.model()
+        self.fetch_branch(model, index)
+        while index.isValid() and index.row() == model.rowCount(index.parent()) - 1:
+            self.fetch_branch(model, index.parent())
+            if index.row() < model.rowCount(index.parent()) - 1:
+                return
+            index = index.parent()
 
-        self.ui.button_previous.setEnabled(is_index and is_model and not is_first_item_of_tree(index))
-        self.ui.button_next.setEnabled(is_index and is_model and not is_last_item_of_tree(index))
+    def fetch_predecessors(self, index: QModelIndex) -> None:
+        """Fetches the last branch of the previous row of the index down to its last operation in lazy mode."""
+        if index.row() <= 0:
+            return
+        index = index.sibling(index.row() - 1, 0)
+        while self.has_children(index):
+            index = index.model().index(index.model().rowCount(index) - 1, 0, index)
 
-        max_param_count = len(self.ui.line_edit_parameters)
+    def update_parameter_line_edits(self, index: QModelIndex = None):
+        is_index = index is not None and index.isValid()
+        model = self.ui.process_editor_view.model()
+        is_model = model is not None
 
-        is_model_empty = not is_model
+        self.ui.button_previous.setEnabled(is_index and is_model and model.preorder_position(index) > 0)
+        self.ui.button_next.setEnabled(is_index and is_model and not model.is_last_index(index))
 
-        if is_model_empty:
-            param_count = 0
+        self.show_parameters(index if is_index and is_model else None)
+
+    def show_parameters(self, index: [QModelIndex, None]) -> None:
+        """
+        Shows parameter editors of the operation type of the selected operation, labelled by labels
+        and validated by labels_regex of the type. Parameters without a label are named by their position.
+        Editors edit the columns named by db_column_names of the type.
+        """
+        type_id = None if index is None else index.model().type_id(index)
+        record = self.ui.library_view.model().records.get(type_id)
+        if record is None:
+            labels, sections, validators = (), (), ()
         else:
-            # item = self.ui.process_editor_view.model().item.get_item(index)
-            # param_count = -1 + len(item.item_data)
-            param_count = 1
-
-        for column in range(max_param_count):
-            if column >= param_count:
-                self.ui.line_edit_parameters[column].hide()
-                self.ui.label_parameters[column].hide()
+            labels = tuple(
+                record.labels[i] if i < len(record.labels) else f'Parameter {i}'
+                for i in range(len(record.db_column_names)))
+            sections = tuple(index.model().column(name) for name in record.db_column_names)
+            # labels_regex are given per db column name, like in LibraryModel.validate_process
+            validators_by_name = dict(zip(record.db_column_names, self.ui.library_view.model().validators(record)))
+            validators = tuple(validators_by_name.get(name) for name in record.db_column_names)
+        self.ui.show_parameter_editors(self, labels)
+        self.map_parameter_editors(sections, validators)
+
+    def map_parameter_editors(self, sections: tuple[int, ...], validators: tuple[QValidator, ...]) -> None:
+        """
+        Maps the first editors to the sections and attaches the validators of the columns of the sections,
+        and unmaps the editors mapped for the previous operation. An editor of a section -1, a column missing
+        in 'operations', is cleared and disabled. Only changed mappings are touched, the current row is read again
+        if some editor got a new section.
+        """
+        is_mapping_added = False
+        for i in range(max(len(sections), self._mapped_parameters_count)):
+            section = sections[i] if i < len(sections) else -1
+            self.ui.set_parameter_validator(i, validators[i] if section >= 0 else None)
+            if i == len(self._parameter_sections):
+                self._parameter_sections.append(-1)
+                self.ui.line_edit_parameters[i].editingFinished.connect(
+                    partial(self.submit_parameter_editor, self.ui.line_edit_parameters[i]))
+            if self._parameter_sections[i] == section:
+                continue
+            line_edit = self.ui.line_edit_parameters[i]
+            if section < 0:
+                self.mapper.removeMapping(line_edit)
+                line_edit.clear()
             else:
-                self.ui.line_edit_parameters[column].show()
-                self.ui.label_parameters[column].show()
+                self.mapper.addMapping(line_edit, section)
+                is_mapping_added = True
+            line_edit.setEnabled(section >= 0)
+            self._parameter_sections[i] = section
+        self._mapped_parameters_count = len(sections)
+        if is_mapping_added:
+            self.mapper.revert()  # new mappings are not populated until the current row is read again
+
+    def submit_parameter_editor(self, line_edit: QLineEdit = None) -> None:
+        """
+        Writes text of the parameter editor, the focused one by default, to its column of the current operation,
+        if the text was edited. Editors that were only shown are never written, so they can not overwrite
+        values of the operation.
+        """
+        if line_edit is None:
+            line_edit = QApplication.focusWidget()
+        if line_edit not in self.ui.line_edit_parameters or not line_edit.isModified():
+            return
+        i = self.ui.line_edit_parameters.index(line_edit)
+        section = self._parameter_sections[i] if i < len(self._parameter_sections) else -1
+        index = self.mapper_index() if self.mapper.model() is not None else QModelIndex()
+        if section < 0 or not index.isValid():
+            return
+        index.model().setData(index.sibling(index.row(), section), line_edit.text(), Qt.EditRole)
+        line_edit.setModified(False)
 
     @Slot()
     def insert_child(self) -> None:
@@ -566,10 +888,9 @@ class Main(QMainWindow):
             self.ui.process_editor_view.closePersistentEditor(current_index)
 
     def on_click_library_view(self, index: QModelIndex):
-        item = self.library_view.model().itemFromIndex(index)
-        if not item:
+        if not index.isValid():
             return None
-        library_type_id = item.data(Qt.UserRole + 1)
+        library_type_id = index.data(Qt.UserRole + 1)
         operation_id = self.selected_operation_id()
         if library_type_id is None and operation_id is None:
             return
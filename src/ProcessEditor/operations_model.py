@@ -0,0 +1,224 @@
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PySide6.QtSql import QSqlRecord
+from PySide6.QtWidgets import QWidget
+
+
+class OperationsChanges:
+    """Rows of 'operations' inserted, updated and removed since the last save. Values of rows are copied,
+    so the model can be edited further while the changes are written."""
+    __slots__ = ('inserted', 'updated', 'removed_ids')
+
+    def __init__(self):
+        self.inserted = []  # pairs (row, values) of inserted rows
+        self.updated = []  # tuples (row, values, changed columns, id stored in the database) of updated rows
+        self.removed_ids = []  # ids of removed rows
+
+    def __len__(self) -> int:
+        return len(self.inserted) + len(self.updated) + len(self.removed_ids)
+
+
+class OperationsModel(QAbstractTableModel):
+    """Flat in-memory table of 'operations' rows. Rows are appended by the owner of the model
+    in batches, for example by ProcessModel when it fetches branches of the process tree.
+    Edits are tracked until they are taken by take_changes to be saved."""
+
+    def __init__(self, parent: QWidget, record: QSqlRecord):
+        super().__init__(parent)
+        self._column_names = [record.fieldName(column) for column in range(record.count())]
+        self._columns = {name: column for column, name in enumerate(self._column_names)}  # map of names to columns
+        self._id_column = self._column_names.index('id') if 'id' in self._column_names else 0
+        self._rows = []  # list of rows, every row is a list of column values
+        # rows are lists, so changes are tracked by id() of the rows, the rows are kept alive by the maps
+        self._inserted = {}  # map of id() of inserted rows to the rows
+        self._updated = {}  # map of id() of updated rows to tuples (row, changed columns, id stored in the database)
+        self._removed_ids = []  # ids of removed rows stored in the database
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._column_names)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if index.isValid() and role in (Qt.DisplayRole, Qt.EditRole):
+            return self._rows[index.row()][index.column()]
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole) -> bool:
+        if not index.isValid() or role != Qt.EditRole:
+            return False
+        row = self._rows[index.row()]
+        if row[index.column()] == value:
+            return True
+        if id(row) not in self._inserted:
+            self._updated.setdefault(id(row), (row, set(), row[self._id_column]))[1].add(index.column())
+        row[index.column()] = value
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.EditRole])
+        return True
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsEditable
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole and 0 <= section < len(self._column_names):
+            return self._column_names[section]
+        return None
+
+    def insertRows(self, row: int, count: int, parent: QModelIndex = QModelIndex()) -> bool:
+        """Inserts empty rows, all their values are NULL."""
+        if parent.isValid() or count < 1 or not 0 <= row <= len(self._rows):
+            return False
+        self.beginInsertRows(QModelIndex(), row, row + count - 1)
+        rows = [[None] * len(self._column_names) for _ in range(count)]
+        self._rows[row:row] = rows
+        self._inserted.update((id(new_row), new_row) for new_row in rows)
+        self.endInsertRows()
+        return True
+
+    def removeRows(self, row: int, count: int, parent: QModelIndex = QModelIndex()) -> bool:
+        if parent.isValid() or count < 1 or row < 0 or row + count > len(self._rows):
+            return False
+        self.beginRemoveRows(QModelIndex(), row, row + count - 1)
+        for removed_row in self._rows[row:row + count]:
+            if self._inserted.pop(id(removed_row), None) is not None:
+                continue  # the row was never saved
+            updated = self._updated.pop(id(removed_row), None)
+            stored_id = removed_row[self._id_column] if updated is None else updated[2]
+            if stored_id is not None:
+                self._removed_ids.append(stored_id)
+        del self._rows[row:row + count]
+        self.endRemoveRows()
+        return True
+
+    def append_rows(self, rows: list[list]) -> None:
+        """Appends rows to the end of the table with one insert notification."""
+        if not rows:
+            return
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self._rows.extend(rows)
+        self.endInsertRows()
+
+    def merge_rows(self, rows: list[list]) -> None:
+        """
+        Applies rows read from the database. Known rows are updated except columns having unsaved edits,
+        unknown rows are appended, rows removed here and not saved yet are skipped. Changes are not tracked for saving.
+        """
+        positions = self._id_positions()
+        removed_ids = set(self._removed_ids)
+        new_rows = []
+        for values in rows:
+            position = positions.get(values[self._id_column])
+            if position is None:
+                if values[self._id_column] not in removed_ids:
+                    new_rows.append(list(values))
+                continue
+            row = self._rows[position]
+            if id(row) in self._inserted:
+                continue
+            updated = self._updated.get(id(row))
+            edited_columns = updated[1] if updated is not None else ()
+            changed_columns = [
+                column for column, value in enumerate(values) if column not in edited_columns and row[column] != value]
+            if not changed_columns:
+                continue
+            for column in changed_columns:
+                row[column] = values[column]
+            self.dataChanged.emit(
+                self.index(position, min(changed_columns)), self.index(position, max(changed_columns)),
+                [Qt.DisplayRole, Qt.EditRole])
+        self.append_rows(new_rows)
+
+    def remove_rows_by_id(self, ids) -> None:
+        """Removes rows deleted in the database together with their unsaved edits. Removal is not tracked for saving."""
+        positions = self._id_positions()
+        for position in sorted((positions[_id] for _id in ids if _id in positions), reverse=True):
+            self.beginRemoveRows(QModelIndex(), position, position)
+            self._updated.pop(id(self._rows[position]), None)
+            del self._rows[position]
+            self.endRemoveRows()
+
+    def clear(self) -> None:
+        """Removes all rows and forgets changes not taken yet."""
+        self.beginResetModel()
+        self._rows = []
+        self._inserted = {}
+        self._updated = {}
+        self._removed_ids = []
+        self.endResetModel()
+
+    def ids(self) -> set:
+        """Returns ids of rows, rows without id are not counted."""
+        return set(self._id_positions())
+
+    def column_names(self) -> list[str]:
+        return list(self._column_names)
+
+    def column(self, name: str) -> int:
+        """Returns the column of the name, -1 if 'operations' has no such column."""
+        return self._columns.get(name, -1)
+
+    def has_changes(self) -> bool:
+        return bool(self._inserted or self._updated or self._removed_ids)
+
+    def changes_count(self) -> int:
+        """Returns number of rows waiting to be saved, edits of one row are counted once."""
+        return len(self._inserted) + len(self._updated) + len(self._removed_ids)
+
+    def take_changes(self) -> OperationsChanges:
+        """Returns changes made since the last call and starts tracking anew."""
+        changes = OperationsChanges()
+        changes.inserted = [(row, list(row)) for row in self._inserted.values()]
+        for key, (row, columns, stored_id) in list(self._updated.items()):
+            if stored_id is None:
+                continue  # the row is being inserted, it is updated when the database returns its id
+            changes.updated.append((row, list(row), frozenset(columns), stored_id))
+            del self._updated[key]
+        changes.removed_ids = self._removed_ids
+        self._inserted = {}
+        self._removed_ids = []
+        return changes
+
+    def restore_changes(self, changes: OperationsChanges) -> None:
+        """Tracks changes again, if they were not saved. Changes of rows removed meanwhile are dropped."""
+        positions = self._positions()
+        for row, _ in changes.inserted:
+            if id(row) in positions:
+                self._inserted[id(row)] = row
+                self._updated.pop(id(row), None)
+        for row, _, columns, stored_id in changes.updated:
+            if id(row) in positions and id(row) not in self._inserted:
+                self._updated.setdefault(id(row), (row, set(), stored_id))[1].update(columns)
+        self._removed_ids[:0] = changes.removed_ids
+
+    def set_inserted_ids(self, changes: OperationsChanges, ids: list) -> None:
+        """Writes ids given by the database to saved inserted rows."""
+        saved_ids = {new_id for (_, values), new_id in zip(changes.inserted, ids) if values[self._id_column] is None}
+        # a row may be appended by merge_rows already, if it was read from the database before its id arrived
+        self.remove_rows_by_id(saved_ids & self.ids())
+        positions = self._positions()
+        for (row, values), new_id in zip(changes.inserted, ids):
+            if values[self._id_column] is not None or new_id is None:
+                continue
+            position = positions.get(id(row))
+            if position is None:
+                self._removed_ids.append(new_id)  # the row was removed while it was being saved
+                continue
+            updated = self._updated.get(id(row))
+            if updated is not None:
+                self._updated[id(row)] = (row, updated[1], new_id)
+            if row[self._id_column] is None:
+                row[self._id_column] = new_id
+                index = self.index(position, self._id_column)
+                self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.EditRole])
+
+    def _id_positions(self) -> dict:
+        """Returns map of ids of rows to their positions."""
+        return {row[self._id_column]: position for position, row in enumerate(self._rows)
+                if row[self._id_column] is not None}
+
+    def _positions(self) -> dict[int, int]:
+        """Returns map of id() of rows to their positions."""
+        return {id(row): position for position, row in enumerate(self._rows)}
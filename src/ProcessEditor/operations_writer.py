@@ -0,0 +1,165 @@
+from PySide6.QtSql import QSqlDatabase, QSqlQuery
+
+from ProcessEditor.operations_model import OperationsChanges
+from ProcessEditor.queries import QueryError, execute
+
+
+# maximum number of values bound to one statement, below the limits of SQLite (32766) and PostgreSQL (65535)
+MAX_BOUND_VALUES = 30000
+
+# drivers returning ids of rows inserted by a multi-row INSERT ... RETURNING in order of its VALUES,
+# rows without id are inserted one by one on other drivers to read their ids with lastInsertId()
+RETURNING_DRIVERS = ('QPSQL',)
+
+
+class SaveError(Exception):
+    """Changes of operations could not be written, the transaction was rolled back."""
+
+
+def save_operations(
+        connection: QSqlDatabase, column_names: list[str], changes: OperationsChanges, id_column: str = 'id') -> list:
+    """
+    Writes changes of 'operations' in one transaction with multi-row statements, one round trip per batch:
+        DELETE FROM operations WHERE id IN (...)
+        INSERT INTO operations (...) VALUES (...), (...)
+        UPDATE operations SET ... FROM (VALUES (...), (...)) AS v WHERE operations.id = v.column1
+    Updated rows are grouped by changed columns, so columns edited by others are not overwritten.
+    Inserted rows without id are written with INSERT ... RETURNING id on RETURNING_DRIVERS,
+    on other drivers one by one, because the database has to return their ids.
+    Returns ids of inserted rows in order of changes.inserted. Raises SaveError after rollback.
+    """
+    if not len(changes):
+        return []
+    if not connection.transaction():
+        raise SaveError(connection.lastError().text())
+    try:
+        _delete_rows(connection, changes.removed_ids, id_column)
+        ids = _insert_rows(connection, column_names, [values for _, values in changes.inserted], id_column)
+        _update_rows(connection, column_names, changes.updated, id_column)
+    except SaveError:
+        connection.rollback()
+        raise
+    if not connection.commit():
+        message = connection.lastError().text()
+        connection.rollback()
+        raise SaveError(message)
+    return ids
+
+
+def _delete_rows(connection: QSqlDatabase, ids: list, id_column: str) -> None:
+    for chunk in _chunks(ids, MAX_BOUND_VALUES):
+        _exec(connection, f"DELETE FROM operations WHERE {id_column} IN ({', '.join('?' * len(chunk))})", chunk)
+
+
+def _insert_rows(connection: QSqlDatabase, column_names: list[str], rows: list[list], id_column: str) -> list:
+    id_position = column_names.index(id_column)
+    ids = [values[id_position] for values in rows]
+
+    rows_with_id = [values for values in rows if values[id_position] is not None]
+    placeholders = f"({', '.join('?' * len(column_names))})"
+    for chunk in _chunks(rows_with_id, max(1, MAX_BOUND_VALUES // len(column_names))):
+        _exec(
+            connection,
+            f"INSERT INTO operations ({', '.join(column_names)}) VALUES {', '.join([placeholders] * len(chunk))}",
+            [value for values in chunk for value in values])
+
+    positions = [position for position, values in enumerate(rows) if values[id_position] is None]
+    if not positions:
+        return ids
+    names = [name for name in column_names if name != id_column]
+    rows_without_id = [rows[position][:id_position] + rows[position][id_position + 1:] for position in positions]
+    if connection.driverName() in RETURNING_DRIVERS:
+        new_ids = _insert_returning(connection, names, rows_without_id, id_column)
+    else:
+        new_ids = []
+        statement = f"INSERT INTO operations ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})"
+        for values in rows_without_id:
+            query = _exec(connection, statement, values)
+            new_ids.append(query.lastInsertId())
+            query.finish()
+    for position, new_id in zip(positions, new_ids):
+        ids[position] = new_id
+    return ids
+
+
+def _insert_returning(connection: QSqlDatabase, names: list[str], rows: list[list], id_column: str) -> list:
+    """Inserts rows without id with multi-row statements. Returns their ids in order of the rows."""
+    ids = []
+    placeholders = f"({', '.join('?' * len(names))})"
+    for chunk in _chunks(rows, max(1, MAX_BOUND_VALUES // len(names))):
+        query = _exec(
+            connection,
+            f"""
+            INSERT INTO operations ({', '.join(names)}) VALUES {', '.join([placeholders] * len(chunk))}
+            RETURNING {id_column}
+            """,
+            [value for values in chunk for value in values])
+        chunk_ids = []
+        while query.next():
+            chunk_ids.append(query.value(0))
+        query.finish()
+        if len(chunk_ids) != len(chunk):
+            raise SaveError(f"{len(chunk)} operations were inserted, {len(chunk_ids)} ids were returned")
+        ids.extend(chunk_ids)
+    return ids
+
+
+def _update_rows(connection: QSqlDatabase, column_names: list[str], updated: list[tuple], id_column: str) -> None:
+    groups = {}  # map of changed columns to rows having them changed
+    for _, values, columns, stored_id in updated:
+        columns = tuple(sorted(columns))
+        groups.setdefault(columns, []).append([stored_id] + [values[column] for column in columns])
+    if not groups:
+        return
+
+    types = _column_types(connection)
+    for columns, rows in groups.items():
+        names = [column_names[column] for column in columns]
+        # PostgreSQL does not infer types of parameters of VALUES, the first row is cast to types of the columns
+        first_row = ', '.join(_placeholder(types.get(name)) for name in [id_column] + names)
+        other_row = f"({', '.join('?' * (len(names) + 1))})"
+        assignments = ', '.join(f"{name} = v.column{position}" for position, name in enumerate(names, 2))
+        for chunk in _chunks(rows, max(1, MAX_BOUND_VALUES // (len(names) + 1))):
+            _exec(
+                connection,
+                f"""
+                UPDATE operations SET {assignments}
+                FROM (VALUES ({first_row}){''.join(', ' + other_row for _ in chunk[1:])}) AS v
+                WHERE operations.{id_column} = v.column1
+                """,
+                [value for values in chunk for value in values])
+
+
+def _column_types(connection: QSqlDatabase) -> dict[str, str]:
+    """Returns map of column names of 'operations' to SQL types, if the driver needs typed VALUES lists."""
+    if connection.driverName() != 'QPSQL':
+        return {}
+    query = _exec(
+        connection,
+        """
+        SELECT attname, format_type(atttypid, atttypmod) FROM pg_attribute
+        WHERE attrelid = 'operations'::regclass AND attnum > 0 AND NOT attisdropped
+        """,
+        [])
+    types = {}
+    while query.next():
+        types[query.value(0)] = query.value(1)
+    query.finish()
+    return types
+
+
+def _placeholder(sql_type: [str, None]) -> str:
+    return '?' if sql_type is None else f"CAST(? AS {sql_type})"
+
+
+def _exec(connection: QSqlDatabase, statement: str, values: list) -> QSqlQuery:
+    # statements of full chunks repeat between saves, so their prepared queries are reused
+    try:
+        return execute(connection, statement, values)
+    except QueryError as error:
+        raise SaveError(str(error)) from None
+
+
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
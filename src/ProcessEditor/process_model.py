@@ -1,36 +1,104 @@
-from collections import namedtuple
-import random
+import bisect
+from math import inf
 
 from PySide6.QtCore import QAbstractProxyModel, QModelIndex, Qt
-from PySide6.QtSql import QSqlTableModel
+from PySide6.QtSql import QSqlRecord
 from PySide6.QtWidgets import QWidget
 
+from ProcessEditor.operations_model import OperationsModel
+from ProcessEditor.operations_writer import SaveError, save_operations
+from ProcessEditor.queries import (
+    SELECT_CHILD_OPERATIONS, SELECT_NEXT_CHILD_OPERATIONS, SELECT_NEXT_TOP_LEVEL_OPERATIONS, SELECT_OPERATIONS,
+    SELECT_TOP_LEVEL_OPERATIONS, QueryError, execute,
+)
 
-GROUP_ITEM = namedtuple("groupItem", ["name", "children", "index"])
-ROW_ITEM = namedtuple("rowItem", ["groupIndex", "random"])
+
+# number of children fetched at once in lazy mode, if 'fetch_batch_size' is not set
+FETCH_BATCH_SIZE = 256
+
+# approximate sizes of Python objects of one operation, measured on CPython 3.12, used for memory budgets
+ITEM_BYTES = 330  # OperationItem with its entries in the tree maps
+VALUE_BYTES = 35  # one column value of a source row
+
+# internal id of the invisible root item; every other index carries the key of its own operation item
+ROOT_KEY = 0
+
+
+class OperationItem:
+    """Item of the process tree. Stores the source row of an operation and the place of the operation in the tree."""
+    __slots__ = (
+        'key', 'source_row', 'operation_id', 'parent_id', 'order_id', 'parent_key', 'row', 'children',
+        'last_fetched', 'can_fetch_more',
+    )
+
+    def __init__(self, key: int, source_row: int = -1):
+        self.key = key
+        self.source_row = source_row
+        self.operation_id = None
+        self.parent_id = None
+        self.order_id = None
+        self.parent_key = ROOT_KEY
+        self.row = -1  # row of the item among children of its parent, -1 while the item is not in the tree
+        self.children = []  # keys of child items ordered by order_id
+        self.last_fetched = None  # (order_id, id) of the last child fetched in lazy mode, None before the first batch
+        self.can_fetch_more = False  # True if children of the item are not fetched yet in lazy mode
+
+
+def select_operations(settings: dict) -> tuple[QSqlRecord, list[list]]:
+    """
+    Selects all operations of settings['process_version_id'] ordered by order_id.
+    Returns the record of the columns of 'operations' and the rows.
+    Does not touch any model, so it can be called in a worker thread with a connection opened in that thread.
+    """
+    try:
+        query = execute(
+            settings['connection'], SELECT_OPERATIONS, {':process_version_id': settings['process_version_id']})
+    except QueryError:
+        return settings['connection'].record('operations'), []
+    record = query.record()
+    if record.isEmpty():
+        record = settings['connection'].record('operations')
+    column_count = record.count()
+    rows = []
+    while query.next():
+        rows.append([None if query.isNull(column) else query.value(column) for column in range(column_count)])
+    query.finish()
+    return record, rows
 
 
 class ProcessModel(QAbstractProxyModel):
-    def __init__(self, parent: QWidget, settings: dict):
+    def __init__(self, parent: QWidget, settings: dict, operations: tuple[QSqlRecord, list[list]] = None):
+        """Builds the tree of operations, if they were selected in advance by select_operations,
+        otherwise selects them first. In lazy mode operations are always fetched by the model."""
         super().__init__(parent)
         self.settings = settings
 
         self._root_item = QModelIndex()
-        self._parent_id_tuples = []  # list of groupItems
-        self._parent_id_internal_indices_dict = {}  # map of group names to group indexes
-        self._parent_id_internal_indices_list = []  # list of groupIndexes for locating group row
-        self._source_rows = []  # map of source rows to group index
+        self._items = {ROOT_KEY: OperationItem(ROOT_KEY)}  # map of item keys to operation items
+        self._source_keys = []  # map of source rows to item keys
+        self._keys_by_operation_id = {}  # map of operation ids to item keys
+        self._orphan_keys = {}  # map of missing parent ids to keys of items shown at root level until parent appears
+        self._next_key = ROOT_KEY + 1
+        self._preorder_keys = None  # keys of items in pre-order, built on demand, None after the tree changed
+        self._preorder_positions = None  # map of item keys to their positions in _preorder_keys
         self._column_id = 0  # id column = 'id'
         self._column_parent_id = 1  # parent_id column = 'parent_id'
         self._column_type_id = 2  # type_id column = 'type_id'
         self._column_parent_type_id = 3  # parent_type_id column = 'parent_type_id'
         self._column_order_id = 4  # order_id column = 'order_id'
 
-        source_model = QSqlTableModel(parent, self.settings['connection'])
-        source_model.setTable('operations')
-        source_model.setEditStrategy(QSqlTableModel.EditStrategy.OnManualSubmit)
-        source_model.setFilter(f"process_version_id = {self.settings['process_version_id']}")
-        source_model.select()
+        self._is_lazy = bool(self.settings.get('lazy_loading'))
+        self._fetch_batch_size = self.settings.get('fetch_batch_size', FETCH_BATCH_SIZE)
+
+        if self._is_lazy:
+            # only top-level operations are queried now, branches are fetched when they are expanded
+            source_model = OperationsModel(parent, self.settings['connection'].record('operations'))
+            self._items[ROOT_KEY].can_fetch_more = True
+        else:
+            # operations are sorted by order_id, so children are built already ordered
+            record, rows = select_operations(self.settings) if operations is None else operations
+            source_model = OperationsModel(parent, record)
+            source_model.append_rows(rows)
         super().setSourceModel(source_model)
 
         # connect signals
@@ -40,34 +108,22 @@ class ProcessModel(QAbstractProxyModel):
         self.sourceModel().columnsRemoved.connect(self.columnsRemoved.emit)
 
         self.sourceModel().rowsInserted.connect(self._rowsInserted)
+        self.sourceModel().rowsAboutToBeRemoved.connect(self._rowsAboutToBeRemoved)
         self.sourceModel().rowsRemoved.connect(self._rowsRemoved)
         self.sourceModel().dataChanged.connect(self._dataChanged)
 
-        # set grouping
+        # build the tree
         self.beginResetModel()
-        source_model: QSqlTableModel = self.sourceModel()
-        source_row_count = source_model.rowCount(QModelIndex())
-        for row in range(source_row_count):
-            parent_id_index = self.createIndex(row, self._column_parent_id, 0)
-            type_id_index = self.createIndex(row, self._column_type_id, 0)
-            parent_id = source_model.data(parent_id_index, Qt.DisplayRole)
-            type_id = int(source_model.data(type_id_index, Qt.DisplayRole))
-            parent_id_index = self._get_parent_id_index(parent_id)
-            row_item = ROW_ITEM(parent_id_index, type_id)
-            idx_row = parent_id_index.row()
-            self._parent_id_tuples[idx_row].children.append(row_item)
-            self._source_rows.append(row_item)
+        self._build_tree()
         self.endResetModel()
+        if self._is_lazy:
+            self.fetchMore(self._root_item)
 
     def rowCount(self, parent: QModelIndex) -> int:
-        if parent == self._root_item:
-            # root level
-            return len(self._parent_id_tuples)
-        elif parent.internalPointer() == self._root_item:
-            # children level
-            return len(self._parent_id_tuples[parent.row()].children)
-        else:
+        if parent.column() > 0:
             return 0
+        parent_key = self._key(parent)
+        return len(self._items[parent_key].children)
 
     def columnCount(self, parent: QModelIndex) -> int:
         """Returns the number of columns for the children of the given parent."""
@@ -76,36 +132,83 @@ class ProcessModel(QAbstractProxyModel):
         else:
             return 0
 
-    def index(self, row: int, column: int, parent: QModelIndex) -> QModelIndex:
-        if parent == self._root_item:
-            # this is a group
-            return self.createIndex(row, column, self._root_item)
-        elif parent.internalPointer() == self._root_item:
-            return self.createIndex(row, column, self._parent_id_tuples[parent.row()].index)
+    def hasChildren(self, parent: QModelIndex = QModelIndex()) -> bool:
+        if parent.column() > 0:
+            return False
+        item = self._items[self._key(parent)]
+        return bool(item.children) or item.can_fetch_more
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        if parent.column() > 0:
+            return False
+        return self._items[self._key(parent)].can_fetch_more
+
+    def fetchMore(self, parent: QModelIndex) -> None:
+        """Fetches next batch of children of the parent in lazy mode."""
+        if not self.canFetchMore(parent):
+            return
+        item = self._items[self._key(parent)]
+        values = {
+            ':process_version_id': self.settings['process_version_id'],
+            ':limit': self._fetch_batch_size,
+        }
+        if item.key == ROOT_KEY:
+            statement = SELECT_TOP_LEVEL_OPERATIONS if item.last_fetched is None else SELECT_NEXT_TOP_LEVEL_OPERATIONS
         else:
+            statement = SELECT_CHILD_OPERATIONS if item.last_fetched is None else SELECT_NEXT_CHILD_OPERATIONS
+            values[':parent_id'] = item.operation_id
+        if item.last_fetched is not None:
+            values[':after_order_id'], values[':after_id'] = item.last_fetched
+        try:
+            query = execute(self.settings['connection'], statement, values)
+        except QueryError:
+            return
+
+        column_count = self.sourceModel().columnCount()
+        rows = []
+        has_children = []
+        fetched_count = 0
+        while query.next():
+            fetched_count += 1
+            row = [None if query.isNull(column) else query.value(column) for column in range(column_count)]
+            item.last_fetched = (row[self._column_order_id], row[self._column_id])
+            # operations merged by ProcessSync or moved here from another branch are loaded already
+            if row[self._column_id] in self._keys_by_operation_id:
+                continue
+            rows.append(row)
+            has_children.append(bool(query.value(column_count)))
+        query.finish()
+
+        item.can_fetch_more = fetched_count == self._fetch_batch_size
+        first_row = len(self._source_keys)
+        self.sourceModel().append_rows(rows)
+        for row, can_fetch_more in enumerate(has_children, first_row):
+            self._items[self._source_keys[row]].can_fetch_more = can_fetch_more
+
+    def index(self, row: int, column: int, parent: QModelIndex) -> QModelIndex:
+        if not self.hasIndex(row, column, parent):
             return QModelIndex()
+        parent_key = self._key(parent)
+        return self.createIndex(row, column, self._items[parent_key].children[row])
 
     def parent(self, index) -> QModelIndex:
-        parent = index.internalPointer()
-        if parent == self._root_item:
+        if not index.isValid():
             return self._root_item
-        else:
-            parent_row = self._getGroupRow(parent)
-            return self.createIndex(parent_row, 0, self._root_item)
+        return self._item_index(self._items[index.internalId()].parent_key)
+
+    def sibling(self, row: int, column: int, index: QModelIndex) -> QModelIndex:
+        if row == index.row() and column == index.column():
+            return index
+        return self.index(row, column, self.parent(index))
 
     def data(self, index, role):
-        if role == Qt.DisplayRole:
-            parent = index.internalPointer()
-            if parent == self._root_item:
-                return self._parent_id_tuples[index.row()].name
-            else:
-                parent_row = self._getGroupRow(parent)
-                source_row = self._source_rows.index(self._parent_id_tuples[parent_row].children[index.row()])
-                source_index = self.createIndex(source_row, index.column(), 0)
-                return self.sourceModel().data(source_index, role)
+        if role == Qt.DisplayRole or role == Qt.EditRole:
+            return self.sourceModel().data(self.mapToSource(index), role)
         return None
 
     def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
         return Qt.ItemIsEnabled | Qt.ItemIsSelectable
 
     def headerData(self, section, orientation, role):
@@ -114,96 +217,375 @@ class ProcessModel(QAbstractProxyModel):
     def mapToSource(self, index):
         if not index.isValid():
             return QModelIndex()
+        return self.sourceModel().index(self._items[index.internalId()].source_row, index.column())
 
-        parent = index.internalPointer()
-        if not parent.isValid():
+    def mapFromSource(self, index):
+        if not index.isValid():
             return QModelIndex()
-        elif parent == self._root_item:
+        item = self._items[self._source_keys[index.row()]]
+        return self.createIndex(item.row, index.column(), item.key)
+
+    def column(self, name: str) -> int:
+        """Returns the column of the operations column of the name, -1 if 'operations' has no such column."""
+        return self.sourceModel().column(name)
+
+    def type_id(self, index: QModelIndex) -> [int, None]:
+        """Returns type_id of the operation of the index."""
+        if not index.isValid():
+            return None
+        return self._source_int(self._items[index.internalId()].source_row, self._column_type_id)
+
+    def preorder_count(self) -> int:
+        """Returns number of operations in the tree, in lazy mode of the fetched ones."""
+        return len(self._preorder()[0])
+
+    def preorder_position(self, index: QModelIndex) -> int:
+        """Returns position of the operation of the index in pre-order of the tree, -1 for the invalid index."""
+        if not index.isValid():
+            return -1
+        return self._preorder()[1][index.internalId()]
+
+    def preorder_index(self, position: int) -> QModelIndex:
+        """Returns index of the operation at the position in pre-order, invalid index if there is none."""
+        keys = self._preorder()[0]
+        if not 0 <= position < len(keys):
             return QModelIndex()
-        else:
-            row_item_ = self._parent_id_tuples[parent.row()].children[index.row()]
-            source_row = self._source_rows.index(row_item_)
-            return self.createIndex(source_row, index.column(), QModelIndex())
+        return self._item_index(keys[position])
 
-    def mapFromSource(self, index):
-        row_item_ = self._source_rows[index.row()]
-        group_row = self._getGroupRow(row_item_.groupIndex)
-        item_row = self._parent_id_tuples[group_row].children.index(row_item_)
-        return self.createIndex(item_row, index.column(), self._parent_id_internal_indices_list[group_row])
-
-    def _get_parent_id_index(self, parent_id):
-        """ return the index for a group denoted with name.
-        if there is no group with given name, create and then return"""
-        if parent_id in self._parent_id_internal_indices_dict:
-            return self._parent_id_internal_indices_dict[parent_id]
-        else:
-            parent_id_row = len(self._parent_id_internal_indices_dict)
-            parent_id_internal_index = self.createIndex(parent_id_row, 0, self._root_item)
-            self._parent_id_internal_indices_dict[parent_id] = parent_id_internal_index
-            self._parent_id_internal_indices_list.append(parent_id_internal_index)
-            self._parent_id_tuples.append(GROUP_ITEM(parent_id, [], parent_id_internal_index))
-            self.layoutChanged.emit()
-            return parent_id_internal_index
-
-    def _getGroupRow(self, group_index):
-        for i, x in enumerate(self._parent_id_internal_indices_list):
-            if id(group_index) == id(x):
-                return i
-        return 0
+    def next_index(self, index: QModelIndex) -> QModelIndex:
+        """Returns index of the operation following the index in pre-order, invalid index after the last one."""
+        return self.preorder_index(self.preorder_position(index) + 1) if index.isValid() else QModelIndex()
+
+    def previous_index(self, index: QModelIndex) -> QModelIndex:
+        """Returns index of the operation preceding the index in pre-order, invalid index before the first one."""
+        return self.preorder_index(self.preorder_position(index) - 1) if index.isValid() else QModelIndex()
+
+    def is_last_index(self, index: QModelIndex) -> bool:
+        """Returns True if no operation follows the index in pre-order, neither a fetched nor a not fetched one."""
+        keys = self._preorder()[0]
+        if self.preorder_position(index) != len(keys) - 1:
+            return False
+        key = self._key(index)
+        while True:
+            item = self._items[key]
+            if item.can_fetch_more:
+                return False
+            if key == ROOT_KEY:
+                return True
+            key = item.parent_key
+
+    def save(self) -> int:
+        """
+        Writes operations inserted, changed and removed since the last save to the database in one transaction.
+        Returns number of saved rows. Raises SaveError, if saving failed, the changes are kept to be saved again.
+        """
+        source_model = self.sourceModel()
+        changes = source_model.take_changes()
+        try:
+            ids = save_operations(self.settings['connection'], source_model.column_names(), changes)
+        except SaveError:
+            source_model.restore_changes(changes)
+            raise
+        source_model.set_inserted_ids(changes, ids)
+        return len(changes)
+
+    def estimated_size(self) -> int:
+        """Returns approximate number of bytes held by operations and the tree index of the model."""
+        source_model = self.sourceModel()
+        return source_model.rowCount() * (ITEM_BYTES + VALUE_BYTES * source_model.columnCount())
+
+    def release(self) -> None:
+        """Drops operations and the tree index, e.g. when the process version is closed. The model stays empty."""
+        self.beginResetModel()
+        self.sourceModel().clear()
+        self._items = {ROOT_KEY: OperationItem(ROOT_KEY)}
+        self._source_keys = []
+        self._keys_by_operation_id = {}
+        self._orphan_keys = {}
+        self._invalidate_preorder()
+        self.endResetModel()
+
+    def apply_remote_changes(self, rows: list[list], removed_ids) -> None:
+        """
+        Applies operations changed and removed in the database by other users, e.g. by ProcessSync.
+        In lazy mode new operations are shown only in branches fetched completely,
+        other branches get them when they are fetched.
+        """
+        if self._is_lazy:
+            rows = [values for values in rows if self._is_branch_fetched(values)]
+        self.sourceModel().merge_rows(rows)
+        self.sourceModel().remove_rows_by_id(removed_ids)
+
+    def fetched_branches(self) -> [dict, None]:
+        """
+        Returns map of ids of parent operations, None for the top level, to ids of their loaded children
+        for branches fetched completely in lazy mode. Returns None if all operations are loaded.
+        """
+        if not self._is_lazy:
+            return None
+        branches = {}
+        for item in self._items.values():
+            if item.can_fetch_more or (item.key != ROOT_KEY and item.operation_id is None):
+                continue
+            parent_id = None if item.key == ROOT_KEY else item.operation_id
+            # orphans shown at the top level belong to branches of their missing parents
+            branches[parent_id] = {
+                child.operation_id for child in (self._items[key] for key in item.children)
+                if child.operation_id is not None and child.parent_id == parent_id}
+        return branches
+
+    def _is_branch_fetched(self, values: list) -> bool:
+        """Returns True if the operation of source values is loaded or all children of its parent are fetched."""
+        if values[self._column_id] in self._keys_by_operation_id:
+            return True
+        parent_id = values[self._column_parent_id]
+        parent_key = ROOT_KEY if parent_id is None else self._keys_by_operation_id.get(parent_id)
+        return parent_key is not None and not self._items[parent_key].can_fetch_more
+
+    def _build_tree(self) -> None:
+        """Builds the tree in one pass over source rows. Source rows are sorted by order_id,
+        so children are appended to their parents already ordered."""
+        self._invalidate_preorder()
+        source_model = self.sourceModel()
+        for row in range(source_model.rowCount(QModelIndex())):
+            self._source_keys.append(self._new_item(row).key)
+        for key in self._source_keys:
+            item = self._items[key]
+            item.parent_key = self._find_parent_key(item)
+            children = self._items[item.parent_key].children
+            item.row = len(children)
+            children.append(key)
+        self._park_cycles()
+
+    def _park_cycles(self) -> None:
+        """Moves one item of every parent_id cycle to root level as orphan, items of cycles are not reachable
+        from the root otherwise."""
+        reached = set(self._preorder()[1])
+        for key in self._source_keys:
+            if key in reached:
+                continue
+            path = set()
+            while key not in path:  # the walk up from an unreachable item ends in a cycle
+                path.add(key)
+                key = self._items[key].parent_key
+            item = self._items[key]
+            self._orphan_keys.setdefault(item.parent_id, set()).add(key)
+            self._detach(item)
+            self._attach(item, ROOT_KEY, self._insert_position(item, ROOT_KEY))
+            branch = [key]
+            while branch:
+                key = branch.pop()
+                reached.add(key)
+                branch.extend(self._items[key].children)
+
+    def _new_item(self, source_row: int) -> OperationItem:
+        """Creates item for the source row and reads its tree columns. The item is not attached to the tree."""
+        item = OperationItem(self._next_key, source_row)
+        self._next_key += 1
+        self._items[item.key] = item
+        self._read_item(item)
+        if item.operation_id is not None:
+            self._keys_by_operation_id[item.operation_id] = item.key
+        return item
+
+    def _read_item(self, item: OperationItem) -> None:
+        item.operation_id = self._source_int(item.source_row, self._column_id)
+        item.parent_id = self._source_int(item.source_row, self._column_parent_id)
+        item.order_id = self._source_int(item.source_row, self._column_order_id)
+
+    def _source_int(self, row: int, column: int) -> [int, None]:
+        """Returns integer value of the source model cell, None for NULL."""
+        source_model = self.sourceModel()
+        value = source_model.data(source_model.index(row, column), Qt.DisplayRole)
+        return value if isinstance(value, int) else None
+
+    def _find_parent_key(self, item: OperationItem) -> int:
+        """Returns key of the parent item. An item with unknown parent is registered as orphan
+        and stays at root level until its parent appears."""
+        if item.parent_id is None:
+            return ROOT_KEY
+        parent_key = self._keys_by_operation_id.get(item.parent_id)
+        if parent_key is None or parent_key == item.key:
+            self._orphan_keys.setdefault(item.parent_id, set()).add(item.key)
+            return ROOT_KEY
+        return parent_key
+
+    def _forget_orphan(self, item: OperationItem) -> None:
+        orphans = self._orphan_keys.get(item.parent_id)
+        if orphans is not None:
+            orphans.discard(item.key)
+            if not orphans:
+                del self._orphan_keys[item.parent_id]
+
+    @staticmethod
+    def _key(index: QModelIndex) -> int:
+        """Returns key of the item of the index, ROOT_KEY for the invalid index."""
+        return index.internalId() if index.isValid() else ROOT_KEY
+
+    def _item_index(self, key: int) -> QModelIndex:
+        """Returns index of the item in column 0."""
+        if key == ROOT_KEY:
+            return QModelIndex()
+        return self.createIndex(self._items[key].row, 0, key)
+
+    def _order_key(self, key: int):
+        order_id = self._items[key].order_id
+        return inf if order_id is None else order_id
+
+    def _insert_position(self, item: OperationItem, parent_key: int) -> int:
+        """Returns row among children of the parent where the item belongs by its order_id,
+        counted as if the item was already taken out of the tree."""
+        children = self._items[parent_key].children
+        if item.row >= 0 and item.parent_key == parent_key:
+            children = children[:item.row] + children[item.row + 1:]
+        return bisect.bisect_right(children, self._order_key(item.key), key=self._order_key)
+
+    def _preorder(self) -> tuple[list[int], dict[int, int]]:
+        """
+        Returns keys of items in pre-order and map of keys to positions. They are built in one pass over the tree
+        when the tree changed since the last call, so stepping through an unchanged tree costs O(1) per step.
+        """
+        if self._preorder_keys is None:
+            keys = []
+            stack = list(reversed(self._items[ROOT_KEY].children))
+            while stack:
+                key = stack.pop()
+                keys.append(key)
+                stack.extend(reversed(self._items[key].children))
+            self._preorder_keys = keys
+            self._preorder_positions = {key: position for position, key in enumerate(keys)}
+        return self._preorder_keys, self._preorder_positions
+
+    def _invalidate_preorder(self) -> None:
+        self._preorder_keys = None
+        self._preorder_positions = None
+
+    def _renumber(self, children: list, first: int) -> None:
+        for row in range(first, len(children)):
+            self._items[children[row]].row = row
+
+    def _attach(self, item: OperationItem, parent_key: int, row: int) -> None:
+        children = self._items[parent_key].children
+        children.insert(row, item.key)
+        item.parent_key = parent_key
+        self._renumber(children, row)
+        self._invalidate_preorder()
+
+    def _detach(self, item: OperationItem) -> None:
+        children = self._items[item.parent_key].children
+        children.pop(item.row)
+        self._renumber(children, item.row)
+        item.row = -1
+        self._invalidate_preorder()
+
+    def _insert_item(self, item: OperationItem) -> None:
+        parent_key = self._find_parent_key(item)
+        row = self._insert_position(item, parent_key)
+        self.beginInsertRows(self._item_index(parent_key), row, row)
+        self._attach(item, parent_key, row)
+        self.endInsertRows()
+
+    def _remove_item(self, item: OperationItem) -> None:
+        """Removes the item from the tree. Children of the item become orphans at root level."""
+        for child_key in list(item.children):
+            child = self._items[child_key]
+            self._orphan_keys.setdefault(child.parent_id, set()).add(child_key)
+            self._move_item(child, ROOT_KEY)
+        self.beginRemoveRows(self._item_index(item.parent_key), item.row, item.row)
+        self._detach(item)
+        self.endRemoveRows()
+        self._forget_orphan(item)
+        if self._keys_by_operation_id.get(item.operation_id) == item.key:
+            del self._keys_by_operation_id[item.operation_id]
+        del self._items[item.key]
+
+    def _move_item(self, item: OperationItem, parent_key: int) -> None:
+        """Moves the item to its ordered position among children of the parent. An item, whose parent is inside
+        its own branch because of a parent_id cycle, is moved to root level as orphan until the cycle is broken."""
+        if self._is_in_branch(parent_key, item.key):
+            self._orphan_keys.setdefault(item.parent_id, set()).add(item.key)
+            parent_key = ROOT_KEY
+        row = self._insert_position(item, parent_key)
+        is_same_parent = parent_key == item.parent_key
+        if is_same_parent and row == item.row:
+            return
+        destination_row = row + 1 if is_same_parent and row > item.row else row
+        self.beginMoveRows(
+            self._item_index(item.parent_key), item.row, item.row, self._item_index(parent_key), destination_row)
+        self._detach(item)
+        self._attach(item, parent_key, row)
+        self.endMoveRows()
+
+    def _is_in_branch(self, key: int, branch_key: int) -> bool:
+        """Returns True if the item of the key is the item of branch_key or one of its descendants."""
+        while key != ROOT_KEY:
+            if key == branch_key:
+                return True
+            key = self._items[key].parent_key
+        return False
+
+    def _adopt_orphans(self, item: OperationItem) -> None:
+        """Moves items waiting for the operation of the item under the item."""
+        for orphan_key in self._orphan_keys.pop(item.operation_id, ()):
+            self._move_item(self._items[orphan_key], item.key)
+
+    def _adopt_cycle_orphans(self) -> None:
+        """Moves orphans, whose parents are loaded, under their parents, if their parent_id cycle is broken."""
+        for parent_id in [parent_id for parent_id in self._orphan_keys if parent_id in self._keys_by_operation_id]:
+            self._adopt_orphans(self._items[self._keys_by_operation_id[parent_id]])
+
+    def _shift_source_rows(self, first: int, delta: int) -> None:
+        """Shifts stored source rows starting from first by delta after rows are inserted or removed in source."""
+        for key in self._source_keys[first:]:
+            self._items[key].source_row += delta
 
     def _rowsInserted(self, parent, start, end):
+        count = end - start + 1
+        self._source_keys[start:start] = [ROOT_KEY] * count
+        self._shift_source_rows(end + 1, count)
         for row in range(start, end+1):
-            group_name = self.sourceModel().data(self.createIndex(row, self._column_parent_id, 0), Qt.DisplayRole)
-            group_index = self._get_parent_id_index(group_name)
-            self._getGroupRow(group_index)
-            group_item_ = self._parent_id_tuples[self._getGroupRow(group_index)]
-            row_item_ = ROW_ITEM(group_index, random.random())
-            group_item_.children.append(row_item_)
-            self._source_rows.insert(row, row_item_)
-        self.layoutChanged.emit()
+            item = self._new_item(row)
+            self._source_keys[row] = item.key
+            self._insert_item(item)
+            self._adopt_orphans(item)
 
-    def _rowsRemoved(self, parent, start, end):
+    def _rowsAboutToBeRemoved(self, parent, start, end):
+        # source rows are still present, so proxy rows are removed while mapping is valid
         for row in range(start, end+1):
-            row_item_ = self._source_rows[start]
-            group_index = row_item_.groupIndex
-            group_item_ = self._parent_id_tuples[self._getGroupRow(group_index)]
-            children_row = group_item_.children.index(row_item_)
-            group_item_.children.pop(children_row)
-            self._source_rows.pop(start)
-            if not len(group_item_.children):
-                # remove the group
-                group_row = self._getGroupRow(group_index)
-                group_name = self._parent_id_tuples[group_row].name
-                self._parent_id_tuples.pop(group_row)
-                self._parent_id_internal_indices_list.pop(group_row)
-                del self._parent_id_internal_indices_dict[group_name]
-        self.layoutChanged.emit()
+            self._remove_item(self._items[self._source_keys[row]])
+
+    def _rowsRemoved(self, parent, start, end):
+        del self._source_keys[start:end+1]
+        self._shift_source_rows(start, start - end - 1)
 
     def _dataChanged(self, topLeft, bottomRight):
-        top_row = topLeft.row()
-        bottom_row = bottomRight.row()
-        source_model = self.sourceModel()
+        left = topLeft.column()
+        right = bottomRight.column()
+        is_tree_changed = any(
+            left <= column <= right for column in (self._column_id, self._column_parent_id, self._column_order_id))
         # loop through all the changed data
-        for row in range(top_row,bottom_row+1):
-            old_group_index = self._source_rows[row].groupIndex
-            old_group_item = self._parent_id_tuples[self._getGroupRow(old_group_index)]
-            new_group_name = source_model.data(self.createIndex(row, self._column_parent_id, 0), Qt.DisplayRole)
-            if new_group_name != old_group_item.name:
-                # move to new group...
-                new_group_index = self._get_parent_id_index(new_group_name)
-                new_group_item = self._parent_id_tuples[self._getGroupRow(new_group_index)]
-
-                row_item_ = self._source_rows[row]
-                new_group_item.children.append(row_item_)
-
-                # delete from old group
-                old_group_item.children.remove(row_item_)
-                if not len(old_group_item.children):
-                    # remove the group
-                    group_row = self._getGroupRow(old_group_item.index)
-                    group_name = old_group_item.name
-                    self._parent_id_tuples.pop(group_row)
-                    self._parent_id_internal_indices_list.pop(group_row)
-                    del self._parent_id_internal_indices_dict[group_name]
-
-        self.layoutChanged.emit()
+        for row in range(topLeft.row(), bottomRight.row()+1):
+            item = self._items[self._source_keys[row]]
+            if is_tree_changed:
+                self._update_item(item)
+            self.dataChanged.emit(
+                self.createIndex(item.row, left, item.key), self.createIndex(item.row, right, item.key))
+
+    def _update_item(self, item: OperationItem) -> None:
+        """Re-reads tree columns of the item and moves the item if its parent or order changed."""
+        operation_id, order_id = item.operation_id, item.order_id
+        self._forget_orphan(item)
+        self._read_item(item)
+        if item.operation_id != operation_id:
+            if self._keys_by_operation_id.get(operation_id) == item.key:
+                del self._keys_by_operation_id[operation_id]
+            if item.operation_id is not None:
+                self._keys_by_operation_id[item.operation_id] = item.key
+        parent_key = self._find_parent_key(item)
+        is_parent_changed = parent_key != item.parent_key
+        if is_parent_changed or item.order_id != order_id:
+            self._move_item(item, parent_key)
+        if item.operation_id != operation_id:
+            self._adopt_orphans(item)
+        if is_parent_changed:
+            self._adopt_cycle_orphans()
@@ -0,0 +1,204 @@
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, Signal
+from PySide6.QtSql import QSqlDatabase, QSqlDriver, QSqlQuery
+
+from ProcessEditor.process_model import ProcessModel
+from ProcessEditor.queries import SELECT_OPERATION_IDS, SELECT_OPERATIONS_COUNT, execute
+
+
+# column of 'operations' maintained by the database on every insert and update, if 'sync_column' is not set
+SYNC_COLUMN = 'updated_at'
+
+# milliseconds between polls, if 'sync_interval' is not set
+SYNC_INTERVAL = 5000
+
+# map of (connection name, channel) to the number of started syncs listening to the channel of the connection
+_listeners = {}
+
+
+class SyncSignals(QObject):
+    polled = Signal(object, object, object)  # changed rows, removed ids, new watermark
+    failed = Signal(str)
+
+
+class SyncTask(QRunnable):
+    """
+    Reads operations of the process version changed since the watermark in a thread of the pool.
+    Removed operations are looked for only if the number of operations in the database
+    differs from the number expected from local ids and the changed rows. In lazy mode only branches
+    fetched completely are compared, operations of other branches are not known to be loaded.
+    """
+
+    def __init__(
+            self, settings: dict, column: str, watermark, local_ids: frozenset, signals: SyncSignals,
+            branches: dict = None):
+        super().__init__()
+        self.settings = settings
+        self.column = column
+        self.watermark = watermark
+        self.local_ids = local_ids
+        self.branches = branches  # map of parent ids to loaded child ids of fetched branches, None if all are loaded
+        self.signals = signals
+        self._id_position = 0
+        self._parent_id_position = 1
+
+    def run(self) -> None:
+        try:
+            connection = self.settings['connection_manager'].connection()
+            rows, watermark = self._changed_rows(connection)
+            removed_ids = self._removed_ids(connection, rows)
+        except (ConnectionError, RuntimeError) as error:
+            self.signals.failed.emit(str(error))
+        else:
+            self.signals.polled.emit(rows, removed_ids, watermark)
+
+    def _changed_rows(self, connection: QSqlDatabase) -> tuple[list[list], object]:
+        # rows having the watermark value are read again, they may be committed after the previous poll
+        condition = "" if self.watermark is None else f"AND {self.column} >= :watermark"
+        query = self._exec(
+            connection,
+            f"SELECT * FROM operations WHERE process_version_id = :process_version_id {condition}",
+            {':watermark': self.watermark} if self.watermark is not None else {})
+        column_count = query.record().count()
+        position = query.record().indexOf(self.column)
+        self._id_position = query.record().indexOf('id')
+        self._parent_id_position = query.record().indexOf('parent_id')
+        rows = []
+        watermark = self.watermark
+        while query.next():
+            values = [None if query.isNull(column) else query.value(column) for column in range(column_count)]
+            rows.append(values)
+            if values[position] is not None and (watermark is None or values[position] > watermark):
+                watermark = values[position]
+        query.finish()
+        return rows, watermark
+
+    def _removed_ids(self, connection: QSqlDatabase, rows: list[list]) -> list:
+        if self.branches is None:
+            condition, values, local_ids = "", {}, self.local_ids
+            new_count = sum(1 for row in rows if row[self._id_position] not in local_ids)
+        else:
+            if not self.branches:
+                return []
+            condition, values = self._branches_condition()
+            local_ids = frozenset().union(*self.branches.values())
+            new_count = sum(
+                1 for row in rows
+                if row[self._id_position] not in local_ids and row[self._parent_id_position] in self.branches)
+        query = self._exec(connection, SELECT_OPERATIONS_COUNT + condition, values)
+        query.next()
+        count = query.value(0)
+        query.finish()
+        if count == len(local_ids) + new_count:
+            return []
+        query = self._exec(connection, SELECT_OPERATION_IDS + condition, values)
+        remote_ids = set()
+        while query.next():
+            remote_ids.add(query.value(0))
+        query.finish()
+        # changed rows exist in the database, they may have been moved to a branch out of the condition
+        remote_ids.update(row[self._id_position] for row in rows)
+        return list(local_ids - remote_ids)
+
+    def _branches_condition(self) -> tuple[str, dict]:
+        """Returns condition selecting operations of the fetched branches and its values."""
+        parent_ids = [parent_id for parent_id in self.branches if parent_id is not None]
+        values = {f":parent_id_{position}": parent_id for position, parent_id in enumerate(parent_ids)}
+        conditions = ["parent_id IS NULL"] if None in self.branches else []
+        if parent_ids:
+            conditions.append(f"parent_id IN ({', '.join(values)})")
+        return f" AND ({' OR '.join(conditions)})", values
+
+    def _exec(self, connection: QSqlDatabase, statement: str, values: dict = None) -> QSqlQuery:
+        values = dict(values or {}, **{':process_version_id': self.settings['process_version_id']})
+        return execute(connection, statement, values)  # QueryError is a RuntimeError
+
+
+class ProcessSync(QObject):
+    """
+    Keeps the process model up to date with edits made by other users of the same process version.
+    Every 'sync_interval' ms operations changed since the watermark, the greatest value of 'sync_column' seen,
+    are read in the background and applied to the model as fine-grained inserts, removes and data changes,
+    so expanded branches and the selection stay. The column has to be maintained by the database,
+    e.g. by a trigger setting updated_at = CURRENT_TIMESTAMP. If the driver supports notifications
+    (PostgreSQL LISTEN/NOTIFY), a notification on 'sync_channel' starts a poll at once.
+    """
+    synced = Signal(int, int)  # number of rows read, number of removed rows
+    failed = Signal(str)
+
+    def __init__(self, parent: QObject, process_model: ProcessModel, settings: dict):
+        super().__init__(parent)
+        self.settings = settings
+        self._process_model = process_model
+        self._source_model = process_model.sourceModel()
+        self._column = settings.get('sync_column', SYNC_COLUMN)
+        self._is_polling = False
+        self._subscription = None  # (connection name, channel) listened to by this sync, None if not listening
+
+        column_names = self._source_model.column_names()
+        self.is_available = self._column in column_names
+        self._watermark = None
+        if self.is_available:
+            position = column_names.index(self._column)
+            values = [
+                self._source_model.data(self._source_model.index(row, position))
+                for row in range(self._source_model.rowCount())]
+            values = [value for value in values if value is not None]
+            self._watermark = max(values) if values else None
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(settings.get('sync_interval', SYNC_INTERVAL))
+        self._timer.timeout.connect(self.poll)
+
+        self._signals = SyncSignals(self)
+        self._signals.polled.connect(self._on_polled)
+        self._signals.failed.connect(self._on_failed)
+
+    def start(self) -> None:
+        if not self.is_available:
+            return
+        self._timer.start()
+        channel = self.settings.get('sync_channel')
+        connection = self.settings['connection']
+        driver = connection.driver()
+        if self._subscription is not None or not channel:
+            return
+        if not driver.hasFeature(QSqlDriver.DriverFeature.EventNotifications):
+            return
+        # the channel is subscribed once per connection, syncs of other versions may listen to it already
+        key = (connection.connectionName(), channel)
+        if _listeners.get(key) or driver.subscribeToNotification(channel):
+            _listeners[key] = _listeners.get(key, 0) + 1
+            driver.notification.connect(self.poll)
+            self._subscription = key
+
+    def stop(self) -> None:
+        """Stops polling, the channel is unsubscribed only when no other started sync listens to it."""
+        self._timer.stop()
+        if self._subscription is None:
+            return
+        key, self._subscription = self._subscription, None
+        driver = self.settings['connection'].driver()
+        driver.notification.disconnect(self.poll)
+        _listeners[key] -= 1
+        if not _listeners[key]:
+            del _listeners[key]
+            driver.unsubscribeFromNotification(key[1])
+
+    def poll(self, *_) -> None:
+        """Starts reading of changes in the background, if no poll is running."""
+        if self._is_polling or not self.is_available:
+            return
+        self._is_polling = True
+        QThreadPool.globalInstance().start(SyncTask(
+            self.settings, self._column, self._watermark, frozenset(self._source_model.ids()), self._signals,
+            self._process_model.fetched_branches()))
+
+    def _on_polled(self, rows: list[list], removed_ids: list, watermark) -> None:
+        self._is_polling = False
+        self._watermark = watermark
+        self._process_model.apply_remote_changes(rows, removed_ids)
+        self.synced.emit(len(rows), len(removed_ids))
+
+    def _on_failed(self, message: str) -> None:
+        self._is_polling = False
+        self.failed.emit(message)
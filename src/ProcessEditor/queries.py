@@ -0,0 +1,121 @@
+import threading
+from collections import OrderedDict
+
+from PySide6.QtSql import QSqlDatabase, QSqlQuery
+
+
+# number of prepared queries kept per connection, the least recently used ones are dropped first
+MAX_PREPARED_QUERIES = 64
+
+LIBRARY_COLUMNS = (
+    'text_id', 'type_id', 'parent_type_id', 'order_id', 'allow_copies', 'library_name', 'process_name',
+    'labels', 'labels_regex', 'db_column_names', 'is_obsolete',
+)
+
+SELECT_LIBRARY = f"SELECT {', '.join(LIBRARY_COLUMNS)} FROM operations_library"
+
+# change tokens of operations_library by driver, they change with any edit of any column of any row.
+# PostgreSQL sums hashes of the rows on the server, only the sums are sent. SQLite has no hash function, its token
+# is the counter of operations_library_version increased by the triggers of LIBRARY_VERSION_SCRIPT.
+# Libraries without token, e.g. SQLite files without the triggers, have no snapshot.
+SELECT_LIBRARY_TOKEN = {
+    'QPSQL': """
+        SELECT COUNT(*), SUM(('x' || LEFT(md5(o::text), 15))::bit(60)::bigint)
+        FROM operations_library AS o
+        """,
+    'QSQLITE': "SELECT version FROM operations_library_version",
+}
+
+# SQLite: counter of changes of operations_library, it starts from a random value,
+# so a database created again at the same path does not match snapshots of the old one
+LIBRARY_VERSION_SCRIPT = """
+    CREATE TABLE IF NOT EXISTS operations_library_version (version INTEGER NOT NULL);
+    INSERT INTO operations_library_version (version)
+        SELECT abs(random()) WHERE NOT EXISTS (SELECT 1 FROM operations_library_version);
+    CREATE TRIGGER IF NOT EXISTS operations_library_inserted AFTER INSERT ON operations_library
+        BEGIN UPDATE operations_library_version SET version = version + 1; END;
+    CREATE TRIGGER IF NOT EXISTS operations_library_updated AFTER UPDATE ON operations_library
+        BEGIN UPDATE operations_library_version SET version = version + 1; END;
+    CREATE TRIGGER IF NOT EXISTS operations_library_deleted AFTER DELETE ON operations_library
+        BEGIN UPDATE operations_library_version SET version = version + 1; END;
+    """
+
+SELECT_OPERATIONS = """
+    SELECT * FROM operations WHERE process_version_id = :process_version_id ORDER BY order_id, id
+    """
+
+# one batch of operations of a branch, the last column tells if an operation has children
+# branches are paged by keys of the last fetched child, so rows inserted or removed before it do not shift pages
+_SELECT_BRANCH = """
+    SELECT o.*, EXISTS (SELECT 1 FROM operations AS c WHERE c.parent_id = o.id)
+    FROM operations AS o
+    WHERE o.process_version_id = :process_version_id AND {condition}
+    ORDER BY o.order_id, o.id
+    LIMIT :limit
+    """
+_AFTER_FETCHED = " AND (o.order_id, o.id) > (:after_order_id, :after_id)"
+SELECT_TOP_LEVEL_OPERATIONS = _SELECT_BRANCH.format(condition="o.parent_id IS NULL")
+SELECT_NEXT_TOP_LEVEL_OPERATIONS = _SELECT_BRANCH.format(condition="o.parent_id IS NULL" + _AFTER_FETCHED)
+SELECT_CHILD_OPERATIONS = _SELECT_BRANCH.format(condition="o.parent_id = :parent_id")
+SELECT_NEXT_CHILD_OPERATIONS = _SELECT_BRANCH.format(condition="o.parent_id = :parent_id" + _AFTER_FETCHED)
+
+SELECT_OPERATIONS_COUNT = "SELECT COUNT(*) FROM operations WHERE process_version_id = :process_version_id"
+SELECT_OPERATION_IDS = "SELECT id FROM operations WHERE process_version_id = :process_version_id"
+
+_caches = {}  # map of connection names to ordered maps of statements to prepared queries
+_caches_lock = threading.Lock()
+
+
+class QueryError(RuntimeError):
+    """Statement could not be prepared or executed."""
+
+
+def prepared(connection: QSqlDatabase, statement: str, forward_only: bool = True) -> QSqlQuery:
+    """
+    Returns query of the connection prepared with the statement. A statement is prepared once per connection,
+    following calls return the same query with the previous result released, values are bound by the caller.
+    Forward-only queries are used for read-once scans, Qt does not buffer their rows for scrolling back.
+    """
+    with _caches_lock:
+        cache = _caches.setdefault(connection.connectionName(), OrderedDict())
+    key = (statement, forward_only)
+    query = cache.get(key)
+    if query is not None:
+        cache.move_to_end(key)
+        query.finish()
+        return query
+    query = QSqlQuery(connection)
+    query.setForwardOnly(forward_only)
+    if not query.prepare(statement):
+        raise QueryError(query.lastError().text())
+    cache[key] = query
+    if len(cache) > MAX_PREPARED_QUERIES:
+        cache.popitem(last=False)
+    return query
+
+
+def execute(connection: QSqlDatabase, statement: str, values=None, forward_only: bool = True) -> QSqlQuery:
+    """
+    Executes the prepared statement with values bound by names (dict of ':name' to value) or by positions (list).
+    Returns the active query, the caller reads it and calls finish(). Raises QueryError.
+    """
+    query = prepared(connection, statement, forward_only)
+    if isinstance(values, dict):
+        for name, value in values.items():
+            query.bindValue(name, value)
+    elif values:
+        for position, value in enumerate(values):
+            query.bindValue(position, value)
+    if not query.exec():
+        raise QueryError(query.lastError().text())
+    return query
+
+
+def release_connection(connection_name: str) -> None:
+    """Drops prepared queries of the connection, call it before the connection is removed."""
+    with _caches_lock:
+        cache = _caches.pop(connection_name, None)
+    if cache is not None:
+        for query in cache.values():
+            query.finish()
+        cache.clear()
@@ -0,0 +1,47 @@
+import re
+from functools import lru_cache
+
+from PySide6.QtGui import QValidator
+
+
+class RegexValidator(QValidator):
+    """Validator of parameter QLineEdit, checks every keystroke against precompiled labels_regex pattern.
+    Text not matching the pattern is Intermediate, so it can still be typed but is not accepted."""
+
+    def __init__(self, pattern: re.Pattern):
+        super().__init__()
+        self.pattern = pattern
+
+    def validate(self, text: str, pos: int):
+        if self.pattern.fullmatch(text):
+            return QValidator.Acceptable, text, pos
+        return QValidator.Intermediate, text, pos
+
+    def is_valid(self, value) -> bool:
+        return is_valid(self.pattern, value)
+
+
+def is_valid(pattern: [re.Pattern, None], value) -> bool:
+    """Checks the value of a parameter against its compiled pattern, values of parameters without one are valid."""
+    return pattern is None or pattern.fullmatch('' if value is None else str(value)) is not None
+
+
+@lru_cache(maxsize=None)
+def compile_pattern(pattern: str) -> [re.Pattern, None]:
+    """Returns labels_regex compiled once and shared by all library entries having it.
+    Returns None for empty or malformed patterns, so such parameters are not validated.
+    Patterns are plain Python objects, so they can be compiled in the thread reading the library."""
+    if not pattern:
+        return None
+    try:
+        return re.compile(pattern)
+    except re.error:
+        return None
+
+
+@lru_cache(maxsize=None)
+def validator_for(pattern: [re.Pattern, None]) -> [RegexValidator, None]:
+    """Returns validator of the compiled pattern, shared by all library entries having the pattern.
+    Validators are QObjects living in the thread they are created in, so they are created only in the GUI thread,
+    where they are set to line edits."""
+    return None if pattern is None else RegexValidator(pattern)
@@ -0,0 +1,191 @@
+from collections import OrderedDict
+
+from PySide6.QtCore import QObject, QTimer, Signal
+from PySide6.QtSql import QSqlRecord
+
+from ProcessEditor.autosave import AutosaveScheduler
+from ProcessEditor.operations_writer import SaveError
+from ProcessEditor.process_model import ProcessModel
+from ProcessEditor.process_sync import ProcessSync
+
+
+# number of process versions kept open, if 'workspace_size' is not set
+WORKSPACE_SIZE = 8
+
+
+class ProcessVersion:
+    """Open process version: its model with autosave and sync of the model."""
+    __slots__ = ('process_version_id', 'settings', 'model', 'autosave', 'sync')
+
+    def __init__(self, process_version_id: int, settings: dict, model: ProcessModel):
+        self.process_version_id = process_version_id
+        self.settings = settings
+        self.model = model
+        self.autosave: [AutosaveScheduler, None] = None
+        self.sync: [ProcessSync, None] = None
+
+
+class ProcessWorkspace(QObject):
+    """
+    Process versions opened in the session. Models of recently used versions are kept, so switching back
+    to them does not query the database. When there are more than settings['workspace_size'] versions,
+    or their models together take more than settings['workspace_memory'] bytes (estimated), the least
+    recently used versions are closed: pending edits are written, then operations and the tree index are released.
+    The active version is never closed, neither is a version whose edits could not be written.
+    Eviction does not wait for autosave: a version with edits being written is closed after its autosave
+    reports them saved, so no events are processed while versions are switched.
+    """
+    evicted = Signal(int)  # process_version_id
+
+    def __init__(self, parent: QObject, settings: dict):
+        super().__init__(parent)
+        self.settings = settings
+        self.max_count = max(1, settings.get('workspace_size', WORKSPACE_SIZE))
+        self.max_memory = settings.get('workspace_memory')  # None for no memory budget
+        self.active_id = None
+        self._versions = OrderedDict()  # map of process_version_ids to open versions, least recently used first
+        self._pending_evictions = set()  # process_version_ids to close when their autosave has written the edits
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, process_version_id: int) -> bool:
+        return process_version_id in self._versions
+
+    def __len__(self) -> int:
+        return len(self._versions)
+
+    def get(self, process_version_id: int) -> [ProcessVersion, None]:
+        """Returns the open version and marks it as recently used, None if the version has to be loaded."""
+        version = self._versions.get(process_version_id)
+        if version is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._pending_evictions.discard(process_version_id)
+        self._versions.move_to_end(process_version_id)
+        return version
+
+    def version_settings(self, process_version_id: int) -> dict:
+        """Returns copy of the settings for models of the process version."""
+        return dict(self.settings, process_version_id=process_version_id)
+
+    def open(self, process_version_id: int, operations: tuple[QSqlRecord, list[list]] = None) -> ProcessVersion:
+        """Builds the model of the process version from operations selected in advance, or selects them."""
+        settings = self.version_settings(process_version_id)
+        version = ProcessVersion(process_version_id, settings, ProcessModel(self, settings, operations))
+        if settings.get('autosave'):
+            version.autosave = AutosaveScheduler(self, version.model, settings)
+            version.autosave.saved.connect(self._on_autosaved)
+        if settings.get('sync'):
+            version.sync = ProcessSync(self, version.model, settings)
+        self._versions[process_version_id] = version
+        return version
+
+    def activate(self, process_version_id: int) -> None:
+        """
+        Makes the version active once its model is shown: sync of other versions is stopped, sync of the version
+        is started, versions over the budgets are closed.
+        """
+        for version in self._versions.values():
+            if version.sync is not None and version.process_version_id != process_version_id:
+                version.sync.stop()
+        self.active_id = process_version_id
+        self.settings['process_version_id'] = process_version_id
+        self._pending_evictions.discard(process_version_id)
+        version = self._versions[process_version_id]
+        self._versions.move_to_end(process_version_id)
+        if version.sync is not None:
+            version.sync.start()
+            version.sync.poll()  # changes made while the version was not active
+        self._evict()
+
+    def close(self, process_version_id: int) -> bool:
+        """
+        Writes pending edits and releases the version. Returns False, if the edits could not be written.
+        Edits of a version without autosave are written at once, with autosave it waits for the end of writing.
+        """
+        version = self._versions.get(process_version_id)
+        if version is None:
+            return True
+        if version.sync is not None:
+            version.sync.stop()
+        if version.autosave is not None:
+            if not version.autosave.finish():
+                return False
+        elif version.model.sourceModel().has_changes():
+            try:
+                version.model.save()
+            except SaveError:
+                return False
+        self._pending_evictions.discard(process_version_id)
+        del self._versions[process_version_id]
+        version.model.release()
+        for child in (version.autosave, version.sync, version.model.sourceModel(), version.model):
+            if child is not None:
+                child.deleteLater()
+        if process_version_id == self.active_id:
+            self.active_id = None
+        return True
+
+    def close_all(self) -> bool:
+        """Closes all versions, e.g. when the window is closed. Returns False if edits of some were not written."""
+        return all([self.close(process_version_id) for process_version_id in list(self._versions)])
+
+    def memory_size(self) -> int:
+        """Returns estimated number of bytes held by models of open versions."""
+        return sum(version.model.estimated_size() for version in self._versions.values())
+
+    def metrics(self) -> dict:
+        return {
+            'open_versions': len(self._versions),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'memory_size': self.memory_size(),
+        }
+
+    def _is_over_budget(self) -> bool:
+        """Checks the budgets against versions that are not waiting to be closed."""
+        versions = [
+            version for process_version_id, version in self._versions.items()
+            if process_version_id not in self._pending_evictions
+        ]
+        if len(versions) > self.max_count:
+            return True
+        if self.max_memory is None:
+            return False
+        return sum(version.model.estimated_size() for version in versions) > self.max_memory
+
+    def _evict(self) -> None:
+        for process_version_id in list(self._versions):
+            if not self._is_over_budget():
+                return
+            if process_version_id == self.active_id or process_version_id in self._pending_evictions:
+                continue
+            version = self._versions[process_version_id]
+            if version.autosave is not None and not version.autosave.is_idle():
+                # closed by _evict_pending() when the edits are written
+                self._pending_evictions.add(process_version_id)
+                version.autosave.flush()
+                continue
+            self._close_evicted(process_version_id)
+
+    def _on_autosaved(self, *_) -> None:
+        if self._pending_evictions:
+            # not from the signal handler of the autosave, which may still use the version
+            QTimer.singleShot(0, self._evict_pending)
+
+    def _evict_pending(self) -> None:
+        for process_version_id in list(self._pending_evictions):
+            version = self._versions.get(process_version_id)
+            if version is None:
+                self._pending_evictions.discard(process_version_id)
+            elif version.autosave is None or version.autosave.is_idle():
+                self._close_evicted(process_version_id)
+
+    def _close_evicted(self, process_version_id: int) -> None:
+        if self.close(process_version_id):
+            self.evictions += 1
+            self.evicted.emit(process_version_id)
@@ -0,0 +1,51 @@
+"""Fixtures of tests run on SQLite databases made by ProcessEditor.generator. Run from the repository root:
+    python -m pytest tests
+"""
+import gc
+import os
+import sys
+
+import pytest
+
+SOURCE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, SOURCE_DIR)
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+
+@pytest.fixture(scope='session')
+def application():
+    from PySide6.QtWidgets import QApplication
+
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture(autouse=True)
+def collect_garbage():
+    """Collects Qt objects left in reference cycles by the test in the GUI thread. A collection started later
+    in a thread of the pool would delete them in that thread."""
+    yield
+    from PySide6.QtCore import QThreadPool
+
+    QThreadPool.globalInstance().waitForDone()
+    gc.collect()
+
+
+@pytest.fixture
+def database_path(tmp_path) -> str:
+    """Path of a small generated database: one process version of 200 operations."""
+    from ProcessEditor.generator import create_database
+
+    return create_database(
+        str(tmp_path / 'process_editor.sqlite'), library_size=50, operations=200, process_depth=3, process_fan_out=4)
+
+
+@pytest.fixture
+def thread_pool():
+    """Global QThreadPool, its size is restored after the test."""
+    from PySide6.QtCore import QThreadPool
+
+    pool = QThreadPool.globalInstance()
+    max_thread_count = pool.maxThreadCount()
+    yield pool
+    pool.waitForDone()
+    pool.setMaxThreadCount(max_thread_count)
@@ -0,0 +1,111 @@
+import sqlite3
+import time
+
+import pytest
+
+from ProcessEditor.autosave import AutosaveScheduler
+from ProcessEditor.connections import ConnectionManager
+from ProcessEditor.process_model import ProcessModel
+
+
+@pytest.fixture
+def settings(application, database_path, thread_pool):
+    manager = ConnectionManager({'driver': 'QSQLITE', 'database': database_path, 'health_check': False})
+    values = {
+        'connection': manager.connection(),
+        'connection_manager': manager,
+        'process_version_id': 1,
+        'autosave_delay': 50,
+        'autosave_max_delay': 10000,
+    }
+    yield values
+    thread_pool.waitForDone()
+    del values['connection']
+    manager.close_all()
+
+
+@pytest.fixture
+def stored(database_path):
+    """Connection reading what was written."""
+    connection = sqlite3.connect(database_path, isolation_level=None)
+    yield connection
+    connection.close()
+
+
+def wait_until(application, condition, timeout: float = 10) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        application.processEvents()
+    assert condition()
+
+
+def edit(model: ProcessModel, row: int, name: str, value) -> int:
+    """Sets value of the column in the row of the source model. Returns id of the row."""
+    source_model = model.sourceModel()
+    source_model.setData(source_model.index(row, source_model.column(name)), value)
+    return source_model.index(row, source_model.column('id')).data()
+
+
+def parameter_of(stored: sqlite3.Connection, operation_id: int):
+    return stored.execute("SELECT parameter_0 FROM operations WHERE id = ?", (operation_id,)).fetchone()[0]
+
+
+def test_edits_are_written_once_after_delay(application, settings, stored):
+    model = ProcessModel(None, settings)
+    autosave = AutosaveScheduler(None, model, settings)
+    first_id = edit(model, 0, 'parameter_0', 'a')
+    edit(model, 0, 'parameter_0', 'b')
+    second_id = edit(model, 1, 'parameter_0', 'c')
+    assert autosave.flush_count == 0 and autosave.queue_depth() == 2
+
+    wait_until(application, autosave.is_idle)
+    assert autosave.flush_count == 1 and autosave.saved_rows == 2
+    assert parameter_of(stored, first_id) == 'b'
+    assert parameter_of(stored, second_id) == 'c'
+
+
+def test_edits_are_written_after_max_delay(application, settings, stored):
+    settings.update(autosave_delay=60000, autosave_max_delay=100)
+    model = ProcessModel(None, settings)
+    autosave = AutosaveScheduler(None, model, settings)
+    operation_id = edit(model, 0, 'parameter_0', 'a')
+    wait_until(application, autosave.is_idle)
+    assert autosave.flush_count == 1
+    assert parameter_of(stored, operation_id) == 'a'
+
+
+def test_edits_made_while_writing_are_written_by_finish(application, settings, stored):
+    settings['autosave_delay'] = 60000
+    model = ProcessModel(None, settings)
+    autosave = AutosaveScheduler(None, model, settings)
+    first_id = edit(model, 0, 'parameter_0', 'a')
+    autosave.flush()
+    second_id = edit(model, 1, 'parameter_0', 'b')
+    autosave.flush()  # runs after the first flush
+    assert not autosave.is_idle()
+
+    assert autosave.finish()
+    assert autosave.is_idle()
+    assert autosave.flush_count == 2
+    assert parameter_of(stored, first_id) == 'a'
+    assert parameter_of(stored, second_id) == 'b'
+
+
+def test_failed_write_is_kept_until_written(application, settings, stored):
+    settings['autosave_delay'] = 60000
+    model = ProcessModel(None, settings)
+    autosave = AutosaveScheduler(None, model, settings)
+    messages = []
+    autosave.failed.connect(messages.append)
+    operation_id = edit(model, 0, 'parameter_0', 'a')
+    edit(model, 0, 'type_id', None)  # violates NOT NULL
+
+    assert not autosave.finish()
+    assert len(messages) == 1 and autosave.failure_count == 1
+    assert not autosave.is_idle() and autosave.queue_depth() == 1
+    assert parameter_of(stored, operation_id) != 'a'
+
+    edit(model, 0, 'type_id', 7)
+    assert autosave.finish()
+    assert autosave.is_idle() and autosave.flush_count == 1
+    assert parameter_of(stored, operation_id) == 'a'
@@ -0,0 +1,141 @@
+import threading
+
+import pytest
+from PySide6.QtCore import QRunnable, QThread
+
+from ProcessEditor.connections import ConnectionManager
+from ProcessEditor.queries import execute
+
+
+def manager_of(database_path: str, **config) -> ConnectionManager:
+    return ConnectionManager(dict({'driver': 'QSQLITE', 'database': database_path}, **config))
+
+
+class CheckoutTask(QRunnable):
+    """Checks out the connection of the pool thread and reads operations with it."""
+
+    def __init__(self, manager: ConnectionManager, results: list):
+        super().__init__()
+        self.manager = manager
+        self.results = results
+
+    def run(self) -> None:
+        try:
+            query = execute(self.manager.connection(), "SELECT COUNT(*) FROM operations")
+            query.next()
+            self.results.append(query.value(0))
+            query.finish()
+        except ConnectionError as error:
+            self.results.append(error)
+
+
+class CheckoutThread(QThread):
+    def __init__(self, manager: ConnectionManager):
+        super().__init__()
+        self.manager = manager
+        self.name = None
+
+    def run(self) -> None:
+        self.name = self.manager.connection().connectionName()
+
+
+def test_connection_is_reused_by_thread(application, database_path):
+    manager = manager_of(database_path)
+    connection = manager.connection()
+    assert connection.isOpen()
+    assert manager.connection().connectionName() == connection.connectionName()
+    assert manager.open_count == 1
+    del connection
+    manager.close_all()
+    assert manager.open_count == 0
+
+
+def test_threads_get_own_connections(application, database_path):
+    manager = manager_of(database_path)
+    names = []
+    opened, checked = threading.Event(), threading.Event()
+
+    def checkout():
+        names.append(manager.connection().connectionName())
+        opened.set()
+        checked.wait()  # connection of the thread is removed when the thread ends
+
+    thread = threading.Thread(target=checkout)
+    thread.start()
+    opened.wait()
+    assert names[0] != manager.connection().connectionName()
+    assert manager.open_count == 2
+    checked.set()
+    thread.join()
+    manager.close_all()
+
+
+def test_pool_size_is_derived_from_thread_pool(application, database_path, thread_pool):
+    manager = manager_of(database_path, pool_size=0)
+    assert manager.config['pool_size'] == thread_pool.maxThreadCount() + 1
+
+
+def test_thread_pool_is_limited_by_pool_size(application, database_path, thread_pool):
+    thread_pool.setMaxThreadCount(8)
+    manager = manager_of(database_path, pool_size=3, checkout_timeout=1.0)
+    assert thread_pool.maxThreadCount() == 2
+
+    manager.connection()  # slot of the GUI thread
+    results = []
+    for _ in range(10):
+        thread_pool.start(CheckoutTask(manager, results))
+    thread_pool.waitForDone()
+    assert results == [200] * 10
+    assert manager.open_count <= 3
+    thread_pool.clear()
+    manager.close_all()
+
+
+def test_checkout_fails_without_free_slot(application, database_path, thread_pool):
+    manager = manager_of(database_path, pool_size=1, checkout_timeout=0.1)
+    manager.connection()
+    errors = []
+
+    def checkout():
+        try:
+            manager.connection()
+        except ConnectionError as error:
+            errors.append(error)
+
+    thread = threading.Thread(target=checkout)
+    thread.start()
+    thread.join()
+    assert len(errors) == 1
+
+    manager.release()
+    assert manager.open_count == 0
+    thread = threading.Thread(target=checkout)
+    thread.start()
+    thread.join()
+    assert len(errors) == 1
+    manager.close_all()
+
+
+def test_connection_of_finished_thread_is_removed(application, database_path):
+    manager = manager_of(database_path)
+    thread = CheckoutThread(manager)
+    thread.start()
+    thread.wait()
+    assert thread.name is not None
+    assert manager.open_count == 0
+
+
+def test_closed_connection_is_reopened(application, database_path):
+    manager = manager_of(database_path)
+    connection = manager.connection()
+    connection.close()
+    assert manager.connection().isOpen()
+    del connection
+    manager.close_all()
+
+
+def test_unreachable_database_raises(application, tmp_path):
+    manager = manager_of(str(tmp_path / 'missing' / 'process_editor.sqlite'), reconnect_attempts=1)
+    with pytest.raises(ConnectionError):
+        manager.connection()
+    assert manager.open_count == 0
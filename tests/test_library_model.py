@@ -0,0 +1,94 @@
+import sqlite3
+
+from ProcessEditor.connections import ConnectionManager
+from PySide6.QtCore import QModelIndex
+
+from ProcessEditor.library_model import LibraryModel, parse_languages, read_library, select_language
+from ProcessEditor.process_model import ProcessModel
+from ProcessEditor.validators import is_valid
+
+
+def library_settings(database_path: str, **settings) -> dict:
+    manager = ConnectionManager({'driver': 'QSQLITE', 'database': database_path, 'health_check': False})
+    return dict({'connection': manager.connection(), 'language_code': 'EN'}, **settings)
+
+
+def rows_of(library: tuple) -> dict:
+    records, _ = library
+    return {type_id: record.row() for type_id, record in records.items()}
+
+
+def test_snapshot_is_read_while_library_is_unchanged(application, database_path, tmp_path, monkeypatch):
+    import ProcessEditor.library_model
+
+    settings = library_settings(database_path, library_cache=True, cache_dir=str(tmp_path))
+    selected = rows_of(read_library(dict(settings, library_cache=False)))
+    assert rows_of(read_library(settings)) == selected  # cold, the snapshot is written
+
+    monkeypatch.setattr(ProcessEditor.library_model, 'iter_library_rows', lambda connection: iter(()))
+    assert rows_of(read_library(settings)) == selected  # warm, the table is not selected
+
+
+def test_snapshot_is_replaced_after_edit_of_same_length(application, database_path, tmp_path):
+    settings = library_settings(database_path, library_cache=True, cache_dir=str(tmp_path))
+    read_library(settings)
+    connection = sqlite3.connect(database_path)
+    connection.execute("UPDATE operations_library SET text_id = 'x' || substr(text_id, 2) WHERE type_id = 2")
+    connection.commit()
+    connection.close()
+
+    records, _ = read_library(settings)
+    assert records[2].text_id.startswith('x')
+
+
+def test_languages_are_parsed_by_code():
+    assert parse_languages('LANGUAGE|EN|Drill|Depth|LANGUAGE|RU|Сверлить|Глубина') == {
+        'EN': ('Drill', 'Depth'), 'RU': ('Сверлить', 'Глубина')}
+    assert parse_languages('any|LANGUAGE|EN|Drill') == {'': ('any',), 'EN': ('Drill',)}
+    assert parse_languages('Drill|Depth') == {'': ('Drill', 'Depth')}
+    assert parse_languages('') == {} and parse_languages(None) == {}
+    assert select_language('any|LANGUAGE|EN|Drill', 'RU') == ('any',)
+    assert select_language('LANGUAGE|EN|Drill', 'RU') == ()
+
+
+def test_language_is_switched_without_query(application, database_path, monkeypatch):
+    import ProcessEditor.library_model
+
+    model = LibraryModel(None, library_settings(database_path))
+    assert model.language_codes() == ['EN', 'RU']
+    index = model.index(0, 0, QModelIndex())
+    assert model.data(index).startswith('EN ')
+
+    changed = []
+    model.dataChanged.connect(lambda top_left, bottom_right: changed.append(top_left.parent()))
+    monkeypatch.setattr(ProcessEditor.library_model, 'iter_library_rows', lambda connection: iter(()))
+    model.set_language_code('RU')
+    assert model.settings['language_code'] == 'RU'
+    assert model.data(index).startswith('RU ')
+    assert all(label.startswith('RU ') for label in model.records[index.internalId()].labels)
+    assert QModelIndex() in changed and index in changed
+
+
+def test_parameters_are_validated_by_labels_regex(application, database_path):
+    settings = dict(library_settings(database_path), process_version_id=1)
+    model = LibraryModel(None, settings)
+    record = next(record for record in model.records.values() if record.patterns and record.patterns[0] is not None)
+    # generated patterns take digits, bits, decimals or letters
+    values = [next(value for value in ('1', 'a') if is_valid(pattern, value)) for pattern in record.patterns]
+    assert model.validate_parameters(record.type_id, values) == []
+    values[0] = '-'
+    assert model.validate_parameters(record.type_id, values) == [0]
+    assert model.validate_parameters(-1, values) == []
+
+    process_model = ProcessModel(None, settings)
+    source_model = process_model.sourceModel()
+    invalid_ids = set(model.validate_process(process_model))
+    row = next(
+        row for row in range(source_model.rowCount())
+        if source_model.index(row, source_model.column('type_id')).data() == record.type_id)
+    operation_id = source_model.index(row, source_model.column('id')).data()
+    name = record.db_column_names[0]
+    source_model.setData(source_model.index(row, source_model.column(name)), '-')
+    invalid_parameters = model.validate_process(process_model)
+    assert name in invalid_parameters[operation_id]
+    assert set(invalid_parameters) == invalid_ids | {operation_id}
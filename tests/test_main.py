@@ -0,0 +1,52 @@
+from ProcessEditor.connections import ConnectionManager
+from ProcessEditor.main import DEFAULT_SETTINGS, Main
+
+
+def test_synchronous_start(application, database_path, tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    manager = ConnectionManager({'driver': 'QSQLITE', 'database': database_path, 'health_check': False})
+    window = Main(manager, {'fast_start': False, 'background_loading': False, 'sync': False})
+    assert window.process_version is not None
+    assert window.mapper_index().isValid()
+    assert window.settings['connection_manager'] is manager
+    assert DEFAULT_SETTINGS['fast_start'] and 'connection' not in DEFAULT_SETTINGS
+    window.close()
+    del window
+    manager.close_all()
+
+
+def test_language_of_library_is_switched(application, database_path, tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    manager = ConnectionManager({'driver': 'QSQLITE', 'database': database_path, 'health_check': False})
+    window = Main(manager, {'fast_start': False, 'background_loading': False, 'sync': False})
+    shown_labels = window.ui.parameter_label_texts[:window.ui.shown_parameters_count]
+    assert shown_labels and all(label.startswith('EN ') for label in shown_labels)
+
+    window.set_language_code('RU')
+    assert window.settings['language_code'] == 'RU'
+    shown_labels = window.ui.parameter_label_texts[:window.ui.shown_parameters_count]
+    assert shown_labels and all(label.startswith('RU ') for label in shown_labels)
+    window.close()
+    del window
+    manager.close_all()
+
+
+def test_invalid_parameters_are_shown_on_save(application, database_path, tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    manager = ConnectionManager({'driver': 'QSQLITE', 'database': database_path, 'health_check': False})
+    window = Main(manager, {'fast_start': False, 'background_loading': False, 'sync': False, 'autosave': False})
+    source_model = window.process_version.model.sourceModel()
+    records = window.ui.library_view.model().records
+    row = next(
+        row for row in range(source_model.rowCount())
+        if records[source_model.index(row, source_model.column('type_id')).data()].patterns[0] is not None)
+    name = records[source_model.index(row, source_model.column('type_id')).data()].db_column_names[0]
+    source_model.setData(source_model.index(row, source_model.column(name)), '-')
+    operation_id = source_model.index(row, source_model.column('id')).data()
+
+    window.save_process()
+    assert operation_id in window.show_invalid_parameters()
+    assert window.statusBar().currentMessage().startswith('Operations with invalid parameters')
+    window.close()
+    del window
+    manager.close_all()
@@ -0,0 +1,115 @@
+import sqlite3
+
+import pytest
+
+import ProcessEditor.operations_writer
+from ProcessEditor.connections import ConnectionManager
+from ProcessEditor.operations_model import OperationsChanges
+from ProcessEditor.operations_writer import SaveError, save_operations
+from ProcessEditor.process_model import ProcessModel
+
+
+@pytest.fixture
+def settings(application, database_path):
+    manager = ConnectionManager({'driver': 'QSQLITE', 'database': database_path, 'health_check': False})
+    values = {'connection': manager.connection(), 'connection_manager': manager, 'process_version_id': 1}
+    yield values
+    del values['connection']
+    manager.close_all()
+
+
+@pytest.fixture
+def stored(database_path):
+    """Connection reading what was written."""
+    connection = sqlite3.connect(database_path, isolation_level=None)
+    yield connection
+    connection.close()
+
+
+@pytest.fixture
+def statements(monkeypatch) -> list[str]:
+    """Statements executed by the writer."""
+    executed = []
+    execute = ProcessEditor.operations_writer.execute
+    monkeypatch.setattr(
+        ProcessEditor.operations_writer, 'execute',
+        lambda connection, statement, values=None: executed.append(' '.join(statement.split())) or execute(
+            connection, statement, values))
+    return executed
+
+
+COLUMN_NAMES = [
+    'id', 'parent_id', 'type_id', 'parent_type_id', 'order_id', 'process_version_id',
+    *(f"parameter_{position}" for position in range(8))]
+
+
+def row_of(stored: sqlite3.Connection, operation_id: int) -> [list, None]:
+    row = stored.execute("SELECT * FROM operations WHERE id = ?", (operation_id,)).fetchone()
+    return None if row is None else list(row)
+
+
+def changes_of(inserted=(), updated=(), removed_ids=()) -> OperationsChanges:
+    changes = OperationsChanges()
+    changes.inserted = [(None, values) for values in inserted]
+    changes.updated = [(None, values, frozenset(columns), stored_id) for values, columns, stored_id in updated]
+    changes.removed_ids = list(removed_ids)
+    return changes
+
+
+def test_updates_are_grouped_by_changed_columns(settings, stored, statements):
+    first, second, third = row_of(stored, 1), row_of(stored, 2), row_of(stored, 3)
+    first[6], second[6], third[7] = 'a', 'b', 'c'
+    parameter_0, parameter_1 = COLUMN_NAMES.index('parameter_0'), COLUMN_NAMES.index('parameter_1')
+    stored.execute("UPDATE operations SET parameter_1 = 'remote' WHERE id = 1")
+    changes = changes_of(updated=[(first, {parameter_0}, 1), (second, {parameter_0}, 2), (third, {parameter_1}, 3)])
+
+    assert save_operations(settings['connection'], COLUMN_NAMES, changes) == []
+    assert sum(statement.startswith("UPDATE operations") for statement in statements) == 2
+    assert row_of(stored, 1)[6:8] == ['a', 'remote']  # column changed by others is not overwritten
+    assert row_of(stored, 2)[6] == 'b'
+    assert row_of(stored, 3)[7] == 'c'
+
+
+def test_edited_id_is_updated_by_stored_id(settings, stored):
+    values = row_of(stored, 200)
+    values[0] = 1000
+    save_operations(settings['connection'], COLUMN_NAMES, changes_of(updated=[(values, {0}, 200)]))
+    assert row_of(stored, 200) is None
+    assert row_of(stored, 1000) == values
+
+
+def test_removed_rows_are_deleted(settings, stored):
+    save_operations(settings['connection'], COLUMN_NAMES, changes_of(removed_ids=[198, 199]))
+    assert row_of(stored, 198) is None and row_of(stored, 199) is None
+    assert stored.execute("SELECT COUNT(*) FROM operations").fetchone()[0] == 198
+
+
+def test_inserted_ids_are_returned_in_order(settings, stored):
+    with_id = [500, None, 7, None, 10, 1] + [None] * 8
+    without_id = [None, None, 7, None, 20, 1, 'x'] + [None] * 7
+    ids = save_operations(
+        settings['connection'], COLUMN_NAMES, changes_of(inserted=[without_id, with_id, list(without_id)]))
+    assert ids[1] == 500
+    assert None not in ids and len(set(ids)) == 3
+    assert row_of(stored, 500) == with_id
+    assert row_of(stored, ids[0])[1:] == without_id[1:]
+    assert row_of(stored, ids[2])[1:] == without_id[1:]
+
+
+def test_failed_save_is_rolled_back_and_kept(settings, stored):
+    model = ProcessModel(None, settings)
+    source_model = model.sourceModel()
+    removed_id = source_model.index(source_model.rowCount() - 1, source_model.column('id')).data()
+    source_model.removeRows(source_model.rowCount() - 1, 1)
+    source_model.setData(source_model.index(0, source_model.column('type_id')), None)  # violates NOT NULL
+    assert source_model.changes_count() == 2
+
+    with pytest.raises(SaveError):
+        model.save()
+    assert row_of(stored, removed_id) is not None  # the delete was rolled back
+    assert source_model.changes_count() == 2
+
+    source_model.setData(source_model.index(0, source_model.column('type_id')), 7)
+    assert model.save() == 2
+    assert row_of(stored, removed_id) is None
+    assert not source_model.has_changes()
@@ -0,0 +1,139 @@
+import sqlite3
+
+from PySide6.QtCore import QModelIndex
+
+from ProcessEditor.connections import ConnectionManager
+from ProcessEditor.process_model import ProcessModel
+
+
+def model_of(database_path: str, **settings) -> ProcessModel:
+    manager = ConnectionManager({'driver': 'QSQLITE', 'database': database_path, 'health_check': False})
+    return ProcessModel(None, dict({'connection': manager.connection(), 'process_version_id': 1}, **settings))
+
+
+def row_of(model: ProcessModel, operation_id: int) -> int:
+    source_model = model.sourceModel()
+    return next(row for row in range(source_model.rowCount()) if source_model.index(row, 0).data() == operation_id)
+
+
+def parent_id_of(model: ProcessModel, operation_id: int):
+    """Returns id of the operation of the parent item in the tree, None at root level."""
+    index = model.mapFromSource(model.sourceModel().index(row_of(model, operation_id), 0))
+    return model.parent(index).data()
+
+
+def set_parent_id(model: ProcessModel, operation_id: int, parent_id: int) -> None:
+    source_model = model.sourceModel()
+    source_model.setData(source_model.index(row_of(model, operation_id), source_model.column('parent_id')), parent_id)
+
+
+def child_of(database_path: str, operation_id: int) -> int:
+    connection = sqlite3.connect(database_path)
+    child_id = connection.execute("SELECT MIN(id) FROM operations WHERE parent_id = ?", (operation_id,)).fetchone()[0]
+    connection.close()
+    return child_id
+
+
+def test_item_moved_into_own_branch_is_parked_at_root(application, database_path):
+    model = model_of(database_path)
+    parent_id = model.index(0, 0, QModelIndex()).data()
+    child_id = child_of(database_path, parent_id)
+    grandchild_id = child_of(database_path, child_id)
+
+    set_parent_id(model, parent_id, grandchild_id)
+    assert parent_id_of(model, parent_id) is None
+    assert parent_id_of(model, child_id) == parent_id
+    assert model.preorder_count() == model.sourceModel().rowCount()
+
+    # the cycle is broken, the parked item goes under its parent
+    set_parent_id(model, child_id, None)
+    assert parent_id_of(model, parent_id) == grandchild_id
+    assert parent_id_of(model, grandchild_id) == child_id
+    assert parent_id_of(model, child_id) is None
+    assert model.preorder_count() == model.sourceModel().rowCount()
+
+
+def test_loaded_cycle_is_parked_at_root(application, database_path):
+    parent_id = 1
+    child_id = child_of(database_path, parent_id)
+    connection = sqlite3.connect(database_path)
+    connection.execute("UPDATE operations SET parent_id = ? WHERE id = ?", (child_id, parent_id))
+    connection.commit()
+    connection.close()
+
+    model = model_of(database_path)
+    assert model.preorder_count() == model.sourceModel().rowCount()
+    parked = [parent_id_of(model, operation_id) for operation_id in (parent_id, child_id)]
+    assert parked in ([None, parent_id], [child_id, None])
+
+
+def tree_ids(model: ProcessModel, parent: QModelIndex = QModelIndex()) -> list:
+    """Returns ids of loaded operations in pre-order, walking the tree by rows."""
+    ids = []
+    for row in range(model.rowCount(parent)):
+        index = model.index(row, 0, parent)
+        ids.append(index.data())
+        ids.extend(tree_ids(model, index))
+    return ids
+
+
+def can_fetch_after(model: ProcessModel, index: QModelIndex) -> bool:
+    """Returns True if children of the index or of one of its parents are not all fetched."""
+    while index.isValid():
+        if model.canFetchMore(index):
+            return True
+        index = model.parent(index)
+    return model.canFetchMore(QModelIndex())
+
+
+def assert_preorder(model: ProcessModel) -> None:
+    """Checks next_index, previous_index and is_last_index against the tree."""
+    ids = tree_ids(model)
+    forward, index = [], model.preorder_index(0)
+    while index.isValid():
+        forward.append(index.data())
+        assert model.is_last_index(index) == (len(forward) == len(ids) and not can_fetch_after(model, index))
+        index = model.next_index(index)
+    assert forward == ids
+    backward, index = [], model.preorder_index(len(ids) - 1)
+    while index.isValid():
+        backward.append(index.data())
+        index = model.previous_index(index)
+    assert backward == ids[::-1]
+
+
+def test_preorder_follows_moved_item(application, database_path):
+    model = model_of(database_path)
+    assert_preorder(model)
+    first_id = model.index(0, 0, QModelIndex()).data()
+    last_id = model.index(model.rowCount(QModelIndex()) - 1, 0, QModelIndex()).data()
+
+    set_parent_id(model, last_id, first_id)
+    assert parent_id_of(model, last_id) == first_id
+    assert_preorder(model)
+
+
+def test_preorder_skips_removed_item(application, database_path):
+    model = model_of(database_path)
+    assert_preorder(model)
+    source_model = model.sourceModel()
+    removed_id = child_of(database_path, model.index(0, 0, QModelIndex()).data())
+
+    source_model.removeRows(row_of(model, removed_id), 1)
+    assert removed_id not in tree_ids(model)
+    assert_preorder(model)
+
+
+def test_preorder_grows_with_lazy_fetch(application, database_path):
+    model = model_of(database_path, lazy_loading=True, fetch_batch_size=5)
+    while model.canFetchMore(QModelIndex()):
+        model.fetchMore(QModelIndex())
+    assert_preorder(model)
+    last = model.preorder_index(model.preorder_count() - 1)
+    assert model.canFetchMore(last)
+    assert not model.is_last_index(last)  # children of the last operation are not fetched yet
+    assert not model.next_index(last).isValid()
+
+    model.fetchMore(last)
+    assert model.next_index(last) == model.index(0, 0, last)
+    assert_preorder(model)
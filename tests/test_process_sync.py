@@ -0,0 +1,211 @@
+import sqlite3
+import time
+import warnings
+
+import pytest
+from PySide6.QtCore import QModelIndex, QObject, Signal
+from PySide6.QtSql import QSqlDatabase, QSqlDriver
+
+import ProcessEditor.process_sync
+from ProcessEditor.connections import ConnectionManager
+from ProcessEditor.operations_writer import save_operations
+from ProcessEditor.process_model import ProcessModel
+from ProcessEditor.process_sync import ProcessSync
+from ProcessEditor.workspace import ProcessWorkspace
+
+
+@pytest.fixture
+def sync_database_path(database_path) -> str:
+    """Generated database, whose updated_at of operations is increased by triggers on every insert and update."""
+    connection = sqlite3.connect(database_path)
+    connection.executescript(
+        """
+        ALTER TABLE operations ADD COLUMN updated_at INTEGER;
+        UPDATE operations SET updated_at = id;
+        CREATE TRIGGER operations_inserted AFTER INSERT ON operations BEGIN
+            UPDATE operations SET updated_at = (SELECT MAX(updated_at) + 1 FROM operations) WHERE id = NEW.id;
+        END;
+        CREATE TRIGGER operations_updated AFTER UPDATE ON operations WHEN NEW.updated_at IS OLD.updated_at BEGIN
+            UPDATE operations SET updated_at = (SELECT MAX(updated_at) + 1 FROM operations) WHERE id = NEW.id;
+        END;
+        """)
+    connection.close()
+    return database_path
+
+
+@pytest.fixture
+def remote(sync_database_path):
+    """Connection of another user editing the process version."""
+    connection = sqlite3.connect(sync_database_path, isolation_level=None)
+    yield connection
+    connection.close()
+
+
+@pytest.fixture
+def settings(application, sync_database_path, thread_pool):
+    manager = ConnectionManager({'driver': 'QSQLITE', 'database': sync_database_path, 'health_check': False})
+    values = {
+        'connection': manager.connection(),
+        'connection_manager': manager,
+        'process_version_id': 1,
+        'sync_interval': 60000,
+    }
+    yield values
+    thread_pool.waitForDone()
+    del values['connection']
+    manager.close_all()
+
+
+def poll(sync: ProcessSync, application) -> tuple[int, int]:
+    """Polls changes and waits until they are applied. Returns numbers of read and removed rows."""
+    results = []
+    sync.synced.connect(lambda *counts: results.append(counts))
+    sync.failed.connect(lambda message: results.append(message))
+    sync.poll()
+    deadline = time.monotonic() + 10
+    while not results and time.monotonic() < deadline:
+        application.processEvents()
+    assert results and isinstance(results[0], tuple), results
+    return results[0]
+
+
+def values_by_id(model: ProcessModel, name: str) -> dict:
+    source_model = model.sourceModel()
+    column = source_model.column(name)
+    return {
+        source_model.index(row, source_model.column('id')).data(): source_model.index(row, column).data()
+        for row in range(source_model.rowCount())}
+
+
+def test_remote_update_is_merged(application, settings, remote):
+    model = ProcessModel(None, settings)
+    sync = ProcessSync(None, model, settings)
+    assert poll(sync, application) == (1, 0)  # rows having the watermark value are read again
+    remote.execute("UPDATE operations SET parameter_0 = 'remote' WHERE id = 3")
+    assert poll(sync, application) == (2, 0)
+    assert values_by_id(model, 'parameter_0')[3] == 'remote'
+    assert poll(sync, application) == (1, 0)
+    assert not model.sourceModel().has_changes()
+
+
+def test_unsaved_edit_is_not_overwritten(application, settings, remote):
+    model = ProcessModel(None, settings)
+    source_model = model.sourceModel()
+    row = next(row for row in range(source_model.rowCount()) if source_model.index(row, 0).data() == 3)
+    source_model.setData(source_model.index(row, source_model.column('parameter_0')), 'local')
+    sync = ProcessSync(None, model, settings)
+    remote.execute("UPDATE operations SET parameter_0 = 'remote', parameter_1 = 'remote' WHERE id = 3")
+    poll(sync, application)
+    assert values_by_id(model, 'parameter_0')[3] == 'local'
+    assert values_by_id(model, 'parameter_1')[3] == 'remote'
+    assert source_model.changes_count() == 1
+
+
+def test_remote_insert_and_remove(application, settings, remote):
+    model = ProcessModel(None, settings)
+    sync = ProcessSync(None, model, settings)
+    count = model.sourceModel().rowCount()
+    remote.execute(
+        "INSERT INTO operations (id, parent_id, type_id, order_id, process_version_id) VALUES (1000, NULL, 1, -1, 1)")
+    remote.execute("DELETE FROM operations WHERE id = 5")
+    assert poll(sync, application) == (2, 1)
+    ids = model.sourceModel().ids()
+    assert 1000 in ids and 5 not in ids
+    assert model.sourceModel().rowCount() == count
+    assert model.index(0, 0, QModelIndex()).data() == 1000
+    assert not model.sourceModel().has_changes()
+
+
+def test_row_read_before_its_id_arrived(application, settings, remote):
+    model = ProcessModel(None, settings)
+    source_model = model.sourceModel()
+    sync = ProcessSync(None, model, settings)
+    count = source_model.rowCount()
+    source_model.insertRows(count, 1)
+    for name, value in (('type_id', 1), ('order_id', -1), ('process_version_id', 1)):
+        source_model.setData(source_model.index(count, source_model.column(name)), value)
+    changes = source_model.take_changes()
+    ids = save_operations(settings['connection'], source_model.column_names(), changes)
+
+    # the saved row is read by the sync as an operation of another user
+    assert poll(sync, application) == (2, 0)
+    assert source_model.rowCount() == count + 2
+    source_model.set_inserted_ids(changes, ids)
+    assert source_model.rowCount() == count + 1
+    assert ids[0] in source_model.ids()
+    assert not source_model.has_changes()
+
+
+def test_lazy_poll_compares_fetched_branches(application, settings, remote, monkeypatch):
+    statements = []
+    execute = ProcessEditor.process_sync.execute
+    monkeypatch.setattr(
+        ProcessEditor.process_sync, 'execute',
+        lambda connection, statement, values=None: statements.append(statement) or execute(
+            connection, statement, values))
+    model = ProcessModel(None, dict(settings, lazy_loading=True, fetch_batch_size=5))
+    while model.canFetchMore(QModelIndex()):
+        model.fetchMore(QModelIndex())
+    sync = ProcessSync(None, model, settings)
+    top_level_ids = [model.index(row, 0, QModelIndex()).data() for row in range(model.rowCount(QModelIndex()))]
+    not_loaded_id = remote.execute(
+        f"SELECT MIN(id) FROM operations WHERE parent_id = {top_level_ids[0]}").fetchone()[0]
+    assert not_loaded_id not in model.sourceModel().ids()
+
+    assert poll(sync, application)[1] == 0
+    assert not any(statement.lstrip().startswith("SELECT id") for statement in statements)
+
+    remote.execute(f"DELETE FROM operations WHERE id IN ({top_level_ids[-1]}, {not_loaded_id})")
+    assert poll(sync, application)[1] == 1
+    assert top_level_ids[-1] not in model.sourceModel().ids()
+    assert model.rowCount(QModelIndex()) == len(top_level_ids) - 1
+
+
+class NotifyingDriver(QObject):
+    """Driver with event notifications, like the one of PostgreSQL, the SQLite driver has none."""
+    notification = Signal(str, object, object)  # channel, source, payload
+
+    def __init__(self):
+        super().__init__()
+        self.channels = []
+
+    def hasFeature(self, feature) -> bool:
+        return feature == QSqlDriver.DriverFeature.EventNotifications
+
+    def subscribeToNotification(self, channel: str) -> bool:
+        self.channels.append(channel)
+        return True
+
+    def unsubscribeFromNotification(self, channel: str) -> bool:
+        self.channels.remove(channel)
+        return True
+
+    def subscribedToNotifications(self) -> list[str]:
+        return list(self.channels)
+
+
+def test_evicted_version_keeps_channel_of_active_one(application, settings, monkeypatch):
+    driver = NotifyingDriver()
+    monkeypatch.setattr(QSqlDatabase, 'driver', lambda connection: driver)
+    workspace = ProcessWorkspace(None, dict(settings, sync=True, sync_channel='operations_changed', workspace_size=1))
+    first = workspace.open(1)
+    workspace.activate(1)
+    poll(first.sync, application)
+    second = workspace.open(2)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        workspace.activate(2)  # the first version is evicted
+    assert 1 not in workspace
+    assert driver.channels == ['operations_changed']
+    poll(second.sync, application)
+
+    results = []
+    second.sync.synced.connect(lambda *counts: results.append(counts))
+    driver.notification.emit('operations_changed', None, None)
+    deadline = time.monotonic() + 10
+    while not results and time.monotonic() < deadline:
+        application.processEvents()
+    assert results == [(0, 0)]
+
+    workspace.close_all()
+    assert driver.channels == []
@@ -0,0 +1,29 @@
+from PySide6.QtGui import QValidator
+
+from ProcessEditor.validators import RegexValidator, compile_pattern, is_valid, validator_for
+
+
+def test_pattern_is_compiled_once():
+    pattern = compile_pattern(r'^\d+$')
+    assert compile_pattern(r'^\d+$') is pattern
+    assert compile_pattern('') is None
+    assert compile_pattern('[0-') is None  # malformed patterns do not validate
+
+
+def test_value_is_checked_against_whole_pattern():
+    pattern = compile_pattern(r'\d+')
+    assert is_valid(pattern, '12') and is_valid(pattern, 12)
+    assert not is_valid(pattern, '12a')
+    assert not is_valid(pattern, None)
+    assert is_valid(None, 'anything') and is_valid(None, None)
+
+
+def test_validator_is_shared_by_pattern(application):
+    pattern = compile_pattern(r'^[01]$')
+    validator = validator_for(pattern)
+    assert isinstance(validator, RegexValidator)
+    assert validator_for(pattern) is validator
+    assert validator_for(None) is None
+    assert validator.validate('1', 1)[0] == QValidator.Acceptable
+    assert validator.validate('2', 1)[0] == QValidator.Intermediate
+    assert validator.is_valid('0') and not validator.is_valid('')